@@ -0,0 +1,95 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import login
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from accounts.middleware import ONBOARDED_SESSION_KEY, OnboardingMiddleware
+from core.instrumentation import record_queries
+
+
+def view(request):
+    return HttpResponse()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures OnboardingMiddleware's per-request overhead (time and "
+        "queries) by running the session/auth stack with and without it. "
+        "Sessions live in signed cookies here, so the numbers are the "
+        "middleware's own cost rather than session storage noise."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5000)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cookies = self.sessions()
+            scenarios = {
+                "anonymous": ("/products/", None),
+                "static asset": (f"{settings.STATIC_URL}css/style.css", cookies["onboarded"]),
+                "onboarded": ("/products/", cookies["onboarded"]),
+                "needs onboarding": ("/products/", cookies["newcomer"]),
+            }
+
+            without = self.stack(view)
+            with_onboarding = self.stack(OnboardingMiddleware(view))
+
+            self.stdout.write(
+                f"{'scenario':<20} {'base us':>9} {'with us':>9} {'extra us':>9} {'extra queries':>14}"
+            )
+            for name, (path, cookie) in scenarios.items():
+                base_us, base_queries = self.measure(without, path, cookie, options["repeat"])
+                with_us, with_queries = self.measure(with_onboarding, path, cookie, options["repeat"])
+                self.stdout.write(
+                    f"{name:<20} {base_us:>9.1f} {with_us:>9.1f} {with_us - base_us:>9.1f} "
+                    f"{with_queries - base_queries:>14}"
+                )
+
+            transaction.set_rollback(True)
+
+    def stack(self, inner):
+        return SessionMiddleware(AuthenticationMiddleware(inner))
+
+    def sessions(self):
+        factory = RequestFactory()
+        users = {
+            "onboarded": User.objects.create_user(username="bench-onboarded", first_name="Bea"),
+            "newcomer": User.objects.create_user(username="bench-newcomer"),
+        }
+
+        cookies = {}
+        for name, user in users.items():
+            request = factory.get("/")
+            SessionMiddleware(lambda r: None).process_request(request)
+            login(request, user, backend="django.contrib.auth.backends.ModelBackend")
+            if name == "onboarded":
+                request.session[ONBOARDED_SESSION_KEY] = str(user.pk)
+            cookies[name] = request.session._get_session_key()
+        return cookies
+
+    def measure(self, handler, path, cookie, repeat):
+        factory = RequestFactory()
+        if cookie:
+            factory.cookies[settings.SESSION_COOKIE_NAME] = cookie
+
+        samples = []
+        queries = 0
+        for _ in range(repeat):
+            request = factory.get(path)
+            with record_queries() as recorder:
+                start = time.perf_counter()
+                handler(request)
+                samples.append((time.perf_counter() - start) * 1_000_000)
+            queries = recorder.count
+
+        return statistics.median(samples), queries
@@ -1,20 +1,61 @@
+from functools import cached_property
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
 from django.shortcuts import redirect
 from django.urls import reverse
 
+# Session flag holding the id of the user who finished onboarding, so
+# onboarded requests skip loading the user here (see onboarding_view)
+ONBOARDED_SESSION_KEY = "onboarding_complete"
+
+
 class OnboardingMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
+    @cached_property
+    def onboarding_url(self):
+        return reverse("onboarding")
+
+    @cached_property
+    def allowed_paths(self):
+        return frozenset([
+            self.onboarding_url,
+            reverse("logout"),
+        ])
+
+    @cached_property
+    def exempt_prefixes(self):
+        # Assets and the admin never need a name on the account
+        prefixes = [settings.STATIC_URL, settings.MEDIA_URL, reverse("admin:index")]
+        return tuple("/" + prefix.lstrip("/") for prefix in prefixes if prefix)
+
     def __call__(self, request):
-        if request.user.is_authenticated:
-            onboarding_url = reverse("onboarding")
-            allowed_paths = [
-                onboarding_url,
-                reverse("logout"),
-                reverse("admin:login")
-            ]
-
-            if (not request.user.first_name and request.path not in allowed_paths):
-                return redirect(onboarding_url)
-
-        return self.get_response(request)
\ No newline at end of file
+        if self.needs_onboarding(request):
+            return redirect(self.onboarding_url)
+
+        return self.get_response(request)
+
+    def needs_onboarding(self, request):
+        path = request.path_info
+        if path in self.allowed_paths or path.startswith(self.exempt_prefixes):
+            return False
+
+        # Anonymous: no session cookie means no session query either
+        session = request.session
+        user_id = session.get(SESSION_KEY)
+        if user_id is None:
+            return False
+
+        if session.get(ONBOARDED_SESSION_KEY) == user_id:
+            return False
+
+        if not request.user.is_authenticated:
+            return False
+
+        if request.user.first_name:
+            session[ONBOARDED_SESSION_KEY] = user_id
+            return False
+
+        return True
@@ -1,3 +1,91 @@
-from django.test import TestCase
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.functional import SimpleLazyObject
+from core.testing import create_artisan, create_product
+from orders.models import Order, OrderItem
 
-# Create your tests here.
+from .middleware import ONBOARDED_SESSION_KEY, OnboardingMiddleware
+from .views import ORDERS_PER_PAGE
+
+
+class BuyerOrderHistoryTests(TestCase):
+    def setUp(self):
+        self.product = create_product(create_artisan(), stock=10)
+
+        self.buyer = User.objects.create_user(
+            username="buyer@example.com",
+            first_name="Buyer",
+            last_name="One",
+        )
+        self.client.force_login(self.buyer)
+
+    def create_orders(self, count):
+        orders = Order.objects.bulk_create(
+            Order(buyer=self.buyer) for _ in range(count)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=self.product, price_at_purchase=100)
+            for order in orders
+        )
+
+    def profile_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/profile/")
+
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_flat_as_orders_grow(self):
+        self.create_orders(1)
+        # The first request of a session also stores the seller role
+        self.profile_queries()
+        few_queries, _ = self.profile_queries()
+
+        self.create_orders(999)
+        many_queries, response = self.profile_queries()
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(len(response.context["orders"]), ORDERS_PER_PAGE)
+        self.assertEqual(response.context["orders"].paginator.count, 1000)
+
+    def test_pages_walk_back_through_history(self):
+        self.create_orders(ORDERS_PER_PAGE + 1)
+
+        response = self.client.get("/profile/?orders_page=2")
+
+        self.assertEqual(len(response.context["orders"]), 1)
+        self.assertEqual(
+            response.context["orders"][0].id,
+            Order.objects.filter(buyer=self.buyer).order_by("created_at", "id").first().id,
+        )
+
+
+class OnboardingMiddlewareTests(TestCase):
+    def test_user_without_a_name_is_sent_to_onboarding(self):
+        self.client.force_login(User.objects.create_user(username="new@example.com"))
+
+        response = self.client.get("/products/")
+
+        self.assertRedirects(response, "/onboarding/", fetch_redirect_response=False)
+
+    def test_onboarding_sets_the_session_flag(self):
+        user = User.objects.create_user(username="new@example.com")
+        self.client.force_login(user)
+
+        self.client.post("/onboarding/", {"first_name": "Asha", "last_name": "Rao"})
+
+        self.assertEqual(self.client.session[ONBOARDED_SESSION_KEY], str(user.pk))
+        self.assertEqual(self.client.get("/products/").status_code, 200)
+
+    def test_flagged_session_skips_the_user_lookup(self):
+        request = RequestFactory().get("/products/")
+        request.session = {SESSION_KEY: "7", ONBOARDED_SESSION_KEY: "7"}
+        request.user = SimpleLazyObject(lambda: self.fail("user was loaded"))
+
+        response = OnboardingMiddleware(lambda r: HttpResponse())(request)
+
+        self.assertEqual(response.status_code, 200)
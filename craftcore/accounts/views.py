@@ -3,9 +3,13 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.models import User
-from django.db.models import Sum
-from marketplace.models import ArtisanProfile, Product
+from django.core.paginator import Paginator
+from django.db.models import Prefetch
+from marketplace.models import Product
 from orders.models import Order, OrderItem
+from .middleware import ONBOARDED_SESSION_KEY
+
+ORDERS_PER_PAGE = 10
 
 def login_view(request):
     next_url = request.GET.get("next")
@@ -64,6 +68,9 @@ def onboarding_view(request):
         user.last_name = last_name
         user.save()
 
+        # Lets OnboardingMiddleware skip the user lookup from now on
+        request.session[ONBOARDED_SESSION_KEY] = str(user.pk)
+
         return redirect(next_url or "/products/")
 
     return render(request, "accounts/onboarding.html")
@@ -77,54 +84,42 @@ def profile_view(request):
     user = request.user
 
     # ---------------- BUYER ORDERS ----------------
-    orders = Order.objects.filter(buyer=user).order_by("-created_at")
-
-    # Prepare order display data
-
-    for order in orders:
-        first_item = order.items.first()  # OrderItem
-        product = first_item.product if first_item else None
-
-        orders = Order.objects.filter(buyer=user).order_by("-created_at")
-
+    # Paginated; items and their products come from one prefetch query,
+    # so the page costs the same however many orders the buyer has
+    orders = (
+        Order.objects
+        .filter(buyer=user)
+        .order_by("-created_at", "-id")
+        .prefetch_related(
+            Prefetch("items", queryset=OrderItem.objects.select_related("product"))
+        )
+    )
+    orders = Paginator(orders, ORDERS_PER_PAGE).get_page(request.GET.get("orders_page"))
 
     # ---------------- SELLER CHECK ----------------
-    is_seller = False
+    artisan = request.artisan
+    is_seller = bool(artisan and artisan.is_active)
     products_data = []
     total_products = 0
     total_orders = 0
     total_earned = 0
 
-    try:
-        artisan = user.artisanprofile
-        is_seller = True
-
+    if artisan:
         products = Product.objects.filter(artisan=artisan, is_active=True)
-        total_products = products.count()
-
-        order_items = OrderItem.objects.filter(product__artisan=artisan)
-        total_orders = order_items.count()
 
+        # Counters are maintained at checkout, so this is a single query
         for product in products:
-            product_order_count = OrderItem.objects.filter(product=product).count()
-           
             products_data.append({
                 "id": product.id,
                 "name": product.name,
                 "price": product.price,
-                "image_url": product.image.url if product.image else "",
-                "order_count": product_order_count,
+                "image_url": product.thumb_image_url if product.image else "",
+                "order_count": product.order_count,
             })
 
-        total_earned = (
-            order_items
-            .aggregate(
-                total=Sum('price_at_purchase')
-            )['total'] or 0
-        )
-
-    except ArtisanProfile.DoesNotExist:
-        pass
+        total_products = len(products_data)
+        total_orders = artisan.total_orders
+        total_earned = artisan.total_revenue
 
     context = {
         "orders": orders,
@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import Job
 
-# Register your models here.
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "task")
+    readonly_fields = ("created_at", "finished_at", "locked_by", "locked_at", "last_error")
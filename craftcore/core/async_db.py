@@ -0,0 +1,55 @@
+# Running independent ORM queries at the same time from async views.
+#
+# Django's async ORM (aget, afirst, async for) runs every query through one
+# thread per request, so awaiting several of them with asyncio.gather still
+# runs them one after another. gather() below hands each callable to a
+# small dedicated thread pool instead, where each thread has its own
+# database connection, so the queries really overlap. The pool size
+# (ASYNC_DB_THREADS) bounds the extra connections each process holds.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_DB_THREADS,
+            thread_name_prefix="async-db",
+        )
+    return _executor
+
+
+def _run(func):
+    # Pool threads live outside the request cycle, so apply the same
+    # CONN_MAX_AGE / health check rules Django applies around each request
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+async def gather(*funcs):
+    # Calls each sync callable (which must evaluate its querysets) and
+    # returns their results in order. Other connections can't see rows
+    # the request's own open transaction hasn't committed (e.g. under
+    # TestCase), so inside one they run in turn on the request's thread.
+    if await sync_to_async(_in_transaction)():
+        return [await sync_to_async(func)() for func in funcs]
+
+    return await asyncio.gather(*(
+        sync_to_async(_run, thread_sensitive=False, executor=executor())(func)
+        for func in funcs
+    ))
@@ -0,0 +1,62 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+# Collapses "IN (%s, %s, %s)" so one query shape with different list
+# lengths counts as the same fingerprint
+IN_LIST = re.compile(r"\bIN \((?:%s, )*%s\)")
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    # Django passes parameters separately, so the SQL is already mostly a
+    # template; also normalize inlined literals and IN lists
+    sql = IN_LIST.sub("IN (...)", sql)
+    return LITERALS.sub("?", sql)
+
+
+class QueryRecorder:
+    # A connection.execute_wrapper that counts and times every query
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        # {fingerprint: times run} for query shapes run more than once,
+        # the usual sign of a loop issuing one query per row
+        return {sql: n for sql, n in self.fingerprints.most_common() if n > 1}
+
+    def summary(self):
+        duplicates = self.duplicates
+        return {
+            "queries": self.count,
+            "db_ms": round(self.duration * 1000, 2),
+            "duplicate_queries": sum(duplicates.values()) - len(duplicates),
+            "duplicates": duplicates,
+        }
+
+
+@contextmanager
+def record_queries():
+    # Records queries on every configured database for the duration of the
+    # block, without needing DEBUG or connection.queries
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
@@ -0,0 +1,103 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF = 10  # seconds before the first retry, doubled per attempt
+MAX_BACKOFF = 3600
+CLAIM_BATCH = 10
+
+
+def enqueue(task, *, delay=0, max_attempts=DEFAULT_MAX_ATTEMPTS, **kwargs):
+    # Queue `task` (a dotted path) to be called with `kwargs`, which must be
+    # JSON-serializable. Inside a transaction the job only becomes visible
+    # to workers once it commits, so it never sees uncommitted rows.
+    return Job.objects.create(
+        task=task,
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim(worker_id):
+    # Optimistic claim: read a few due job ids, then flip one from queued to
+    # running with a conditional UPDATE. Whoever updates the row owns it;
+    # losers move on to the next candidate. Works the same on SQLite and
+    # PostgreSQL, with no row locks held between polls.
+    now = timezone.now()
+    candidates = list(
+        Job.objects
+        .filter(status="queued", run_at__lte=now)
+        .order_by("run_at", "id")
+        .values_list("id", flat=True)[:CLAIM_BATCH]
+    )
+
+    for job_id in candidates:
+        claimed = Job.objects.filter(id=job_id, status="queued").update(
+            status="running",
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+
+    return None
+
+
+def backoff_delay(attempts, base=DEFAULT_BACKOFF):
+    return min(base * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def run(job, backoff=DEFAULT_BACKOFF):
+    # Executes a claimed job and records the outcome. Failures are retried
+    # with exponential backoff until max_attempts, then marked failed.
+    try:
+        import_string(job.task)(**job.kwargs)
+    except Exception:
+        logger.exception("Job #%s (%s) failed on attempt %s", job.id, job.task, job.attempts)
+        job.last_error = traceback.format_exc()
+
+        if job.attempts < job.max_attempts:
+            job.status = "queued"
+            job.run_at = timezone.now() + timedelta(seconds=backoff_delay(job.attempts, backoff))
+        else:
+            job.status = "failed"
+            job.finished_at = timezone.now()
+    else:
+        job.status = "done"
+        job.last_error = ""
+        job.finished_at = timezone.now()
+
+    job.locked_by = ""
+    job.locked_at = None
+    job.save(update_fields=[
+        "status", "run_at", "last_error", "finished_at", "locked_by", "locked_at",
+    ])
+    return job
+
+
+def requeue_stale(timeout):
+    # Jobs left "running" by a worker that died mid-task go back to the
+    # queue. The attempt already counted, so a job that keeps killing its
+    # worker still runs out of retries and ends up failed.
+    now = timezone.now()
+    stale = Job.objects.filter(status="running", locked_at__lt=now - timedelta(seconds=timeout))
+
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status="failed",
+        locked_by="",
+        locked_at=None,
+        last_error="Worker stopped before the job finished.",
+        finished_at=now,
+    )
+    return stale.update(status="queued", locked_by="", locked_at=None)
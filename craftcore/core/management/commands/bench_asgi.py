@@ -0,0 +1,220 @@
+import asyncio
+import importlib
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+
+from marketplace.cache import catalog_cache
+from marketplace.models import Product
+
+# (label, handler, ASYNC_VIEWS)
+MODES = [
+    ("wsgi, sync views", "wsgi", False),
+    ("asgi, sync views", "asgi", False),
+    ("asgi, async views", "asgi", True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares serving the same pages with the WSGI handler and sync "
+        "views (the gunicorn default) against the ASGI handler with sync and "
+        "with async views, in process. WSGI requests run on a pool of "
+        "--concurrency threads, like gunicorn's threaded workers; ASGI "
+        "requests run --concurrency at a time on one event loop, like a "
+        "uvicorn worker. Reports latency percentiles and requests per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--path",
+            action="append",
+            help="Page to request; repeat for several (default: the home page and a product page).",
+        )
+        parser.add_argument(
+            "--db-latency",
+            type=float,
+            default=0,
+            help=(
+                "Milliseconds added to every query, standing in for the network "
+                "round trip to a database server (SQLite has none)."
+            ),
+        )
+        parser.add_argument(
+            "--cold-cache",
+            action="store_true",
+            help="Clear the catalog cache before every request, so cached pages query each time.",
+        )
+
+    def handle(self, *args, **options):
+        paths = options["path"] or ["/", self.product_path()]
+        self.cold_cache = options["cold_cache"]
+        self.db_latency = options["db_latency"] / 1000
+
+        self.stdout.write(
+            f"{connection.vendor} {connection.settings_dict['NAME']}, "
+            f"{options['requests']} requests, {options['concurrency']} at a time, "
+            f"+{options['db_latency']:g} ms per query"
+        )
+        self.stdout.write(
+            f"{'page':<20} {'mode':<18} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8}"
+        )
+
+        if self.db_latency:
+            connection_created.connect(self.add_latency)
+            for conn in connections.all(initialized_only=True):
+                self.add_latency(None, conn)
+
+        try:
+            self.compare(paths, options["requests"], options["concurrency"])
+        finally:
+            connection_created.disconnect(self.add_latency)
+
+    def compare(self, paths, requests, concurrency):
+        handlers = {
+            "wsgi": (WSGIHandler(), self.run_wsgi),
+            "asgi": (ASGIHandler(), self.run_asgi),
+        }
+        for path in paths:
+            for label, name, async_views in MODES:
+                handler, run = handlers[name]
+                with self.views(async_views):
+                    # Untimed warm-up: connections, templates, reference tables
+                    run(handler, path, concurrency, concurrency)
+
+                    start = time.perf_counter()
+                    samples = run(handler, path, requests, concurrency)
+                    elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{path:<20} {label:<18} {statistics.median(samples):>8.2f} "
+                    f"{statistics.quantiles(samples, n=20)[18]:>8.2f} "
+                    f"{len(samples) / elapsed:>8.0f}"
+                )
+
+    @contextmanager
+    def views(self, async_views):
+        # The URL confs pick sync or async views when they are imported
+        def reload():
+            for module in ("core.urls", "marketplace.urls", settings.ROOT_URLCONF):
+                importlib.reload(sys.modules[module])
+            clear_url_caches()
+
+        try:
+            with override_settings(ASYNC_VIEWS=async_views):
+                reload()
+                yield
+        finally:
+            reload()
+
+    def product_path(self):
+        product = Product.objects.filter(is_active=True).only("id").first()
+        if product is None:
+            raise CommandError("No products to request; run seed_marketplace first or pass --path.")
+        return f"/products/{product.id}/"
+
+    def add_latency(self, sender, connection, **kwargs):
+        # Reconnecting reuses the connection object; wrap it once
+        if self.wait not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self.wait)
+
+    def wait(self, execute, sql, params, many, context):
+        # Sleeping releases the GIL, as waiting on a socket would
+        time.sleep(self.db_latency)
+        return execute(sql, params, many, context)
+
+    def before_request(self):
+        if self.cold_cache:
+            catalog_cache().clear()
+
+    # ---------------- WSGI ----------------
+
+    def run_wsgi(self, handler, path, requests, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(lambda _: self.wsgi_request(handler, path), range(requests)))
+
+    def wsgi_request(self, handler, path):
+        environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET"}
+        setup_testing_defaults(environ)
+        self.before_request()
+
+        start = time.perf_counter()
+        response = handler(environ, lambda status, headers: None)
+        for _ in response:
+            pass
+        # Sends request_finished, where Django closes or keeps the connection
+        response.close()
+        elapsed = time.perf_counter() - start
+
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code} under WSGI.")
+        return elapsed * 1000
+
+    # ---------------- ASGI ----------------
+
+    def run_asgi(self, handler, path, requests, concurrency):
+        async def run():
+            slots = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with slots:
+                    return await self.asgi_request(handler, path)
+
+            return await asyncio.gather(*(one() for _ in range(requests)))
+
+        return asyncio.run(run())
+
+    async def asgi_request(self, handler, path):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"127.0.0.1")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("127.0.0.1", 80),
+        }
+        sent_body = False
+        status = None
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # The client never disconnects
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        self.before_request()
+
+        start = time.perf_counter()
+        await handler(scope, receive, send)
+        elapsed = time.perf_counter() - start
+
+        if status != 200:
+            raise CommandError(f"GET {path} returned {status} under ASGI.")
+        return elapsed * 1000
@@ -0,0 +1,102 @@
+import statistics
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from marketplace.models import Product
+
+# (label, CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+MODES = [
+    ("connect per request", 0, False),
+    ("persistent", 600, False),
+    ("persistent + health checks", 600, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures what opening a database connection adds to each request. "
+        "Requests go through the real WSGI handler, which closes or keeps "
+        "connections at the end of each request according to CONN_MAX_AGE, "
+        "once with a new connection per request and once with persistent "
+        "connections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument(
+            "--path",
+            help="Page to request (default: a product detail page, which always queries).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or self.default_path()
+        handler = WSGIHandler()
+
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        self.stdout.write(
+            f"{connection.vendor} {connection.settings_dict.get('HOST') or connection.settings_dict['NAME']}, "
+            f"GET {path}"
+        )
+        self.stdout.write(
+            f"{'mode':<28} {'p50 ms':>8} {'p95 ms':>8} {'vs first':>9} {'connects/req':>13}"
+        )
+
+        settings_dict = connection.settings_dict
+        original = settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"]
+        baseline = None
+
+        connection_created.connect(count)
+        try:
+            for label, max_age, health_checks in MODES:
+                connection.close()
+                settings_dict["CONN_MAX_AGE"] = max_age
+                settings_dict["CONN_HEALTH_CHECKS"] = health_checks
+
+                # One untimed request so persistent modes start connected
+                self.request(handler, path)
+                opened.clear()
+
+                samples = [self.request(handler, path) for _ in range(options["requests"])]
+                p50 = statistics.median(samples)
+                p95 = statistics.quantiles(samples, n=20)[18]
+                baseline = baseline or p50
+
+                self.stdout.write(
+                    f"{label:<28} {p50:>8.2f} {p95:>8.2f} {p50 - baseline:>+9.2f} "
+                    f"{len(opened) / options['requests']:>13.2f}"
+                )
+        finally:
+            connection_created.disconnect(count)
+            connection.close()
+            settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"] = original
+
+    def default_path(self):
+        product = Product.objects.filter(is_active=True).only("id").first()
+        if product is None:
+            raise CommandError("No products to request; run seed_marketplace first or pass --path.")
+        return f"/products/{product.id}/"
+
+    def request(self, handler, path):
+        environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET"}
+        setup_testing_defaults(environ)
+
+        start = time.perf_counter()
+        response = handler(environ, lambda status, headers: None)
+        for _ in response:
+            pass
+        # Sends request_finished, where Django closes or keeps the connection
+        response.close()
+        elapsed = time.perf_counter() - start
+
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code}.")
+        return elapsed * 1000
@@ -0,0 +1,243 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from core.instrumentation import record_queries
+from marketplace.models import ArtisanProfile, Category, Material, Product
+
+RESULTS_DIR = settings.BASE_DIR / "benchmarks"
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the main pages through the test client against the current "
+        "database (see seed_marketplace) and reports latency percentiles, "
+        "queries per request and throughput. Results are saved as JSON "
+        "named after the git commit, for comparison between commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=100,
+            help="Timed requests per scenario (default 100).",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=5,
+            help="Untimed requests per scenario first (default 5).",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            help="Only run the named scenario(s).",
+        )
+        parser.add_argument(
+            "--cold-cache",
+            action="store_true",
+            help="Clear the catalog cache before every request.",
+        )
+        parser.add_argument(
+            "--output",
+            help=f"Where to save the results (default {RESULTS_DIR}/<commit>.json).",
+        )
+        parser.add_argument(
+            "--compare",
+            help="A previous results file to print deltas against.",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(0)
+        scenarios = self.scenarios()
+
+        if options["scenario"]:
+            unknown = set(options["scenario"]) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+            scenarios = {name: scenarios[name] for name in options["scenario"]}
+
+        results = {}
+        self.stdout.write(
+            f"{'scenario':<20} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8} {'req/s':>8}"
+        )
+
+        for name, (client, requests) in scenarios.items():
+            results[name] = self.run(client, requests, options)
+            self.report(name, results[name])
+
+        commit = self.git_commit()
+        payload = {
+            "commit": commit,
+            "recorded_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "products": Product.objects.count(),
+            "requests": options["requests"],
+            "cold_cache": options["cold_cache"],
+            "results": results,
+        }
+
+        output = Path(options["output"] or RESULTS_DIR / f"{commit}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(payload, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Saved results to {output}"))
+
+        if options["compare"]:
+            self.compare(json.loads(Path(options["compare"]).read_text()), payload)
+
+    def scenarios(self):
+        products = list(
+            Product.objects.filter(is_active=True).values_list("id", flat=True)[:5000]
+        )
+        in_stock = list(
+            Product.objects.filter(is_active=True, stock__gt=0).values_list("id", flat=True)[:5000]
+        )
+        artisans = list(
+            ArtisanProfile.objects.filter(is_active=True).values_list("id", flat=True)[:1000]
+        )
+        categories = list(Category.objects.values_list("id", flat=True))
+        materials = list(Material.objects.values_list("id", flat=True))
+        buyer = (
+            User.objects
+            .filter(orders__isnull=False, artisanprofile__isnull=True)
+            .exclude(first_name="")
+            .first()
+        )
+
+        if not (in_stock and artisans and categories and materials and buyer):
+            raise CommandError("Not enough data to benchmark; run seed_marketplace first.")
+
+        anonymous = Client()
+        signed_in = Client()
+        signed_in.force_login(buyer)
+
+        def catalog():
+            query = self.random.choice([
+                "",
+                f"category={self.random.choice(categories)}",
+                f"category={self.random.choice(categories)}&material={self.random.choice(materials)}",
+                "sort=price_asc",
+                "sort=price_desc",
+                "q=vase",
+            ])
+            return "GET", f"/products/?{query}"
+
+        return {
+            "home": (anonymous, lambda: ("GET", "/")),
+            "catalog": (anonymous, catalog),
+            "product_detail": (
+                anonymous,
+                lambda: ("GET", f"/products/{self.random.choice(products)}/"),
+            ),
+            "artisan_profile": (
+                anonymous,
+                lambda: ("GET", f"/artisans/{self.random.choice(artisans)}/"),
+            ),
+            "checkout": (
+                signed_in,
+                lambda: ("GET", f"/checkout/?product={self.random.choice(in_stock)}"),
+            ),
+            "place_order": (
+                signed_in,
+                lambda: ("POST", f"/checkout/?product={self.random.choice(in_stock)}"),
+            ),
+            "profile": (signed_in, lambda: ("GET", "/profile/")),
+        }
+
+    def run(self, client, requests, options):
+        address = {
+            "full_name": "Bench Buyer",
+            "address": "1 Bench Street",
+            "city": "Pune",
+            "pincode": "411001",
+        }
+        cache = caches[settings.CATALOG_CACHE_ALIAS]
+
+        samples = []
+        queries = []
+        started = None
+
+        for i in range(options["warmup"] + options["requests"]):
+            if i == options["warmup"]:
+                started = time.perf_counter()
+            if options["cold_cache"]:
+                cache.clear()
+
+            method, url = requests()
+            with record_queries() as recorder:
+                start = time.perf_counter()
+                if method == "POST":
+                    # Orders are placed and rolled back, so repeated runs
+                    # see the same stock and order history
+                    with transaction.atomic():
+                        client.post(url, address)
+                        transaction.set_rollback(True)
+                else:
+                    client.get(url)
+                elapsed = time.perf_counter() - start
+
+            if i >= options["warmup"]:
+                samples.append(elapsed * 1000)
+                queries.append(recorder.count)
+
+        total = time.perf_counter() - started
+        percentiles = statistics.quantiles(samples, n=100, method="inclusive")
+        return {
+            "p50_ms": round(percentiles[49], 2),
+            "p95_ms": round(percentiles[94], 2),
+            "p99_ms": round(percentiles[98], 2),
+            "queries_per_request": round(statistics.mean(queries), 2),
+            "max_queries": max(queries),
+            "requests_per_second": round(len(samples) / total, 1),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<20} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+            f"{result['p99_ms']:>8.2f} {result['queries_per_request']:>8.2f} "
+            f"{result['requests_per_second']:>8.1f}"
+        )
+
+    def compare(self, before, after):
+        self.stdout.write(f"\nChange since {before['commit']} (negative is faster):")
+        for name, result in after["results"].items():
+            previous = before["results"].get(name)
+            if not previous:
+                continue
+            deltas = [
+                f"{key} {self.delta(previous[key], result[key])}"
+                for key in ("p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+            ]
+            self.stdout.write(f"{name:<20} " + "  ".join(deltas))
+
+    def delta(self, before, after):
+        if not before:
+            return f"{after:+.2f}"
+        return f"{(after - before) / before:+.0%}"
+
+    def git_commit(self):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+            dirty = subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return "unknown"
+        return f"{commit}-dirty" if dirty else commit
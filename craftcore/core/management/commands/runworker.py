@@ -0,0 +1,97 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued background jobs from the database. Each of the "
+        "--concurrency threads claims and runs one job at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of worker threads (default 1).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when the queue is empty (default 1).",
+        )
+        parser.add_argument(
+            "--backoff",
+            type=float,
+            default=jobs.DEFAULT_BACKOFF,
+            help="Seconds before the first retry; doubled on each further attempt.",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=600,
+            help="Requeue jobs that have been running longer than this many seconds.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stop = threading.Event()
+        self.processed = 0
+        self.lock = threading.Lock()
+
+        signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+
+        jobs.requeue_stale(options["stale_after"])
+
+        host = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(target=self.work, args=(f"{host}:{n}",), daemon=True)
+            for n in range(options["concurrency"])
+        ]
+        for thread in threads:
+            thread.start()
+
+        self.stdout.write(f"Worker started with {len(threads)} thread(s).")
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            self.stdout.write("Finishing running jobs...")
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {self.processed} job(s)."))
+
+    def work(self, worker_id):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = jobs.claim(worker_id)
+
+                if job is None:
+                    if self.options["burst"]:
+                        return
+                    self.stop.wait(self.options["poll_interval"])
+                    continue
+
+                jobs.run(job, backoff=self.options["backoff"])
+                with self.lock:
+                    self.processed += 1
+        finally:
+            connection.close()
@@ -0,0 +1,268 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from marketplace import recommendations, search
+from marketplace.cache import invalidate_catalog
+from marketplace.images import PRODUCT_DERIVATIVES, build_derivatives
+from marketplace.models import ArtisanProfile, Category, Material, Product
+from orders.models import ArtisanDailySales, Order, OrderItem, ProductDailySales
+from orders.utils import rebuild_daily_sales, rebuild_sales_counters
+
+SEED_PREFIX = "seed-"
+SEED_PASSWORD = "seed-password"
+
+CATEGORY_NAMES = [
+    "Pottery", "Textiles", "Jewellery", "Woodwork", "Metalwork", "Paintings",
+    "Home Decor", "Toys", "Bags", "Stationery", "Candles", "Basketry",
+]
+MATERIAL_NAMES = [
+    "Clay", "Cotton", "Silk", "Brass", "Wood", "Bamboo", "Jute", "Silver",
+    "Glass", "Leather", "Wool", "Paper",
+]
+ADJECTIVES = [
+    "Hand-painted", "Carved", "Woven", "Embroidered", "Glazed", "Rustic",
+    "Block-printed", "Hammered", "Beaded", "Polished", "Miniature", "Heirloom",
+]
+NOUNS = [
+    "Vase", "Bowl", "Scarf", "Necklace", "Lamp", "Tray", "Cushion Cover",
+    "Wall Hanging", "Earrings", "Planter", "Coaster Set", "Tote", "Diary",
+]
+CITIES = ["Jaipur", "Pune", "Kutch", "Varanasi", "Mysuru", "Kolkata", "Moradabad", "Channapatna"]
+PLACEHOLDER_COLOURS = [
+    "#b5651d", "#8b4513", "#d2b48c", "#556b2f", "#4682b4", "#800020",
+    "#c19a6b", "#2f4f4f", "#daa520", "#708090", "#a0522d", "#6b8e23",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generates a realistic marketplace: users, artisans, categories, "
+        "materials, products with placeholder images and a year of orders. "
+        "Seeded users are named seed-*; --clear removes them and their data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--artisans", type=int, default=200)
+        parser.add_argument("--categories", type=int, default=len(CATEGORY_NAMES))
+        parser.add_argument("--materials", type=int, default=len(MATERIAL_NAMES))
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--orders", type=int, default=20_000)
+        parser.add_argument(
+            "--max-items",
+            type=int,
+            default=4,
+            help="Most distinct products in one order (default 4).",
+        )
+        parser.add_argument(
+            "--random-seed",
+            type=int,
+            default=0,
+            help="Seed for the generator, so runs are reproducible.",
+        )
+        parser.add_argument(
+            "--skip-recommendations",
+            action="store_true",
+            help="Don't rebuild the similar-products index afterwards.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously seeded users (and their artisans, products and orders) first.",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["random_seed"])
+        started = time.perf_counter()
+
+        if options["artisans"] > options["users"]:
+            options["artisans"] = options["users"]
+
+        with transaction.atomic():
+            if options["clear"]:
+                self.clear()
+
+            categories = self.reference_rows(Category, CATEGORY_NAMES, options["categories"])
+            materials = self.reference_rows(Material, MATERIAL_NAMES, options["materials"])
+            users = self.create_users(options["users"])
+            artisans = self.create_artisans(users[:options["artisans"]])
+            products = self.create_products(options["products"], artisans, categories, materials)
+            self.create_orders(options["orders"], users, products, options["max_items"])
+
+            self.step("Rebuilding sales counters", lambda: rebuild_sales_counters(
+                OrderItem.objects.all(), Product.objects.all(), ArtisanProfile.objects.all(),
+            ))
+            self.step("Rebuilding daily sales", lambda: rebuild_daily_sales(
+                OrderItem.objects.all(), ProductDailySales.objects.all(), ArtisanDailySales.objects.all(),
+            ))
+            self.step("Rebuilding search index", search.rebuild)
+
+        if not options["skip_recommendations"]:
+            self.step("Rebuilding similar products", recommendations.rebuild)
+
+        invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded marketplace in {time.perf_counter() - started:.1f}s. "
+            f"Seeded users log in with password '{SEED_PASSWORD}'."
+        ))
+
+    def step(self, label, func):
+        start = time.perf_counter()
+        result = func()
+        self.stdout.write(f"{label}: {time.perf_counter() - start:.1f}s")
+        return result
+
+    def clear(self):
+        users = User.objects.filter(username__startswith=SEED_PREFIX)
+        # Orders reference products across sellers, so remove them first
+        OrderItem.objects.filter(product__artisan__user__in=users).delete()
+        Order.objects.filter(buyer__in=users).delete()
+        deleted, _ = users.delete()
+        self.stdout.write(f"Cleared {deleted} previously seeded row(s).")
+
+    def reference_rows(self, model, names, count):
+        names = [
+            names[i] if i < len(names) else f"{names[i % len(names)]} {i // len(names) + 1}"
+            for i in range(count)
+        ]
+        model.objects.bulk_create([model(name=name) for name in names], ignore_conflicts=True)
+        return list(model.objects.filter(name__in=names))
+
+    def create_users(self, count):
+        offset = User.objects.filter(username__startswith=SEED_PREFIX).count()
+        # Hashing is the slow part of creating users; every seeded user
+        # shares one hash
+        password = make_password(SEED_PASSWORD)
+
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=f"{SEED_PREFIX}{offset + i}@example.com",
+                    email=f"{SEED_PREFIX}{offset + i}@example.com",
+                    first_name=f"Seed{offset + i}",
+                    last_name="User",
+                    password=password,
+                )
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+        self.stdout.write(f"Created {len(users)} users.")
+        return list(User.objects.filter(username__startswith=SEED_PREFIX).order_by("-id")[:count])
+
+    def create_artisans(self, users):
+        ArtisanProfile.objects.bulk_create(
+            (
+                ArtisanProfile(
+                    user=user,
+                    display_name=f"{user.first_name} Crafts",
+                    location=self.random.choice(CITIES),
+                    story="Family workshop making traditional pieces by hand for three generations.",
+                )
+                for user in users
+            ),
+            batch_size=1000,
+        )
+        artisans = list(ArtisanProfile.objects.filter(user__in=users))
+        self.stdout.write(f"Created {len(artisans)} artisans.")
+        return artisans
+
+    def placeholders(self):
+        # A handful of shared images with prebuilt derivatives, so seeded
+        # pages render the same markup as real ones without thousands of files
+        images = []
+        for i, colour in enumerate(PLACEHOLDER_COLOURS):
+            name = f"products/seed/placeholder-{i}.jpg"
+            if not default_storage.exists(name):
+                buffer = BytesIO()
+                Image.new("RGB", (1200, 1200), colour).save(buffer, "JPEG", quality=80)
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+
+            field = Product(image=name).image
+            images.append((name, build_derivatives(field, PRODUCT_DERIVATIVES)))
+        return images
+
+    def create_products(self, count, artisans, categories, materials):
+        images = self.placeholders()
+        now = timezone.now()
+
+        products = []
+        for i in range(count):
+            image, derivatives = self.random.choice(images)
+            stock = self.random.choice([0] + [self.random.randint(1, 50)] * 9)
+            products.append(Product(
+                artisan=self.random.choice(artisans),
+                name=f"{self.random.choice(ADJECTIVES)} {self.random.choice(NOUNS)}",
+                description="Handmade in small batches using traditional techniques.",
+                price=Decimal(f"{self.random.lognormvariate(7, 0.8):.2f}"),
+                image=image,
+                image_derivatives=derivatives,
+                stock=stock,
+                is_out_of_stock=stock == 0,
+                is_active=self.random.random() > 0.05,
+                category=self.random.choice(categories),
+                material=self.random.choice(materials),
+            ))
+
+        products = Product.objects.bulk_create(products, batch_size=1000)
+
+        # created_at is auto_now_add, so spread it over the past year
+        # afterwards; the "newest" sort needs realistic timestamps
+        for product in products:
+            product.created_at = now - timedelta(minutes=self.random.randint(0, 525_600))
+        Product.objects.bulk_update(products, ["created_at"], batch_size=1000)
+
+        self.stdout.write(f"Created {len(products)} products.")
+        return [product for product in products if product.is_active]
+
+    def create_orders(self, count, users, products, max_items):
+        if not products or not users:
+            return
+
+        now = timezone.now()
+        # A long tail: a few products sell far more than the rest
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(products))))
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+
+        orders = Order.objects.bulk_create(
+            (
+                Order(buyer=self.random.choice(users), status=self.random.choice(statuses))
+                for _ in range(count)
+            ),
+            batch_size=1000,
+        )
+        for order in orders:
+            order.created_at = now - timedelta(minutes=self.random.randint(0, 525_600))
+        Order.objects.bulk_update(orders, ["created_at"], batch_size=1000)
+
+        items = []
+        for order in orders:
+            lines = {
+                product.id: product
+                for product in self.random.choices(products, cum_weights=cum_weights, k=self.random.randint(1, max_items))
+            }
+            items.extend(
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=self.random.randint(1, 3),
+                    price_at_purchase=product.price,
+                )
+                for product in lines.values()
+            )
+        OrderItem.objects.bulk_create(items, batch_size=2000)
+
+        self.stdout.write(f"Created {len(orders)} orders with {len(items)} items.")
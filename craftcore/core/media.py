@@ -0,0 +1,128 @@
+import mimetypes
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def byte_range(header, size):
+    # (first, last) byte, inclusive, for a single "bytes=" range. None
+    # means send the whole file: no header, or one we don't handle such
+    # as multiple ranges. ValueError means the range starts past the end.
+    match = RANGE.match(header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the final N bytes
+        if int(last) == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - int(last), 0), size - 1
+
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size:
+        raise ValueError("Range starts past the end of the file")
+    if first > last:
+        return None
+    return first, last
+
+
+def read_range(path, first, length):
+    with path.open("rb") as file:
+        file.seek(first)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(request, path, size, last_modified, content_type):
+    # The If-Range validator must still match, or the client's partial
+    # copy is stale and it gets the whole file again
+    header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range != last_modified:
+        header = None
+
+    try:
+        requested = byte_range(header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if requested is None:
+        response = FileResponse(path.open("rb"), content_type=content_type)
+    else:
+        first, last = requested
+        length = last - first + 1
+        response = StreamingHttpResponse(
+            read_range(path, first, length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Range"] = f"bytes {first}-{last}/{size}"
+        response["Content-Length"] = str(length)
+
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+# Serves uploads from MEDIA_ROOT. With MEDIA_ACCEL_REDIRECT (nginx) or
+# MEDIA_SENDFILE (Apache) the web server sends the file, ranges included,
+# and this only checks the path; otherwise the file is streamed from here
+# with single-range support for resumed and partial downloads.
+@require_safe
+def serve_media(request, path):
+    try:
+        fullpath = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+
+    if not fullpath.is_file():
+        raise Http404("Not found")
+
+    stat = fullpath.stat()
+    last_modified = http_date(stat.st_mtime)
+    cache_control = f"public, max-age={settings.MEDIA_MAX_AGE}"
+
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime):
+        response = HttpResponseNotModified()
+        response["Cache-Control"] = cache_control
+        return response
+
+    content_type, _ = mimetypes.guess_type(fullpath.name)
+    content_type = content_type or "application/octet-stream"
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + quote(path)
+    elif settings.MEDIA_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = str(fullpath)
+    else:
+        response = file_response(request, fullpath, stat.st_size, last_modified, content_type)
+
+    response["Last-Modified"] = last_modified
+    response["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,46 @@
+import logging
+
+from django.conf import settings
+
+from .instrumentation import record_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryInstrumentationMiddleware:
+    # Logs query count, DB time and repeated query shapes for every request,
+    # keyed by view name. Enabled with QUERY_INSTRUMENTATION; requests over
+    # QUERY_WARNING_THRESHOLD queries or with duplicates log at WARNING.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "QUERY_INSTRUMENTATION", False)
+        self.threshold = getattr(settings, "QUERY_WARNING_THRESHOLD", 20)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        with record_queries() as recorder:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        summary = recorder.summary()
+
+        noisy = summary["queries"] > self.threshold or summary["duplicates"]
+        logger.log(
+            logging.WARNING if noisy else logging.INFO,
+            "%s %s: %d queries, %.2f ms in DB, %d duplicate(s)",
+            request.method,
+            view,
+            summary["queries"],
+            summary["db_ms"],
+            summary["duplicate_queries"],
+            extra={"view": view, **summary},
+        )
+
+        for sql, count in summary["duplicates"].items():
+            logger.debug("  %dx %s", count, sql)
+
+        return response
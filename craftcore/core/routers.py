@@ -0,0 +1,146 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# Session key holding the time until which this session reads from the
+# primary, so a buyer or seller sees their own writes on the next pages
+# even while the replicas catch up
+SESSION_KEY = "db_pinned_until"
+
+# Sessions are read at the start of every request and written at the
+# end of many; they always use the primary and don't count as writes
+PRIMARY_ONLY_APPS = frozenset({"sessions"})
+
+_request = ContextVar("db_routing", default=None)
+_primary = ContextVar("db_primary", default=False)
+
+
+class RequestRouting:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica_reads = False
+        self.replica = None
+
+
+def replica_reads(view):
+    # Lets a read-only view's queries go to a replica, unless this
+    # request or session has written recently
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            routing = _request.get()
+            if routing is None:
+                return await view(request, *args, **kwargs)
+
+            # Pick the replica up front: queries the view runs at the same
+            # time (core.async_db.gather) must all read the same one
+            if settings.DATABASE_REPLICAS and routing.replica is None:
+                routing.replica = random.choice(settings.DATABASE_REPLICAS)
+
+            routing.replica_reads = True
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                routing.replica_reads = False
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        routing = _request.get()
+        if routing is None:
+            return view(request, *args, **kwargs)
+
+        routing.replica_reads = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            routing.replica_reads = False
+
+    return wrapper
+
+
+@contextmanager
+def primary():
+    # Reads inside the block use the primary, e.g. when the result is
+    # shared through a cache and must not be a lagging replica's copy
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+@contextmanager
+def request_routing(pinned=False):
+    routing = RequestRouting(pinned)
+    token = _request.set(routing)
+    try:
+        yield routing
+    finally:
+        _request.reset(token)
+
+
+class ReplicaRouter:
+    # Sends reads from @replica_reads views to one of DATABASE_REPLICAS
+    # (one per request, so a page sees a single consistent snapshot).
+    # Everything else, and every request after a write in it or in its
+    # session's last REPLICA_PIN_SECONDS, uses the primary.
+
+    def db_for_read(self, model, **hints):
+        routing = _request.get()
+        if (
+            routing is None
+            or not routing.replica_reads
+            or routing.pinned
+            or _primary.get()
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+            or not settings.DATABASE_REPLICAS
+        ):
+            return None
+
+        if routing.replica is None:
+            routing.replica = random.choice(settings.DATABASE_REPLICAS)
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _request.get()
+        if routing is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            routing.pinned = True
+            routing.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    # Tracks writes for ReplicaRouter; must come after SessionMiddleware
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        pinned = request.session.get(SESSION_KEY, 0) > time.time()
+        with request_routing(pinned) as routing:
+            response = self.get_response(request)
+
+        if routing.wrote:
+            request.session[SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+
+        return response
@@ -0,0 +1,115 @@
+import re
+from contextlib import ExitStack
+
+from django.contrib.auth.models import User
+from django.db import connections
+from marketplace.models import ArtisanProfile, Product
+
+from .instrumentation import record_queries
+
+# How each backend reports reading a whole table
+FULL_SCAN = {
+    "sqlite": re.compile(r"^SCAN (\w+)$"),
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+}
+# SQLite walking a whole index only to sort the rows afterwards, which
+# reads every row as surely as a table scan
+SORTED_INDEX_SCAN = re.compile(r"^SCAN (\w+) USING (?:COVERING )?INDEX ")
+SQLITE_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+
+def create_artisan(user=None, **fields):
+    # A seller for tests; `fields` override the profile defaults
+    if user is None:
+        user = User.objects.create_user(username="seller@example.com", first_name="Sam")
+    return ArtisanProfile.objects.create(user=user, **{
+        "display_name": "Seller",
+        "location": "Pune",
+        "story": "Makes things by hand for the tests.",
+        **fields,
+    })
+
+
+def create_product(artisan, name="Clay pot", **fields):
+    return Product.objects.create(artisan=artisan, name=name, **{
+        "description": name,
+        "price": 100,
+        "image": "products/item.jpg",
+        **fields,
+    })
+
+
+class QueryBudgetMixin:
+    # TestCase mixin: fail when a request runs more queries than budgeted,
+    # listing the repeated query shapes that usually explain why
+
+    def assertQueryBudget(self, budget, method, url, data=None, **extra):
+        with record_queries() as recorder:
+            response = getattr(self.client, method.lower())(url, data, **extra)
+
+        if recorder.count > budget:
+            duplicates = "\n".join(
+                f"  {count}x {sql}" for sql, count in recorder.duplicates.items()
+            )
+            self.fail(
+                f"{method} {url} ran {recorder.count} queries, budget is {budget}."
+                + (f"\nRepeated queries:\n{duplicates}" if duplicates else "")
+            )
+
+        return response
+
+
+class QueryPlanMixin:
+    # TestCase mixin: EXPLAIN every SELECT a request runs and fail when
+    # one reads a whole table instead of going through an index
+
+    # Tables small enough that scanning them is the right plan
+    scan_allowed_tables = frozenset()
+
+    def assertNoFullScans(self, method, url, data=None, **extra):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith("SELECT"):
+                statements.append((context["connection"], sql, params))
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(capture))
+            response = getattr(self.client, method.lower())(url, data, **extra)
+
+        for connection, sql, params in statements:
+            scans = self.full_scans(connection, sql, params) - self.scan_allowed_tables
+            if scans:
+                self.fail(
+                    f"{method} {url} scans {', '.join(sorted(scans))}:\n  {sql}"
+                )
+
+        return response
+
+    def full_scans(self, connection, sql, params):
+        pattern = FULL_SCAN.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f"No query plan check for {connection.vendor}")
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Test tables are small enough that the planner would
+                # rightly prefer sequential scans; only fall back to them
+                # when no index applies
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            plan = [str(row[-1]).strip() for row in cursor.fetchall()]
+
+        patterns = [pattern]
+        if connection.vendor == "sqlite" and SQLITE_SORT in plan:
+            patterns.append(SORTED_INDEX_SCAN)
+
+        return {
+            match.group(1)
+            for line in plan
+            for regex in patterns
+            for match in [regex.search(line)]
+            if match
+        }
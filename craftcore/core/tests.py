@@ -1,3 +1,543 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts import urls as accounts_urls
+from accounts.middleware import ONBOARDED_SESSION_KEY
+from marketplace import cache as catalog_cache
+from marketplace import recommendations
+from marketplace import urls as marketplace_urls
+from marketplace.models import ArtisanProfile, Category, Material, Product, SimilarProduct
+from marketplace.reference import CATEGORIES, MATERIALS
+from marketplace.roles import SESSION_KEY as ROLE_SESSION_KEY, role_for
+from orders import urls as orders_urls
+from orders.cart import CART_SESSION_KEY
+from orders.models import ArtisanDailySales, Order, OrderItem, ProductDailySales
+from orders.utils import check_daily_sales, check_sales_counters
+
+from . import jobs, routers
+from . import urls as core_urls
+from .async_db import gather
+from .instrumentation import fingerprint
+from .models import Job
+from .testing import QueryBudgetMixin, QueryPlanMixin, create_artisan, create_product
+from .views import home_async_view, home_listing
+
+CALLS = []
+
+
+def record_call(**kwargs):
+    CALLS.append(kwargs)
+
+
+def always_fail(**kwargs):
+    raise RuntimeError("boom")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_claimed_job_runs_once(self):
+        job = jobs.enqueue("core.tests.record_call", product_id=7)
+
+        claimed = jobs.claim("worker-1")
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, "running")
+        self.assertEqual(claimed.attempts, 1)
+
+        # Already running, so a second worker finds nothing
+        self.assertIsNone(jobs.claim("worker-2"))
+
+        jobs.run(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(CALLS, [{"product_id": 7}])
+
+    def test_delayed_job_is_not_claimed_early(self):
+        jobs.enqueue("core.tests.record_call", delay=60)
+        self.assertIsNone(jobs.claim("worker-1"))
+
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue("core.tests.always_fail", max_attempts=2)
+
+        with self.assertLogs("core.jobs", "ERROR"):
+            jobs.run(jobs.claim("worker-1"), backoff=30)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=25))
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        with self.assertLogs("core.jobs", "ERROR"):
+            jobs.run(jobs.claim("worker-1"), backoff=30)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 2)
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue("core.tests.record_call")
+        jobs.claim("worker-1")
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale(600), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    # Every named URL in the project's apps, with the most queries one
+    # request may run against the fixture below. The catalog cache is
+    # cleared first, so listing budgets cover the uncached path; the
+    # per-process category/material tables are warm, as they are after a
+    # worker's first request.
+    #
+    # name: [(as user, method, kwargs, query string / POST data, budget)]
+    BUDGETS = {
+        "home": [(None, "GET", {}, None, 2)],
+        "login": [(None, "GET", {}, None, 0)],
+        "onboarding": [("newcomer", "GET", {}, None, 2)],
+        "logout": [("buyer", "GET", {}, None, 4)],
+        "profile": [
+            ("buyer", "GET", {}, None, 5),
+            ("seller", "GET", {}, None, 5),
+        ],
+        "become_artisan": [("buyer", "GET", {}, None, 2)],
+        "update_artisan": [("seller", "GET", {}, None, 3)],
+        "add_product": [("seller", "GET", {}, None, 3)],
+        "import_products": [("seller", "GET", {}, None, 3)],
+        "products": [
+            (None, "GET", {}, None, 3),
+            (None, "GET", {}, "filtered", 3),
+        ],
+        # One more than the page needs: the conditional GET lookup
+        "product_detail": [(None, "GET", {"product_id": "pot"}, None, 4)],
+        "artisan_profile": [(None, "GET", {"artisan_id": "artisan"}, None, 4)],
+        "edit_product": [("seller", "GET", {"product_id": "pot"}, None, 4)],
+        "delete_product": [("seller", "GET", {"product_id": "pot"}, None, 4)],
+        "deactivate_artisan": [("seller", "POST", {}, None, 11)],
+        "checkout": [("buyer", "GET", {}, "buy_now", 3)],
+        "order_confirmation": [("buyer", "GET", {"order_id": "order"}, None, 3)],
+        "cart": [("buyer", "GET", {}, None, 3)],
+        "add_to_cart": [("buyer", "POST", {"product_id": "pot"}, None, 6)],
+        "update_cart": [("buyer", "POST", {}, "cart_update", 5)],
+        "cart_checkout": [("buyer", "GET", {}, None, 3)],
+        "seller_analytics": [("seller", "GET", {}, None, 5)],
+        # The export's queries run as the response streams, after the view
+        # returns; this only covers the view itself
+        "catalog_export": [(None, "GET", {"fmt": "ndjson"}, None, 0)],
+    }
+
+    def setUp(self):
+        cache.clear()
+
+        categories = [Category.objects.create(name=f"Category {i}") for i in range(3)]
+        materials = [Material.objects.create(name=f"Material {i}") for i in range(3)]
+
+        self.users = {
+            "seller": User.objects.create_user(username="seller@example.com", first_name="Sam"),
+            "buyer": User.objects.create_user(username="buyer@example.com", first_name="Bea"),
+            "newcomer": User.objects.create_user(username="new@example.com"),
+        }
+        artisan = create_artisan(self.users["seller"])
+        products = [
+            create_product(
+                artisan, f"Product {i}", category=categories[i % 3],
+                material=materials[i % 3], price=100 + i, stock=10,
+            )
+            for i in range(8)
+        ]
+        recommendations.rebuild()
+
+        orders = [Order.objects.create(buyer=self.users["buyer"]) for _ in range(3)]
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, price_at_purchase=product.price)
+            for order in orders
+            for product in products[:2]
+        )
+
+        self.objects = {
+            "pot": products[0].id,
+            "artisan": artisan.id,
+            "order": orders[0].id,
+            "ndjson": "ndjson",
+        }
+        self.params = {
+            "filtered": {
+                "category": [categories[0].id, categories[1].id],
+                "material": materials[0].id,
+                "q": "product",
+                "in_stock": 1,
+            },
+            "buy_now": {"product": products[0].id},
+            "cart_update": {f"quantity_{products[1].id}": 2},
+        }
+        self.cart = {str(product.id): 1 for product in products[:3]}
+
+    def test_every_named_url_has_a_budget(self):
+        names = {
+            pattern.name
+            for urls in (core_urls, accounts_urls, marketplace_urls, orders_urls)
+            for pattern in urls.urlpatterns
+        }
+        self.assertEqual(names, set(self.BUDGETS))
+
+    def test_query_budgets(self):
+        for name, cases in self.BUDGETS.items():
+            for user, method, kwargs, params, budget in cases:
+                with self.subTest(name=name, user=user, params=params), transaction.atomic():
+                    self.client.logout()
+                    cache.clear()
+                    CATEGORIES.all()
+                    MATERIALS.all()
+
+                    if user:
+                        self.client.force_login(self.users[user])
+                        session = self.client.session
+                        session[CART_SESSION_KEY] = dict(self.cart)
+                        # As stored by the user's first request
+                        session[ROLE_SESSION_KEY] = role_for(
+                            self.users[user],
+                            ArtisanProfile.objects.filter(user=self.users[user]).first(),
+                        )
+                        session[ONBOARDED_SESSION_KEY] = str(self.users[user].pk)
+                        session.save()
+
+                    url = reverse(name, kwargs={
+                        key: self.objects[value] for key, value in kwargs.items()
+                    })
+                    data = self.params[params] if params else None
+                    self.assertQueryBudget(budget, method, url, data)
+
+                    # Each case starts from the same fixture
+                    transaction.set_rollback(True)
+
+
+class QueryInstrumentationTests(TestCase):
+    def test_fingerprint_collapses_parameters(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND n = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND n = ? LIMIT ?",
+        )
+
+    @override_settings(QUERY_INSTRUMENTATION=True)
+    def test_logs_summary_per_view(self):
+        cache.clear()
+        with self.assertLogs("core.middleware", "INFO") as logs:
+            self.client.get(reverse("products"))
+
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.view, "products")
+        self.assertGreater(record.queries, 0)
+        self.assertIn("GET products:", record.getMessage())
+
+
+class SeedMarketplaceTests(TestCase):
+    def test_seeds_consistent_data(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            call_command(
+                "seed_marketplace",
+                users=20, artisans=5, products=40, orders=30,
+                stdout=StringIO(),
+            )
+
+        self.assertEqual(User.objects.filter(username__startswith="seed-").count(), 20)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertTrue(Product.objects.exclude(image_derivatives={}).exists())
+        self.assertTrue(SimilarProduct.objects.exists())
+
+        # Counters were rebuilt from the generated order history
+        self.assertEqual(
+            check_sales_counters(OrderItem.objects.all(), Product.objects.all(), ArtisanProfile.objects.all()),
+            [],
+        )
+        self.assertEqual(
+            check_daily_sales(OrderItem.objects.all(), ProductDailySales.objects.all(), ArtisanDailySales.objects.all()),
+            [],
+        )
+
+
+class QueryPlanTests(QueryPlanMixin, TestCase):
+    # Categories and materials are a few dozen rows, cached per process
+    scan_allowed_tables = frozenset({"marketplace_category", "marketplace_material"})
+
+    @classmethod
+    def setUpTestData(cls):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            call_command(
+                "seed_marketplace",
+                users=60, artisans=10, products=600, orders=400,
+                stdout=StringIO(),
+            )
+
+        cls.product = Product.objects.filter(is_active=True).first()
+        cls.artisan = cls.product.artisan
+        cls.buyer = User.objects.filter(orders__isnull=False, artisanprofile__isnull=True).first()
+        cls.category = Category.objects.first()
+        cls.material = Material.objects.first()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_public_pages_use_indexes(self):
+        pages = [
+            reverse("home"),
+            reverse("products"),
+            reverse("products") + "?sort=price_asc",
+            reverse("products") + "?sort=price_desc",
+            reverse("products") + f"?category={self.category.id}",
+            reverse("products") + f"?material={self.material.id}",
+            reverse("products") + f"?category={self.category.id}&material={self.material.id}",
+            reverse("products") + "?q=vase",
+            reverse("product_detail", args=[self.product.id]),
+            reverse("artisan_profile", args=[self.artisan.id]),
+        ]
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertNoFullScans("GET", url)
+
+    def test_later_catalog_pages_use_indexes(self):
+        # Keyset cursors add a range condition on the sort key
+        for sort in ["newest", "price_asc", "price_desc"]:
+            next_url = self.client.get(reverse("products"), {"sort": sort}).context["next_url"]
+            with self.subTest(sort=sort):
+                self.assertIsNotNone(next_url)
+                self.assertNoFullScans("GET", reverse("products") + next_url)
+
+    def test_account_pages_use_indexes(self):
+        for user in [self.buyer, self.artisan.user]:
+            self.client.force_login(user)
+            with self.subTest(user=user.username):
+                self.assertNoFullScans("GET", reverse("profile"))
+                self.assertNoFullScans("GET", reverse("profile") + "?orders_page=2")
+
+
+class ReferenceDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pottery = Category.objects.create(name="Pottery")
+
+    def test_lookups_skip_the_database_until_changed(self):
+        CATEGORIES.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(CATEGORIES.get(self.pottery.id).name, "Pottery")
+            self.assertEqual(CATEGORIES.names(), {self.pottery.id: "Pottery"})
+            self.assertIsNone(CATEGORIES.get("not-an-id"))
+
+        # A save anywhere bumps the shared version, so every process reloads
+        self.pottery.name = "Ceramics"
+        self.pottery.save()
+        Category.objects.filter(id=self.pottery.id).update(name="Stoneware")
+        self.assertEqual(CATEGORIES.names(), {self.pottery.id: "Stoneware"})
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTests(TestCase):
+    # Routing decisions only: no query ever runs against "replica"
+
+    def setUp(self):
+        self.session = {}
+
+    def get(self, view):
+        request = RequestFactory().get("/")
+        request.session = self.session
+        return routers.ReplicaRoutingMiddleware(view)(request).content.decode()
+
+    @staticmethod
+    @routers.replica_reads
+    def catalog_view(request):
+        return HttpResponse(Product.objects.all().db)
+
+    @staticmethod
+    def checkout_view(request):
+        return HttpResponse(Product.objects.all().db)
+
+    @staticmethod
+    @routers.replica_reads
+    def writing_view(request):
+        Category.objects.create(name="Pottery")
+        return HttpResponse(Product.objects.all().db)
+
+    def test_catalog_views_read_from_a_replica(self):
+        self.assertEqual(self.get(self.catalog_view), "replica")
+
+    def test_other_views_read_from_the_primary(self):
+        self.assertEqual(self.get(self.checkout_view), "default")
+
+    def test_write_pins_the_rest_of_the_request(self):
+        self.assertEqual(self.get(self.writing_view), "default")
+
+    def test_write_pins_the_session_until_replicas_catch_up(self):
+        self.get(self.writing_view)
+        self.assertEqual(self.get(self.catalog_view), "default")
+
+        self.session[routers.SESSION_KEY] -= 10
+        self.assertEqual(self.get(self.catalog_view), "replica")
+
+    def test_session_writes_do_not_pin(self):
+        @routers.replica_reads
+        def view(request):
+            request.session["cart"] = {"1": 1}
+            return HttpResponse(Product.objects.all().db)
+
+        self.assertEqual(self.get(view), "replica")
+        self.assertNotIn(routers.SESSION_KEY, self.session)
+
+    def test_shared_cache_entries_are_built_on_the_primary(self):
+        cache.clear()
+
+        @routers.replica_reads
+        def view(request):
+            return HttpResponse(
+                catalog_cache.get_or_build("db", None, lambda: Product.objects.all().db)
+            )
+
+        self.assertEqual(self.get(view), "default")
+
+    def test_outside_requests_use_the_primary(self):
+        self.assertEqual(Product.objects.all().db, "default")
+
+    @override_settings(DATABASE_REPLICAS=["replica_a", "replica_b"])
+    def test_async_views_read_one_replica_from_every_thread(self):
+        @routers.replica_reads
+        async def view(request):
+            databases = await gather(*[lambda: Product.objects.all().db] * 4)
+            return HttpResponse(",".join(set(databases)))
+
+        for _ in range(10):
+            self.assertIn(self.get(async_to_sync(view)), ["replica_a", "replica_b"])
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(router.allow_migrate("replica", "marketplace"))
+        self.assertTrue(router.allow_migrate("default", "marketplace"))
+
+
+class AsyncQueryTests(TransactionTestCase):
+    def query(self):
+        return threading.current_thread().name, Category.objects.count()
+
+    def test_queries_run_at_the_same_time_on_pool_threads(self):
+        Category.objects.create(name="Pottery")
+
+        results = async_to_sync(gather)(self.query, self.query)
+
+        self.assertEqual([count for _, count in results], [1, 1])
+        for thread, _ in results:
+            self.assertTrue(thread.startswith("async-db"))
+
+    def test_queries_inside_a_transaction_use_its_connection(self):
+        with transaction.atomic():
+            Category.objects.create(name="Pottery")
+            results = async_to_sync(gather)(self.query, self.query)
+
+        self.assertEqual(results, [(threading.current_thread().name, 1)] * 2)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        artisan = create_artisan()
+        for name in ("Pot", "Vase"):
+            create_product(artisan, name, price=500)
+
+    def get(self, view):
+        request = RequestFactory().get("/")
+        request.session = self.client.session
+        request.user = AnonymousUser()
+        return async_to_sync(view)(request)
+
+    def test_home_page_fills_the_same_cache_entry_as_the_sync_view(self):
+        response = self.get(home_async_view)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Pot")
+        self.assertContains(response, "Vase")
+        self.assertContains(response, "Seller")
+        self.assertEqual(
+            catalog_cache.get_or_build("home", None, lambda: None)["products"],
+            home_listing()["products"],
+        )
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+        os.makedirs(os.path.join(media.name, "products"))
+        with open(os.path.join(media.name, "products", "pot.jpg"), "wb") as file:
+            file.write(bytes(range(100)))
+
+    def test_serves_whole_file_with_cache_headers(self):
+        response = self.client.get("/media/products/pot.jpg")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(100)))
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("max-age=", response["Cache-Control"])
+
+        response = self.client.get(
+            "/media/products/pot.jpg", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_serves_byte_ranges(self):
+        cases = {
+            "bytes=10-19": (range(10, 20), "bytes 10-19/100"),
+            "bytes=90-": (range(90, 100), "bytes 90-99/100"),
+            "bytes=-5": (range(95, 100), "bytes 95-99/100"),
+            "bytes=95-500": (range(95, 100), "bytes 95-99/100"),
+        }
+        for header, (expected, content_range) in cases.items():
+            with self.subTest(header=header):
+                response = self.client.get("/media/products/pot.jpg", HTTP_RANGE=header)
+
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b"".join(response.streaming_content), bytes(expected))
+                self.assertEqual(response["Content-Range"], content_range)
+                self.assertEqual(response["Content-Length"], str(len(expected)))
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        response = self.client.get("/media/products/pot.jpg", HTTP_RANGE="bytes=100-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+        # The client's copy is out of date, so it gets the whole file
+        response = self.client.get(
+            "/media/products/pot.jpg",
+            HTTP_RANGE="bytes=10-19",
+            HTTP_IF_RANGE="Thu, 01 Jan 1970 00:00:00 GMT",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_hands_transfer_to_the_web_server(self):
+        with override_settings(MEDIA_ACCEL_REDIRECT="/protected-media/"):
+            response = self.client.get("/media/products/pot.jpg")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/products/pot.jpg")
+        self.assertEqual(response.content, b"")
+
+        with override_settings(MEDIA_SENDFILE=True):
+            response = self.client.get("/media/products/pot.jpg")
+        self.assertTrue(response["X-Sendfile"].endswith(os.path.join("products", "pot.jpg")))
+
+    def test_rejects_missing_files_and_paths_outside_media(self):
+        self.assertEqual(self.client.get("/media/products/missing.jpg").status_code, 404)
+        self.assertEqual(self.client.get("/media/products/").status_code, 404)
+        self.assertEqual(self.client.get("/media/../craftcore/settings.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/%2E%2E/manage.py").status_code, 404)
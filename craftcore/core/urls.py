@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
-from .views import home_view
+from .views import home_async_view, home_view
 
 urlpatterns = [
-    path("", home_view, name="home"),
+    path("", home_async_view if settings.ASYNC_VIEWS else home_view, name="home"),
 ]
@@ -1,25 +1,49 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
+from marketplace import cache as catalog_cache
 from marketplace.models import Product, ArtisanProfile
+from .async_db import gather
+from .routers import replica_reads
 
+@replica_reads
 def home_view(request):
+    home = catalog_cache.get_or_build("home", None, home_listing)
+    return render(request, "core/home.html", home)
+
+# Served instead of home_view under ASGI (see ASYNC_VIEWS)
+@replica_reads
+async def home_async_view(request):
+    home = await catalog_cache.aget_or_build("home", None, ahome_listing)
+    # Context processors read the session and user, which is sync-only
+    return await sync_to_async(render)(request, "core/home.html", home)
+
+def latest_products():
     # Show latest products (limit for clean UI)
-    products = (
+    return list(
         Product.objects
         .filter(is_active=True, stock__gt=0, artisan__is_active=True)
-        .select_related("artisan")
+        .select_related("artisan", "category", "material")
         .order_by("-created_at")[:6]
     )
 
+def latest_artisans():
     # Show active artisans
-    artisans = (
+    return list(
         ArtisanProfile.objects
         .filter(is_active=True)
         .order_by("-created_at")[:4]
     )
 
-    context = {
+def home_listing():
+    return {
+        "products": latest_products(),
+        "artisans": latest_artisans(),
+    }
+
+async def ahome_listing():
+    # Independent queries; run them at the same time
+    products, artisans = await gather(latest_products, latest_artisans)
+    return {
         "products": products,
         "artisans": artisans,
     }
-
-    return render(request, "core/home.html", context)
@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'craftcore.settings')
+# Serve the async views (see ASYNC_VIEWS in settings) unless told otherwise
+os.environ.setdefault('ASYNC_VIEWS', '1')
+# Each ASGI request runs its sync code on a fresh thread, and a persistent
+# connection left on a finished thread is never reused or closed; connect
+# per request instead, through PgBouncer in production
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,30 @@
+# Gunicorn settings, picked up automatically when gunicorn is started from
+# this directory (gunicorn craftcore.wsgi:application).
+#
+# ASGI profile: GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker with
+# gunicorn craftcore.asgi:application. Each worker then serves many
+# requests at once on an event loop; GUNICORN_THREADS doesn't apply and
+# asgi.py turns on the async views and connect-per-request.
+
+import multiprocessing
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+
+# Every worker thread keeps its own persistent database connection
+# (DB_CONN_MAX_AGE), so the web service holds up to workers * threads of
+# them. DB_MAX_CONNECTIONS is this service's share of what the database
+# (or PgBouncer's pool) allows; workers are capped to stay within it.
+# Leave room for runworker, which holds one connection per --concurrency.
+max_connections = os.environ.get("DB_MAX_CONNECTIONS")
+if max_connections:
+    workers = max(1, min(workers, int(max_connections) // threads))
+
+# Recycle workers now and then so a slow leak can't build up; the jitter
+# keeps them from all restarting (and reconnecting) at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
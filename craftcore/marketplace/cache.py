@@ -0,0 +1,103 @@
+import hashlib
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core.routers import primary
+
+VERSION_KEY = "catalog:version"
+REFERENCE_VERSION_KEY = "reference:version"
+
+
+def catalog_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _version(key):
+    cache = catalog_cache()
+    version = cache.get(key)
+
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old
+        # version whose entries may still be cached
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def _bump(key):
+    cache = catalog_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def _invalidate(key):
+    # Bump now so this request never reads its own stale entries, and
+    # again on commit so concurrent readers can't cache pre-commit rows
+    # under the new version
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def catalog_version():
+    return _version(VERSION_KEY)
+
+
+def invalidate_catalog():
+    _invalidate(VERSION_KEY)
+
+
+def reference_version():
+    # Categories and materials; see marketplace.reference
+    return _version(REFERENCE_VERSION_KEY)
+
+
+def invalidate_reference():
+    _invalidate(REFERENCE_VERSION_KEY)
+
+
+def cache_key(name, params=None):
+    digest = hashlib.md5(
+        json.dumps(params or {}, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"catalog:{catalog_version()}:{name}:{digest}"
+
+
+def _build_on_primary(builder):
+    # Entries are shared by every reader until the next version bump, so
+    # build them from the primary: a lagging replica read just after a
+    # write would otherwise be cached under the new version
+    def build():
+        with primary():
+            return builder()
+
+    return build
+
+
+def get_or_build(name, params, builder):
+    return catalog_cache().get_or_set(
+        cache_key(name, params),
+        _build_on_primary(builder),
+        settings.CATALOG_CACHE_TIMEOUT,
+    )
+
+
+async def aget_or_build(name, params, builder):
+    # get_or_build() for async views; `builder` is a coroutine function
+    cache = catalog_cache()
+    key = await sync_to_async(cache_key)(name, params)
+
+    value = await cache.aget(key)
+    if value is None:
+        with primary():
+            value = await builder()
+        await cache.aset(key, value, settings.CATALOG_CACHE_TIMEOUT)
+
+    return value
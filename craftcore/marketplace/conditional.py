@@ -0,0 +1,125 @@
+# Validators for conditional GETs on the product and artisan pages, so a
+# repeat visit gets a 304 from one indexed lookup instead of the full set
+# of page queries and a template render.
+#
+# The ETag covers everything the page shows: the catalog version (bumped
+# by any product, artisan, category, material or similar-products change,
+# so the "similar" and "more by" lists are covered too) plus what the
+# navigation shows this viewer, all read from the cache and session.
+# Last-Modified comes from the page's own rows; clients that send both
+# are answered on the ETag, which takes precedence.
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth import SESSION_KEY as USER_SESSION_KEY
+from django.db.models import Max
+from django.db.models.functions import Coalesce, Greatest
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from orders.cart import CART_SESSION_KEY
+
+from .cache import catalog_version
+from .models import ArtisanProfile, Product
+from .roles import SESSION_KEY as ROLE_SESSION_KEY
+
+
+def viewer_key(request):
+    session = request.session
+    return (
+        session.get(USER_SESSION_KEY),
+        session.get(ROLE_SESSION_KEY),
+        sorted(session.get(CART_SESSION_KEY, {}).items()),
+        # Pending flash messages are shown once; don't let a 304 hide them
+        len(messages.get_messages(request)),
+    )
+
+
+def page_etag(request, page, last_modified):
+    if last_modified is None:
+        return None
+
+    key = repr((page, catalog_version(), last_modified.timestamp(), viewer_key(request)))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _memoized(request, key, load):
+    # condition() asks for the ETag and Last-Modified separately; look the
+    # row up once
+    cache = request.__dict__.setdefault("_validators", {})
+    if key not in cache:
+        cache[key] = load()
+    return cache[key]
+
+
+def product_last_modified(request, product_id):
+    # One row: the product joined to the artisan, category and material
+    # it displays
+    return _memoized(request, ("product", product_id), lambda: (
+        Product.objects
+        .filter(id=product_id)
+        .annotate(page_updated_at=Greatest(
+            "updated_at",
+            "artisan__updated_at",
+            # GREATEST is NULL if any argument is on SQLite
+            Coalesce("category__updated_at", "updated_at"),
+            Coalesce("material__updated_at", "updated_at"),
+        ))
+        .values_list("page_updated_at", flat=True)
+        .first()
+    ))
+
+
+def product_etag(request, product_id):
+    return page_etag(request, ("product", product_id), product_last_modified(request, product_id))
+
+
+def artisan_last_modified(request, artisan_id):
+    # The artisan and the newest change to any of their products
+    def load():
+        row = (
+            ArtisanProfile.objects
+            .filter(id=artisan_id, is_active=True)
+            .annotate(products_updated_at=Max("product__updated_at"))
+            .values_list("updated_at", "products_updated_at")
+            .first()
+        )
+        if row is None:
+            return None
+        return max(value for value in row if value is not None)
+
+    return _memoized(request, ("artisan", artisan_id), load)
+
+
+def artisan_etag(request, artisan_id):
+    return page_etag(request, ("artisan", artisan_id), artisan_last_modified(request, artisan_id))
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+    # condition() for async views. Django's own calls the validators inline,
+    # on the event loop where the ORM can't run, so run condition() around
+    # a stand-in view on a sync thread and pass its verdict and headers on.
+    def decorator(view):
+        check = sync_to_async(condition(etag_func, last_modified_func)(
+            lambda request, *args, **kwargs: HttpResponse()
+        ))
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            checked = await check(request, *args, **kwargs)
+            if checked.status_code != 200:
+                # 304 Not Modified or 412 Precondition Failed
+                return checked
+
+            response = await view(request, *args, **kwargs)
+            for header in ("ETag", "Last-Modified"):
+                if header in checked:
+                    response.headers.setdefault(header, checked[header])
+            return response
+
+        return wrapper
+
+    return decorator
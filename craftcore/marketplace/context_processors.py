@@ -0,0 +1,11 @@
+from .roles import seller_state
+
+
+def artisan(request):
+    # Flags come from the session; current_artisan only queries if used
+    is_artisan, is_seller = seller_state(request)
+    return {
+        "current_artisan": getattr(request, "artisan", None),
+        "is_artisan": is_artisan,
+        "is_seller": is_seller,
+    }
@@ -0,0 +1,181 @@
+# Catalog export for partners and shopping feeds, as NDJSON, CSV or an
+# RSS 2.0 product feed. Everything is a generator of text chunks, so the
+# export view and the export_catalog command stream it with memory bounded
+# by CHUNK_SIZE whatever the catalog size.
+
+import csv
+import io
+import json
+import re
+from xml.sax.saxutils import escape
+
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import Product
+
+CHUNK_SIZE = 2000
+CURRENCY = "INR"
+
+FIELDS = [
+    "id", "name", "description", "price", "currency", "stock", "in_stock",
+    "active", "category", "material", "artisan_id", "artisan", "url",
+    "image_url", "created_at", "updated_at",
+]
+
+# Characters XML 1.0 doesn't allow even escaped, e.g. control codes
+# pasted into a description
+XML_ILLEGAL = re.compile("[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+
+FORMATS = {
+    # format -> (content type, file extension)
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xml": ("application/rss+xml; charset=utf-8", "xml"),
+}
+
+
+def products(since=None):
+    # A full export lists what buyers can see. An incremental one lists
+    # every product whose page changed since then, including ones that
+    # went inactive (with active=false) so partners can drop them.
+    queryset = Product.objects.select_related("artisan", "category", "material")
+
+    if since is None:
+        return queryset.filter(is_active=True, artisan__is_active=True)
+
+    return queryset.filter(
+        Q(updated_at__gte=since) |
+        Q(artisan__updated_at__gte=since) |
+        Q(category__updated_at__gte=since) |
+        Q(material__updated_at__gte=since)
+    )
+
+
+def iter_products(queryset, chunk_size=CHUNK_SIZE):
+    # Keyset batches on id rather than one long .iterator() cursor: each
+    # batch is a short query, so a slow download never holds a cursor or
+    # transaction open, and memory stays bounded even where server-side
+    # cursors are unavailable (SQLite, DB_PGBOUNCER)
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by("id")[:chunk_size])
+        yield from batch
+
+        if len(batch) < chunk_size:
+            return
+        last_id = batch[-1].id
+
+
+def record(product, base_url=""):
+    artisan = product.artisan
+    return {
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "price": str(product.price),
+        "currency": CURRENCY,
+        "stock": product.stock,
+        "in_stock": not product.is_out_of_stock,
+        "active": product.is_active and artisan.is_active,
+        "category": product.category.name if product.category else None,
+        "material": product.material.name if product.material else None,
+        "artisan_id": artisan.id,
+        "artisan": artisan.display_name,
+        "url": base_url + reverse("product_detail", args=[product.id]),
+        "image_url": _absolute(base_url, product.detail_image_url) if product.image else None,
+        "created_at": product.created_at.isoformat(),
+        "updated_at": product.updated_at.isoformat(),
+    }
+
+
+def _absolute(base_url, url):
+    return url if "://" in url else base_url + url
+
+
+def ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def csv_rows(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        # Hand over what one row wrote and start again, so the buffer
+        # never holds more than a row
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+def _xml_text(value):
+    return escape(XML_ILLEGAL.sub("", str(value)))
+
+
+def xml_feed(rows, base_url=""):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n'
+        "<channel>\n"
+        "<title>CraftCore catalog</title>\n"
+        f"<link>{_xml_text(base_url + reverse('products'))}</link>\n"
+        "<description>Handmade products from CraftCore artisans</description>\n"
+    )
+
+    for row in rows:
+        availability = "in_stock" if row["in_stock"] and row["active"] else "out_of_stock"
+        elements = [
+            ("g:id", row["id"]),
+            ("title", row["name"]),
+            ("description", row["description"]),
+            ("link", row["url"]),
+            ("g:image_link", row["image_url"]),
+            ("g:price", f"{row['price']} {row['currency']}"),
+            ("g:availability", availability),
+            ("g:brand", row["artisan"]),
+            ("g:product_type", row["category"]),
+            ("g:material", row["material"]),
+        ]
+        yield "<item>" + "".join(
+            f"<{tag}>{_xml_text(value)}</{tag}>"
+            for tag, value in elements
+            if value is not None
+        ) + "</item>\n"
+
+    yield "</channel>\n</rss>\n"
+
+
+def buffered(chunks, size=64 * 1024):
+    # Joins per-row chunks into writes of about `size` characters
+    parts, length = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(parts)
+            parts, length = [], 0
+
+    if parts:
+        yield "".join(parts)
+
+
+def export(fmt, since=None, base_url="", chunk_size=CHUNK_SIZE):
+    rows = (record(product, base_url) for product in iter_products(products(since), chunk_size))
+
+    if fmt == "ndjson":
+        chunks = ndjson(rows)
+    elif fmt == "csv":
+        chunks = csv_rows(rows)
+    elif fmt == "xml":
+        chunks = xml_feed(rows, base_url)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    return buffered(chunks)
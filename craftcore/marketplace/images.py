@@ -0,0 +1,112 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height, crop). Cropped derivatives fill the box exactly;
+# the others are scaled to fit inside it.
+PRODUCT_DERIVATIVES = {
+    "thumb": (160, 160, True),
+    "card": (400, 400, True),
+    "card_2x": (800, 800, True),
+    "detail": (1200, 1200, False),
+}
+
+ARTISAN_DERIVATIVES = {
+    "avatar": (320, 320, True),
+}
+
+# format -> (extension, Pillow save options)
+FORMATS = {
+    "webp": ("webp", {"format": "WEBP", "quality": 80, "method": 4}),
+    "jpeg": ("jpg", {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def _render(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def _encode(image, fmt):
+    _, options = FORMATS[fmt]
+
+    if fmt == "jpeg" and image.mode != "RGB":
+        # JPEG has no alpha; flatten transparent uploads onto white
+        background = Image.new("RGB", image.size, "white")
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+# Writes every spec in every format under a `derived/` folder next to the
+# original and returns the mapping stored on the model:
+# {name: {"width": w, "webp": path, "jpeg": path}}
+def build_derivatives(field_file, specs):
+    storage = field_file.storage
+    folder, filename = posixpath.split(field_file.name)
+    stem = posixpath.splitext(filename)[0]
+
+    try:
+        with field_file.open("rb") as source:
+            original = ImageOps.exif_transpose(Image.open(source))
+            original.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        # DecompressionBombError (over twice Image.MAX_IMAGE_PIXELS) is not
+        # an OSError; such uploads keep being served as the original
+        logger.warning("Could not read image %s; skipping derivatives", field_file.name)
+        return {}
+
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+
+    derivatives = {}
+    for name, (width, height, crop) in specs.items():
+        rendered = _render(original, width, height, crop)
+        entry = {"width": rendered.width}
+
+        for fmt, (extension, _) in FORMATS.items():
+            path = posixpath.join(folder, "derived", f"{stem}_{name}.{extension}")
+            if storage.exists(path):
+                storage.delete(path)
+            entry[fmt] = storage.save(path, ContentFile(_encode(rendered, fmt)))
+
+        derivatives[name] = entry
+
+    return derivatives
+
+
+def delete_derivatives(storage, derivatives):
+    for entry in derivatives.values():
+        for fmt in FORMATS:
+            if entry.get(fmt):
+                storage.delete(entry[fmt])
+
+
+def derivative_url(storage, derivatives, name, fmt="jpeg"):
+    entry = derivatives.get(name)
+    if entry and entry.get(fmt):
+        return storage.url(entry[fmt])
+    return ""
+
+
+def srcset(storage, derivatives, names, fmt):
+    # "url 400w, url 800w" for the derivatives that exist
+    candidates = [
+        f"{storage.url(derivatives[name][fmt])} {derivatives[name]['width']}w"
+        for name in names
+        if derivatives.get(name, {}).get(fmt)
+    ]
+    return ", ".join(candidates)
@@ -0,0 +1,239 @@
+# Bulk product import for sellers: a CSV of products plus a ZIP of their
+# images. Rows are read one at a time and inserted with bulk_create in
+# batches inside one transaction, so either every row is imported or, if
+# any row is invalid, none are and the seller gets every row's errors to
+# fix in one go. Categories and materials are matched by name against the
+# per-process reference tables, with no query per row.
+#
+# Products are created inactive with no image. The ZIP is kept in storage
+# and a background job (marketplace.tasks.attach_imported_images) copies
+# each image out, builds its derivatives and activates the product, so
+# the upload request never decodes or resizes images.
+
+import csv
+import io
+import posixpath
+import uuid
+import zipfile
+from decimal import Decimal, InvalidOperation
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from core.jobs import enqueue
+
+from .models import Product
+from .reference import CATEGORIES, MATERIALS
+
+COLUMNS = ["name", "description", "category", "material", "price", "stock", "image"]
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+MAX_ROWS = 1000
+MAX_IMAGE_SIZE = 10 * 1024 * 1024  # uncompressed bytes
+MAX_PRICE = Decimal("999999.99")  # Product.price is max_digits=8, decimal_places=2
+BATCH_SIZE = 200
+
+UPLOAD_DIR = "imports"
+
+
+class ImportErrors(Exception):
+    # Raised with [(line, message)] when the upload can't be imported
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} import errors")
+        self.errors = errors
+
+
+def _by_name(table):
+    return {row.name.casefold(): row for row in table.all()}
+
+
+def _images(archive):
+    # Basename -> ZipInfo, ignoring folders and macOS resource forks
+    images = {}
+    for info in archive.infolist():
+        if info.is_dir() or info.filename.startswith("__MACOSX/"):
+            continue
+        images[posixpath.basename(info.filename)] = info
+    return images
+
+
+def _check_image(archive, info):
+    if posixpath.splitext(info.filename)[1].lower() not in IMAGE_EXTENSIONS:
+        return "is not a JPEG, PNG or WebP image"
+    if info.file_size > MAX_IMAGE_SIZE:
+        return f"is larger than {MAX_IMAGE_SIZE // (1024 * 1024)} MB"
+
+    # Reads the header only; the worker decodes the full image later
+    try:
+        with archive.open(info) as file:
+            Image.open(file).verify()
+    except (OSError, UnidentifiedImageError, zipfile.BadZipFile):
+        return "could not be read as an image"
+    except Image.DecompressionBombError:
+        return "has too many pixels"
+    return None
+
+
+def parse_row(row, categories, materials, images, archive):
+    # (product fields, image ZipInfo, [errors]) for one CSV row
+    errors = []
+    values = {column: (row.get(column) or "").strip() for column in COLUMNS}
+
+    for column in COLUMNS:
+        if not values[column]:
+            errors.append(f"{column} is required")
+
+    if len(values["name"]) > Product._meta.get_field("name").max_length:
+        errors.append("name is too long")
+
+    category = categories.get(values["category"].casefold())
+    if values["category"] and category is None:
+        errors.append(f"unknown category \"{values['category']}\"")
+
+    material = materials.get(values["material"].casefold())
+    if values["material"] and material is None:
+        errors.append(f"unknown material \"{values['material']}\"")
+
+    price = None
+    if values["price"]:
+        try:
+            price = Decimal(values["price"])
+        except InvalidOperation:
+            errors.append("price must be a number")
+        else:
+            if not price.is_finite() or price <= 0 or price > MAX_PRICE:
+                errors.append(f"price must be between 0 and {MAX_PRICE}")
+            elif price != price.quantize(Decimal("0.01")):
+                errors.append("price can have at most two decimal places")
+
+    stock = None
+    if values["stock"]:
+        try:
+            stock = int(values["stock"])
+        except ValueError:
+            errors.append("stock must be a whole number")
+        else:
+            if stock < 0:
+                errors.append("stock cannot be negative")
+
+    info = images.get(values["image"])
+    if values["image"]:
+        if info is None:
+            errors.append(f"image \"{values['image']}\" is not in the ZIP")
+        else:
+            problem = _check_image(archive, info)
+            if problem:
+                errors.append(f"image \"{values['image']}\" {problem}")
+
+    fields = {
+        "name": values["name"],
+        "description": values["description"],
+        "category": category,
+        "material": material,
+        "price": price,
+        "stock": stock,
+    }
+    return fields, info, errors
+
+
+def import_products(artisan, csv_file, zip_file):
+    # Returns the number of products created; raises ImportErrors
+    try:
+        archive = zipfile.ZipFile(zip_file)
+    except zipfile.BadZipFile:
+        raise ImportErrors([(None, "The images file is not a valid ZIP.")])
+
+    with archive:
+        images = _images(archive)
+        categories = _by_name(CATEGORIES)
+        materials = _by_name(MATERIALS)
+
+        reader = csv.DictReader(io.TextIOWrapper(csv_file, encoding="utf-8-sig", newline=""))
+        try:
+            header = reader.fieldnames or []
+        except UnicodeDecodeError:
+            raise ImportErrors([(1, "The CSV file must be UTF-8 encoded.")])
+
+        missing = [column for column in COLUMNS if column not in header]
+        if missing:
+            raise ImportErrors([(1, f"Missing columns: {', '.join(missing)}.")])
+
+        errors = []
+        attach = {}  # product id -> image path in the ZIP
+        batch = []  # (unsaved product, image ZipInfo)
+        count = 0
+
+        def flush():
+            Product.objects.bulk_create([product for product, _ in batch])
+            for product, info in batch:
+                attach[str(product.id)] = info.filename
+            batch.clear()
+
+        with transaction.atomic():
+            try:
+                for row in reader:
+                    count += 1
+                    if count > MAX_ROWS:
+                        errors.append((reader.line_num, f"Imports are limited to {MAX_ROWS} products."))
+                        break
+
+                    fields, info, row_errors = parse_row(row, categories, materials, images, archive)
+                    if row_errors:
+                        message = "; ".join(row_errors)
+                        errors.append((reader.line_num, message[0].upper() + message[1:] + "."))
+                    elif not errors:
+                        # After the first bad row nothing will be kept, but
+                        # reading on reports every error at once
+                        batch.append((Product(
+                            artisan=artisan,
+                            image="",
+                            is_active=False,
+                            is_out_of_stock=fields["stock"] <= 0,
+                            **fields,
+                        ), info))
+                        if len(batch) >= BATCH_SIZE:
+                            flush()
+            except UnicodeDecodeError:
+                errors.append((reader.line_num + 1, "The CSV file must be UTF-8 encoded."))
+            except csv.Error as exc:
+                errors.append((reader.line_num, f"Malformed CSV: {exc}."))
+
+            if not errors and count == 0:
+                errors.append((None, "The CSV file has no products."))
+
+            # Rolls back the batches already inserted
+            if errors:
+                raise ImportErrors(errors)
+
+            if batch:
+                flush()
+
+            zip_file.seek(0)
+            upload = default_storage.save(f"{UPLOAD_DIR}/{uuid.uuid4().hex}.zip", zip_file)
+            # Runs once the products are committed
+            enqueue("marketplace.tasks.attach_imported_images", upload=upload, images=attach)
+
+    return len(attach)
+
+
+def attach_images(upload, images):
+    # Copies each product's image out of the stored ZIP, builds its
+    # derivatives and activates it. Products that already have an image
+    # are skipped, so a retried job carries on where the last one stopped.
+    pending = Product.objects.filter(id__in=images, image="", is_active=False)
+
+    with default_storage.open(upload, "rb") as file, zipfile.ZipFile(file) as archive:
+        for product in pending.iterator():
+            member = images[str(product.id)]
+            with archive.open(member) as source:
+                product.image.save(posixpath.basename(member), File(source), save=False)
+
+            product.is_active = True
+            # A full save, so search, similar products and the catalog
+            # cache pick the product up as they do for a single upload
+            product.save()
+            product.build_image_derivatives()
+
+    default_storage.delete(upload)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.models import ArtisanProfile, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills resized WebP/JPEG derivatives for product and artisan "
+        "images. Only rows without derivatives are processed unless --force."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild derivatives even where they already exist.",
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image="")
+        artisans = ArtisanProfile.objects.exclude(profile_image__isnull=True).exclude(profile_image="")
+
+        if not options["force"]:
+            products = products.filter(image_derivatives={})
+            artisans = artisans.filter(profile_image_derivatives={})
+
+        built = 0
+        for product in products.iterator(chunk_size=200):
+            product.build_image_derivatives()
+            built += bool(product.image_derivatives)
+
+        for artisan in artisans.iterator(chunk_size=200):
+            artisan.build_image_derivatives()
+            built += bool(artisan.profile_image_derivatives)
+
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} image(s)."))
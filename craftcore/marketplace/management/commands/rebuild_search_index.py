@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from marketplace import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the product full-text search index from scratch."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.rebuild()
+
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from marketplace import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the similar-products index for every active product from "
+        "shared attributes, price and co-purchases in order history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-n",
+            type=int,
+            default=recommendations.TOP_N,
+            help=f"Neighbours stored per product (default {recommendations.TOP_N}).",
+        )
+
+    def handle(self, *args, **options):
+        links = recommendations.rebuild(top_n=options["top_n"])
+        self.stdout.write(self.style.SUCCESS(f"Stored {links} similar-product link(s)."))
@@ -0,0 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_artisan
+
+
+class ArtisanMiddleware:
+    # request.artisan: the user's ArtisanProfile, resolved on first use.
+    # It wraps None for buyers, so test it for truth rather than `is None`.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.artisan = SimpleLazyObject(lambda: get_artisan(request))
+        return self.get_response(request)
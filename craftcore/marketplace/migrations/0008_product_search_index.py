@@ -0,0 +1,79 @@
+# Generated by Django 6.0 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# The schema and backfill are frozen here rather than imported from
+# marketplace.search, so later changes there can't alter this migration.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS marketplace_product_fts USING fts5(
+        name, description, artisan, category, material,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    INSERT INTO marketplace_product_fts (rowid, name, description, artisan, category, material)
+    SELECT p.id, p.name, p.description, a.display_name,
+           COALESCE(c.name, ''), COALESCE(m.name, '')
+    FROM marketplace_product p
+    JOIN marketplace_artisanprofile a ON a.id = p.artisan_id
+    LEFT JOIN marketplace_category c ON c.id = p.category_id
+    LEFT JOIN marketplace_material m ON m.id = p.material_id
+    WHERE p.is_active
+    """,
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE TABLE IF NOT EXISTS marketplace_product_search (
+        product_id bigint PRIMARY KEY
+            REFERENCES marketplace_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS marketplace_product_search_document_gin
+    ON marketplace_product_search USING GIN (document)
+    """,
+    """
+    INSERT INTO marketplace_product_search (product_id, document)
+    SELECT p.id,
+           setweight(to_tsvector('english', p.name), 'A') ||
+           setweight(to_tsvector('english', a.display_name), 'B') ||
+           setweight(to_tsvector('english', COALESCE(c.name, '') || ' ' || COALESCE(m.name, '')), 'C') ||
+           setweight(to_tsvector('english', p.description), 'D')
+    FROM marketplace_product p
+    JOIN marketplace_artisanprofile a ON a.id = p.artisan_id
+    LEFT JOIN marketplace_category c ON c.id = p.category_id
+    LEFT JOIN marketplace_material m ON m.id = p.material_id
+    WHERE p.is_active
+    """,
+]
+
+BACKWARD = {
+    "sqlite": ["DROP TABLE IF EXISTS marketplace_product_fts"],
+    "postgresql": ["DROP TABLE IF EXISTS marketplace_product_search"],
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for statement in {"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in BACKWARD.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0007_alter_artisanprofile_profile_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 6.0 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+
+
+# A frozen copy of orders.utils.rebuild_sales_counters as of this
+# migration, so later changes there can't alter it
+def backfill_sales_counters(apps, schema_editor):
+    OrderItem = apps.get_model("orders", "OrderItem")
+    Product = apps.get_model("marketplace", "Product")
+    ArtisanProfile = apps.get_model("marketplace", "ArtisanProfile")
+
+    targets = [
+        (Product, "product_id", ("order_count", "units_sold", "revenue")),
+        (ArtisanProfile, "product__artisan_id", ("total_orders", "total_units", "total_revenue")),
+    ]
+    for model, key, fields in targets:
+        rows = (
+            OrderItem.objects
+            .order_by()
+            .values(key)
+            .annotate(
+                orders=Count("id"),
+                units=Sum("quantity"),
+                revenue=Sum(
+                    F("price_at_purchase") * F("quantity"),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                ),
+            )
+        )
+        # The columns were just added with a default of 0
+        changed = [
+            model(pk=row[key], **dict(zip(fields, (row["orders"], row["units"], row["revenue"]))))
+            for row in rows
+        ]
+        model.objects.bulk_update(changed, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0008_product_search_index'),
+        ('orders', '0002_orderitem_price_at_purchase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='total_orders',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='total_revenue',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='total_units',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_sales_counters, migrations.RunPython.noop),
+    ]
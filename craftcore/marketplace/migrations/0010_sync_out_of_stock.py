@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+def sync_out_of_stock(apps, schema_editor):
+    Product = apps.get_model("marketplace", "Product")
+    Product.objects.filter(stock__lte=0).update(is_out_of_stock=True)
+    Product.objects.filter(stock__gt=0).update(is_out_of_stock=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0009_sales_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(sync_out_of_stock, migrations.RunPython.noop),
+    ]
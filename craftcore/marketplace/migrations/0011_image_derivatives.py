@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_sync_out_of_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='profile_image_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
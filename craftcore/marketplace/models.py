@@ -1,6 +1,50 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.utils import timezone
+from .cache import invalidate_catalog, invalidate_reference
+from .images import (
+    ARTISAN_DERIVATIVES,
+    PRODUCT_DERIVATIVES,
+    build_derivatives,
+    delete_derivatives,
+    derivative_url,
+    srcset,
+)
+
+DEFAULT_PROFILE_IMAGE = "artisans/user-default.png"
+
+class CatalogQuerySet(models.QuerySet):
+    # update()/bulk_create() skip model signals, so invalidate here; update()
+    # also skips auto_now, so stamp updated_at (see marketplace.conditional).
+    # invalidate=False is for writes no cached page shows, like stock levels.
+    def update(self, *, invalidate=True, **kwargs):
+        kwargs.setdefault("updated_at", timezone.now())
+        rows = super().update(**kwargs)
+        if rows and invalidate:
+            invalidate_catalog()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            invalidate_catalog()
+        return created
+
+class ReferenceQuerySet(CatalogQuerySet):
+    # Categories and materials are also cached per process
+    # (see marketplace.reference)
+    def update(self, *, invalidate=True, **kwargs):
+        rows = super().update(invalidate=invalidate, **kwargs)
+        if rows and invalidate:
+            invalidate_reference()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            invalidate_reference()
+        return created
 
 class ArtisanProfile(models.Model):
     user = models.OneToOneField(
@@ -17,6 +61,7 @@ class ArtisanProfile(models.Model):
         null=True,
         default="artisans/user-default.png"
     )
+    profile_image_derivatives = models.JSONField(default=dict, blank=True)
 
     @property
     def profile_image_url(self):
@@ -24,10 +69,52 @@ class ArtisanProfile(models.Model):
             return self.profile_image.url
         return settings.MEDIA_URL + "artisans/user-default.png"
 
+    @property
+    def avatar_url(self):
+        return (
+            derivative_url(self.profile_image.storage, self.profile_image_derivatives, "avatar")
+            or self.profile_image_url
+        )
+
+    def discard_image_derivatives(self):
+        # Called before a new upload is saved, so pages fall back to the
+        # original until the worker has built the new derivatives
+        delete_derivatives(self.profile_image.storage, self.profile_image_derivatives)
+        self.profile_image_derivatives = {}
+
+    def build_image_derivatives(self):
+        self.discard_image_derivatives()
+
+        if self.profile_image and self.profile_image.name != DEFAULT_PROFILE_IMAGE:
+            derivatives = build_derivatives(self.profile_image, ARTISAN_DERIVATIVES)
+        else:
+            derivatives = {}
+
+        self.profile_image_derivatives = derivatives
+        ArtisanProfile.objects.filter(pk=self.pk).update(profile_image_derivatives=derivatives)
+
 
     story = models.TextField()
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Sales totals maintained at checkout (see orders.utils.record_sales)
+    total_orders = models.PositiveIntegerField(default=0)
+    total_units = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    objects = CatalogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Newest active artisans (home page, "other artisans")
+            models.Index(
+                fields=["-created_at"],
+                condition=models.Q(is_active=True),
+                name="artisan_active_newest_idx",
+            ),
+        ]
 
     @property
     def is_seller(self):
@@ -38,12 +125,18 @@ class ArtisanProfile(models.Model):
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ReferenceQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
 class Material(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ReferenceQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -57,6 +150,7 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
     image = models.ImageField(upload_to="products/")
+    image_derivatives = models.JSONField(default=dict, blank=True)
     stock = models.PositiveIntegerField(default=1)
 
     category = models.ForeignKey(
@@ -71,10 +165,152 @@ class Product(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     is_active = models.BooleanField(default=True)
     is_out_of_stock = models.BooleanField(default=False)
 
+    # Sales totals maintained at checkout (see orders.utils.record_sales)
+    order_count = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    objects = CatalogQuerySet.as_manager()
+
+    class Meta:
+        # Every public listing reads active products only, so these are
+        # partial indexes over them. The trailing id matches the keyset
+        # pagination order (see marketplace.pagination).
+        indexes = [
+            # Catalog "newest" sort and the home page
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(is_active=True),
+                name="product_active_newest_idx",
+            ),
+            # Catalog price sorts
+            models.Index(
+                fields=["price", "id"],
+                condition=models.Q(is_active=True),
+                name="product_active_price_idx",
+            ),
+            # Artisan pages, "more by this artisan", the seller dashboard
+            models.Index(
+                fields=["artisan", "-created_at", "-id"],
+                condition=models.Q(is_active=True),
+                name="product_active_artisan_idx",
+            ),
+            # Category/material filters and facet counts
+            models.Index(
+                fields=["category", "-created_at", "-id"],
+                condition=models.Q(is_active=True),
+                name="product_active_category_idx",
+            ),
+            models.Index(
+                fields=["material", "-created_at", "-id"],
+                condition=models.Q(is_active=True),
+                name="product_active_material_idx",
+            ),
+        ]
+
+    # What marketplace.recommendations scores neighbours on
+    SIMILARITY_FIELDS = ("category_id", "material_id", "artisan_id", "price", "is_active")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        if all(name in product.__dict__ for name in cls.SIMILARITY_FIELDS):
+            product._saved_similarity = product.similarity_key()
+        return product
+
+    def similarity_key(self):
+        # Normalized, so a form's "100" matches the stored Decimal("100.00")
+        return tuple(
+            self._meta.get_field(name).to_python(getattr(self, name))
+            for name in self.SIMILARITY_FIELDS
+        )
+
+    def similarity_changed(self):
+        # Since this instance was loaded or last saved (post_save handlers
+        # still see the previous save); unknown counts as changed
+        return getattr(self, "_saved_similarity", None) != self.similarity_key()
+
+    def save(self, *args, **kwargs):
+        # Keep the flag in step with stock on every full save; checkout
+        # maintains it itself (see orders.utils.reserve_stock)
+        self.is_out_of_stock = int(self.stock) <= 0
+        super().save(*args, **kwargs)
+        self._saved_similarity = self.similarity_key()
+
+    # ---------------- IMAGE DERIVATIVES ----------------
+    # Each falls back to the original until derivatives have been built
+
+    @property
+    def thumb_image_url(self):
+        return self.derivative_url("thumb")
+
+    @property
+    def card_image_url(self):
+        return self.derivative_url("card")
+
+    @property
+    def card_srcset(self):
+        return srcset(self.image.storage, self.image_derivatives, ["card", "card_2x"], "jpeg")
+
+    @property
+    def card_srcset_webp(self):
+        return srcset(self.image.storage, self.image_derivatives, ["card", "card_2x"], "webp")
+
+    @property
+    def detail_image_url(self):
+        return self.derivative_url("detail")
+
+    @property
+    def detail_srcset(self):
+        return srcset(self.image.storage, self.image_derivatives, ["card_2x", "detail"], "jpeg")
+
+    @property
+    def detail_srcset_webp(self):
+        return srcset(self.image.storage, self.image_derivatives, ["card_2x", "detail"], "webp")
+
+    def derivative_url(self, name):
+        return derivative_url(self.image.storage, self.image_derivatives, name) or self.image.url
+
+    def discard_image_derivatives(self):
+        delete_derivatives(self.image.storage, self.image_derivatives)
+        self.image_derivatives = {}
+
+    def build_image_derivatives(self):
+        self.discard_image_derivatives()
+        derivatives = build_derivatives(self.image, PRODUCT_DERIVATIVES) if self.image else {}
+
+        self.image_derivatives = derivatives
+        Product.objects.filter(pk=self.pk).update(image_derivatives=derivatives)
+
     def __str__(self):
         return self.name
     
+
+class SimilarProduct(models.Model):
+    # Precomputed "similar products" for the detail page, ranked best
+    # first (see marketplace.recommendations)
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="similar_links"
+    )
+    similar = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="unique_similar_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.similar_id} ({self.score:.2f})"
@@ -0,0 +1,135 @@
+import base64
+import binascii
+import json
+import math
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+PAGE_SIZE = 24
+
+# Cursor value parsers: each raises ValueError for values the database
+# can't compare against (naive or out-of-range datetimes, NaN, infinity)
+
+def _parse_datetime(value):
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        raise ValueError("naive datetime")
+    return parsed.astimezone(timezone.utc)
+
+
+def _parse_decimal(value):
+    parsed = Decimal(value)
+    if not parsed.is_finite():
+        raise ValueError("non-finite decimal")
+    return parsed
+
+
+def _parse_float(value):
+    parsed = float(value)
+    if not math.isfinite(parsed):
+        raise ValueError("non-finite float")
+    return parsed
+
+
+# sort option -> (field, descending, parser for cursor values)
+SORT_OPTIONS = {
+    "newest": ("created_at", True, _parse_datetime),
+    "price_asc": ("price", False, _parse_decimal),
+    "price_desc": ("price", True, _parse_decimal),
+    # Only valid on querysets annotated by search.search()
+    "relevance": ("search_rank", True, _parse_float),
+}
+DEFAULT_SORT = "newest"
+
+
+class CursorPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(sort, direction, obj):
+    field = SORT_OPTIONS[sort][0]
+    value = getattr(obj, field)
+    value = value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+    payload = json.dumps({"s": sort, "d": direction, "v": value, "id": obj.pk})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+# Returns (direction, value, id), or None when the token is missing,
+# malformed or was issued for a different sort order
+def decode_cursor(token, sort):
+    if not token:
+        return None
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if data["s"] != sort or data["d"] not in ("next", "prev"):
+            return None
+        value = SORT_OPTIONS[sort][2](data["v"])
+        return data["d"], value, int(data["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError, InvalidOperation, OverflowError):
+        return None
+
+
+# Keyset pagination over (sort field, id). Each page is a single range
+# scan of page_size + 1 rows, so deep pages cost the same as page 1.
+def paginate(queryset, sort, cursor=None, page_size=PAGE_SIZE):
+    field, descending, _ = SORT_OPTIONS[sort]
+    position = decode_cursor(cursor, sort)
+    backwards = position is not None and position[0] == "prev"
+
+    # Walking backwards flips the ordering; the page is reversed afterwards
+    reverse = descending != backwards
+    prefix = "-" if reverse else ""
+    queryset = queryset.order_by(f"{prefix}{field}", f"{prefix}id")
+
+    if position:
+        _, value, pk = position
+        lookup = "lt" if reverse else "gt"
+        queryset = queryset.filter(
+            Q(**{f"{field}__{lookup}": value}) |
+            Q(**{field: value, f"id__{lookup}": pk})
+        )
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if backwards:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    if not rows:
+        return CursorPage(rows)
+
+    return CursorPage(
+        rows,
+        next_cursor=encode_cursor(sort, "next", rows[-1]) if has_next else None,
+        prev_cursor=encode_cursor(sort, "prev", rows[0]) if has_previous else None,
+    )
+
+
+# Builds a listing link that keeps the active filters and sort
+def page_url(query_params, cursor):
+    if not cursor:
+        return None
+
+    params = query_params.copy()
+    params["cursor"] = cursor
+    return "?" + params.urlencode()
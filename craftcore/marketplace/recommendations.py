@@ -0,0 +1,200 @@
+import math
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Abs
+from orders.models import OrderItem
+
+from .cache import invalidate_catalog
+from .models import Product, SimilarProduct
+
+# Neighbours stored per product. More than the page shows, so a few of
+# them going inactive between rebuilds still leaves a full row.
+TOP_N = 12
+
+# How many price-nearest products to consider per shared attribute
+CANDIDATES = 40
+
+CATEGORY_WEIGHT = 1.0
+MATERIAL_WEIGHT = 0.6
+ARTISAN_WEIGHT = 0.2
+PRICE_WEIGHT = 0.5  # scaled by price closeness, 0..1
+CO_PURCHASE_WEIGHT = 1.5  # scaled by log(1 + orders containing both)
+
+FIELDS = ("id", "category_id", "material_id", "artisan_id", "price")
+
+
+def score(product, candidate, bought_together=0):
+    # product/candidate are FIELDS tuples
+    _, category, material, artisan, price = product
+    _, other_category, other_material, other_artisan, other_price = candidate
+
+    total = 0.0
+    if category and category == other_category:
+        total += CATEGORY_WEIGHT
+    if material and material == other_material:
+        total += MATERIAL_WEIGHT
+    if artisan == other_artisan:
+        total += ARTISAN_WEIGHT
+    if price and other_price:
+        total += PRICE_WEIGHT * float(min(price, other_price) / max(price, other_price))
+    if bought_together:
+        total += CO_PURCHASE_WEIGHT * math.log1p(bought_together)
+    return total
+
+
+def top_neighbours(product, candidates, co_purchases, top_n=TOP_N):
+    # [(score, candidate id)] best first; ties go to the newer product
+    scored = [
+        (score(product, candidate, co_purchases.get(candidate[0], 0)), candidate[0])
+        for candidate in candidates
+        if candidate[0] != product[0]
+    ]
+    scored.sort(key=lambda pair: (-pair[0], -pair[1]))
+    return scored[:top_n]
+
+
+def _links(product_id, neighbours):
+    return [
+        SimilarProduct(product_id=product_id, similar_id=similar_id, rank=rank, score=value)
+        for rank, (value, similar_id) in enumerate(neighbours)
+    ]
+
+
+def co_purchase_counts():
+    # {product id: Counter(other product id: orders containing both)}
+    counts = defaultdict(Counter)
+    rows = (
+        OrderItem.objects
+        .order_by("order_id")
+        .values_list("order_id", "product_id")
+        .iterator(chunk_size=5000)
+    )
+
+    for _, items in groupby(rows, key=lambda row: row[0]):
+        product_ids = sorted({product_id for _, product_id in items})
+        for a, b in combinations(product_ids, 2):
+            counts[a][b] += 1
+            counts[b][a] += 1
+
+    return counts
+
+
+def _nearest_by_price(group, prices, price, limit):
+    # group is sorted by price; take the `limit` rows either side of `price`
+    i = bisect_left(prices, price)
+    return group[max(i - limit, 0):i + limit]
+
+
+def rebuild(top_n=TOP_N):
+    # Full rebuild over every active product. Candidates are the products
+    # closest in price that share a category or material, plus anything
+    # bought in the same order, so the cost grows with catalog size rather
+    # than its square.
+    products = sorted(
+        Product.objects.filter(is_active=True).values_list(*FIELDS),
+        key=lambda row: row[4],
+    )
+    by_id = {row[0]: row for row in products}
+
+    groups = {}
+    for index, key in ((1, "category"), (2, "material")):
+        grouped = defaultdict(list)
+        for row in products:
+            if row[index]:
+                grouped[row[index]].append(row)
+        groups[key] = {
+            value: (rows, [row[4] for row in rows]) for value, rows in grouped.items()
+        }
+
+    co_purchases = co_purchase_counts()
+
+    links = []
+    for product in products:
+        candidates = {}
+        for index, key in ((1, "category"), (2, "material")):
+            if product[index] in groups[key]:
+                rows, prices = groups[key][product[index]]
+                for row in _nearest_by_price(rows, prices, product[4], CANDIDATES):
+                    candidates[row[0]] = row
+
+        bought_with = co_purchases.get(product[0], {})
+        for other_id in bought_with:
+            if other_id in by_id:
+                candidates[other_id] = by_id[other_id]
+
+        neighbours = top_neighbours(product, candidates.values(), bought_with, top_n)
+        links.extend(_links(product[0], neighbours))
+
+    with transaction.atomic():
+        SimilarProduct.objects.all().delete()
+        SimilarProduct.objects.bulk_create(links, batch_size=1000)
+        # Product pages list these (see marketplace.conditional)
+        invalidate_catalog()
+
+    return len(links)
+
+
+def refresh(product_id, top_n=TOP_N):
+    # Recompute one product's neighbours with a handful of bounded queries;
+    # used when a product is created or edited. Other products pick it up
+    # on the next full rebuild.
+    product = (
+        Product.objects
+        .filter(id=product_id, is_active=True)
+        .values_list(*FIELDS)
+        .first()
+    )
+
+    if product is None:
+        SimilarProduct.objects.filter(product_id=product_id).delete()
+        return 0
+
+    active = Product.objects.filter(is_active=True).exclude(id=product_id)
+    candidates = {}
+
+    for field, value in (("category_id", product[1]), ("material_id", product[2])):
+        if value:
+            nearest = (
+                active
+                .filter(**{field: value})
+                .annotate(distance=Abs(F("price") - product[4]))
+                .order_by("distance")
+                .values_list(*FIELDS)[:CANDIDATES * 2]
+            )
+            candidates.update((row[0], row) for row in nearest)
+
+    bought_with = {}
+    co_purchased = (
+        active
+        .filter(orderitem__order__items__product_id=product_id)
+        .annotate(orders=Count("orderitem__order", distinct=True))
+        .values_list(*FIELDS, "orders")
+    )
+    for *row, orders in co_purchased:
+        candidates[row[0]] = tuple(row)
+        bought_with[row[0]] = orders
+
+    neighbours = top_neighbours(product, candidates.values(), bought_with, top_n)
+
+    with transaction.atomic():
+        SimilarProduct.objects.filter(product_id=product_id).delete()
+        SimilarProduct.objects.bulk_create(_links(product_id, neighbours))
+        invalidate_catalog()
+
+    return len(neighbours)
+
+
+def similar_products(product, limit=4):
+    # One indexed lookup on (product, rank); empty until the index has
+    # been built for this product
+    links = (
+        SimilarProduct.objects
+        .filter(product=product, similar__is_active=True)
+        .select_related("similar__artisan", "similar__category", "similar__material")
+        .order_by("rank")[:limit]
+    )
+    return [link.similar for link in links]
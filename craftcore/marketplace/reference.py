@@ -0,0 +1,53 @@
+# Per-process cache of the small, rarely edited lookup tables (categories
+# and materials). Each process keeps its own copy and reloads it when the
+# reference version in the shared cache moves, which any save or delete
+# does (see marketplace.signals), so every worker sees edits on its next
+# read.
+
+from core.routers import primary
+
+from .cache import reference_version
+from .models import Category, Material
+
+
+class ReferenceTable:
+    def __init__(self, model):
+        self.model = model
+        # (version, rows ordered by name, {id: row}, {id: name}); replaced
+        # as a whole so concurrent readers never see a half-built table
+        self._state = (None, [], {}, {})
+
+    def _load(self):
+        version = reference_version()
+        state = self._state
+
+        if state[0] != version:
+            # Kept until the next version bump, so never a replica's copy
+            with primary():
+                rows = list(self.model.objects.order_by("name"))
+            state = (
+                version,
+                rows,
+                {row.id: row for row in rows},
+                {row.id: row.name for row in rows},
+            )
+            self._state = state
+
+        return state
+
+    def all(self):
+        # Shared instances: copy before setting attributes on them
+        return list(self._load()[1])
+
+    def get(self, pk):
+        try:
+            return self._load()[2].get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def names(self):
+        return self._load()[3]
+
+
+CATEGORIES = ReferenceTable(Category)
+MATERIALS = ReferenceTable(Material)
@@ -0,0 +1,62 @@
+from .models import ArtisanProfile
+
+SESSION_KEY = "artisan_role"
+
+
+def _role(request):
+    # {"user": id, "id": artisan id or None, "active": bool}, cached in the
+    # session so buyers (no profile) never query for one. Views that change
+    # the profile call forget_artisan().
+    user = request.user
+    if not user.is_authenticated:
+        return None
+
+    role = request.session.get(SESSION_KEY)
+    if role is None or role.get("user") != user.pk:
+        artisan = ArtisanProfile.objects.filter(user=user).first()
+        role = role_for(user, artisan)
+        request.session[SESSION_KEY] = role
+        request._artisan = artisan
+
+    return role
+
+
+def role_for(user, artisan):
+    return {
+        "user": user.pk,
+        "id": artisan.pk if artisan else None,
+        "active": bool(artisan and artisan.is_active),
+    }
+
+
+def get_artisan(request):
+    # The signed-in user's ArtisanProfile or None, loaded at most once per
+    # request. The row itself is always read fresh, so permission checks
+    # never rely on the session copy.
+    if not hasattr(request, "_artisan"):
+        role = _role(request)
+
+        if not hasattr(request, "_artisan"):
+            artisan = None
+            if role and role["id"]:
+                artisan = ArtisanProfile.objects.filter(pk=role["id"]).first()
+                if artisan is None:
+                    forget_artisan(request)
+            request._artisan = artisan
+
+    return request._artisan
+
+
+def seller_state(request):
+    # (is artisan, is active seller) without touching the database once
+    # the session knows the answer; for navigation and other display logic
+    role = _role(request)
+    if not role:
+        return False, False
+    return bool(role["id"]), role["active"]
+
+
+def forget_artisan(request):
+    request.session.pop(SESSION_KEY, None)
+    if hasattr(request, "_artisan"):
+        del request._artisan
@@ -0,0 +1,141 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Index tables, created by migration 0008_product_search_index
+
+# SQLite: FTS5 virtual table keyed by rowid = product id
+FTS_TABLE = "marketplace_product_fts"
+
+# PostgreSQL: weighted tsvector per product with a GIN index
+TSVECTOR_TABLE = "marketplace_product_search"
+
+# Active products joined with the text that should be searchable
+DOCUMENT_SQL = """
+    SELECT p.id, p.name, p.description, a.display_name,
+           COALESCE(c.name, ''), COALESCE(m.name, '')
+    FROM marketplace_product p
+    JOIN marketplace_artisanprofile a ON a.id = p.artisan_id
+    LEFT JOIN marketplace_category c ON c.id = p.category_id
+    LEFT JOIN marketplace_material m ON m.id = p.material_id
+    WHERE p.is_active
+"""
+
+# Name matches outrank artisan, then category/material, then description
+POSTGRES_DOCUMENT = """
+    setweight(to_tsvector('english', name), 'A') ||
+    setweight(to_tsvector('english', artisan), 'B') ||
+    setweight(to_tsvector('english', category || ' ' || material), 'C') ||
+    setweight(to_tsvector('english', description), 'D')
+"""
+
+REINDEX_BATCH_SIZE = 500
+
+# bm25 column weights: name, description, artisan, category, material
+SQLITE_WEIGHTS = "10.0, 1.0, 4.0, 2.0, 2.0"
+
+
+def _write(cursor, where, params):
+    vendor = cursor.db.vendor
+
+    if vendor == "sqlite":
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({where})", params)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, artisan, category, material) "
+            f"{DOCUMENT_SQL} AND p.id IN ({where})",
+            params,
+        )
+    elif vendor == "postgresql":
+        cursor.execute(f"DELETE FROM {TSVECTOR_TABLE} WHERE product_id IN ({where})", params)
+        cursor.execute(
+            f"INSERT INTO {TSVECTOR_TABLE} (product_id, document) "
+            f"SELECT id, {POSTGRES_DOCUMENT} FROM ("
+            f"{DOCUMENT_SQL} AND p.id IN ({where})"
+            f") AS doc (id, name, description, artisan, category, material)",
+            params,
+        )
+
+
+# Re-syncs the index rows for a Product queryset: active products are
+# (re)written, inactive or missing ones are dropped
+def reindex(products):
+    where, params = products.values("id").query.sql_with_params()
+    with connection.cursor() as cursor:
+        _write(cursor, where, params)
+
+
+def reindex_ids(product_ids):
+    product_ids = list(product_ids)
+    with connection.cursor() as cursor:
+        # Batched to stay under the database's bound-parameter limit
+        for start in range(0, len(product_ids), REINDEX_BATCH_SIZE):
+            batch = product_ids[start:start + REINDEX_BATCH_SIZE]
+            _write(cursor, ", ".join(["%s"] * len(batch)), batch)
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"DELETE FROM {TSVECTOR_TABLE}")
+
+        _write(cursor, "SELECT id FROM marketplace_product", [])
+
+
+def _terms(query):
+    return re.findall(r"\w+", query.lower())[:10]
+
+
+# Restricts a Product queryset to matches for `query` and annotates
+# `search_rank` (higher is more relevant)
+def search(queryset, query):
+    terms = _terms(query)
+    if not terms:
+        return queryset.none()
+
+    vendor = connection.vendor
+
+    if vendor == "sqlite":
+        # Quoted prefix terms, implicitly AND-ed; never raw user syntax
+        match = " ".join(f'"{term}"*' for term in terms)
+        matches = RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            (match,),
+        )
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, {SQLITE_WEIGHTS}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = marketplace_product.id",
+            (match,),
+            output_field=FloatField(),
+        )
+    elif vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        matches = RawSQL(
+            f"SELECT product_id FROM {TSVECTOR_TABLE} "
+            f"WHERE document @@ to_tsquery('english', %s)",
+            (tsquery,),
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('english', %s)) FROM {TSVECTOR_TABLE} "
+            f"WHERE product_id = marketplace_product.id",
+            (tsquery,),
+            output_field=FloatField(),
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(name__icontains=term) |
+                Q(description__icontains=term) |
+                Q(artisan__display_name__icontains=term) |
+                Q(category__name__icontains=term) |
+                Q(material__name__icontains=term)
+            )
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    return queryset.filter(id__in=matches).annotate(search_rank=rank)
@@ -0,0 +1,75 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.jobs import enqueue
+
+from . import search
+from .cache import invalidate_catalog, invalidate_reference
+from .models import ArtisanProfile, Category, Material, Product
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.reindex_ids([instance.pk])
+    # Stock, text and image edits leave the neighbours as they were
+    if instance.similarity_changed():
+        enqueue("marketplace.tasks.refresh_similar_products", product_id=instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.reindex_ids([instance.pk])
+
+
+@receiver(post_save, sender=ArtisanProfile)
+def index_artisan_products(sender, instance, created, **kwargs):
+    # A seller can have many products; refresh their search rows off-request
+    if not created:
+        enqueue("marketplace.tasks.reindex_artisan_products", artisan_id=instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def index_category_products(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex(Product.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Material)
+def index_material_products(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex(Product.objects.filter(material=instance))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Material)
+def remember_facet_products(sender, instance, **kwargs):
+    # Deleting a category/material nulls its products' foreign key with one
+    # UPDATE that sends no Product signals, so note them for reindexing
+    field = "category" if sender is Category else "material"
+    instance._search_product_ids = list(
+        Product.objects.filter(**{field: instance}).values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Material)
+def unindex_facet_name(sender, instance, **kwargs):
+    search.reindex_ids(getattr(instance, "_search_product_ids", []))
+
+
+def catalog_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+for model in (ArtisanProfile, Category, Material, Product):
+    post_save.connect(catalog_changed, sender=model)
+    post_delete.connect(catalog_changed, sender=model)
+
+
+def reference_changed(sender, **kwargs):
+    invalidate_reference()
+
+
+for model in (Category, Material):
+    post_save.connect(reference_changed, sender=model)
+    post_delete.connect(reference_changed, sender=model)
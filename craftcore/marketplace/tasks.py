@@ -0,0 +1,30 @@
+# Background jobs for the marketplace, queued with core.jobs.enqueue and
+# run by `manage.py runworker`. Arguments are ids, never model instances,
+# so every job reads the row as it is when it runs.
+
+from . import imports, recommendations, search
+from .models import ArtisanProfile, Product
+
+
+def build_product_image_derivatives(product_id):
+    product = Product.objects.filter(pk=product_id).first()
+    if product:
+        product.build_image_derivatives()
+
+
+def build_artisan_image_derivatives(artisan_id):
+    artisan = ArtisanProfile.objects.filter(pk=artisan_id).first()
+    if artisan:
+        artisan.build_image_derivatives()
+
+
+def reindex_artisan_products(artisan_id):
+    search.reindex(Product.objects.filter(artisan_id=artisan_id))
+
+
+def refresh_similar_products(product_id):
+    recommendations.refresh(product_id)
+
+
+def attach_imported_images(upload, images):
+    imports.attach_images(upload, images)
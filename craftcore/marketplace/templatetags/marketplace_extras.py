@@ -1,16 +1,13 @@
 from django import template
-from marketplace.models import ArtisanProfile
 
 register = template.Library()
 
 @register.filter
-def has_artisan(user):
-    return ArtisanProfile.objects.filter(user=user).exists()
-
-@register.filter
-def get_name_by_id(queryset, id):
+def get_name_by_id(names, id):
+    # names is an {id: name} map from marketplace.reference, so a chip
+    # never costs a query
     try:
-        return queryset.get(id=id).name
-    except:
+        return names.get(int(id), "")
+    except (TypeError, ValueError):
         return ""
 
@@ -1,3 +1,839 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from urllib.parse import parse_qs, quote
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import Http404, QueryDict
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from core import jobs
+from core.models import Job
+from core.testing import create_artisan, create_product
+from orders.models import Order, OrderItem
+
+from . import export, images, imports, pagination, recommendations, search, views
+from .models import Category, Material, Product
+
+
+class SimilarProductTests(TestCase):
+    def setUp(self):
+        self.pottery = Category.objects.create(name="Pottery")
+        self.textiles = Category.objects.create(name="Textiles")
+        self.clay = Material.objects.create(name="Clay")
+        self.cotton = Material.objects.create(name="Cotton")
+
+        self.artisan = create_artisan()
+        self.pot = self.create_product("Pot", self.pottery, self.clay, 500)
+
+    def create_product(self, name, category, material, price):
+        return create_product(self.artisan, name, category=category, material=material, price=price)
+
+    def neighbours(self, product):
+        return [p.name for p in recommendations.similar_products(product, limit=10)]
+
+    def test_ranks_by_shared_attributes_and_price(self):
+        self.create_product("Vase", self.pottery, self.clay, 450)
+        self.create_product("Bowl", self.pottery, self.clay, 50)
+        self.create_product("Clay bead necklace", self.textiles, self.clay, 500)
+        self.create_product("Scarf", self.textiles, self.cotton, 500)
+
+        recommendations.rebuild()
+
+        # Unrelated products are never candidates
+        self.assertEqual(self.neighbours(self.pot), ["Vase", "Bowl", "Clay bead necklace"])
+
+    def test_co_purchases_lift_unrelated_products(self):
+        vase = self.create_product("Vase", self.pottery, self.clay, 450)
+        scarf = self.create_product("Scarf", self.textiles, self.cotton, 900)
+
+        buyer = User.objects.create_user(username="buyer@example.com")
+        for _ in range(3):
+            order = Order.objects.create(buyer=buyer)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=self.pot, price_at_purchase=500),
+                OrderItem(order=order, product=scarf, price_at_purchase=900),
+            ])
+
+        recommendations.rebuild()
+        self.assertEqual(self.neighbours(self.pot), ["Scarf", "Vase"])
+
+        # A single-product refresh agrees with the full rebuild
+        recommendations.refresh(self.pot.id)
+        self.assertEqual(self.neighbours(self.pot), ["Scarf", "Vase"])
+        self.assertEqual(self.neighbours(vase), ["Pot"])
+
+    def test_only_similarity_changes_queue_a_refresh(self):
+        def queued():
+            return Job.objects.filter(task="marketplace.tasks.refresh_similar_products").count()
+
+        self.assertEqual(queued(), 1)
+        pot = Product.objects.get(id=self.pot.id)
+
+        pot.stock = 0
+        pot.name = "Clay pot"
+        pot.price = "500"
+        pot.save()
+        self.assertEqual(queued(), 1)
+
+        pot.price = "450"
+        pot.save()
+        self.assertEqual(queued(), 2)
+
+        pot.category = self.textiles
+        pot.save()
+        pot.save()
+        self.assertEqual(queued(), 3)
+
+    def test_inactive_products_are_skipped(self):
+        vase = self.create_product("Vase", self.pottery, self.clay, 450)
+        recommendations.rebuild()
+
+        vase.is_active = False
+        vase.save()
+        self.assertEqual(self.neighbours(self.pot), [])
+
+
+class ArtisanRoleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="maker@example.com", first_name="Mia")
+        self.client.force_login(self.user)
+
+    def test_buyer_role_is_remembered_for_the_session(self):
+        self.client.get("/products/")
+
+        with self.assertNumQueries(2):  # session + user only
+            response = self.client.get("/become-artisan/")
+        self.assertFalse(response.context["is_seller"])
+
+    def test_becoming_and_leaving_refresh_the_role(self):
+        self.client.get("/products/")
+        self.client.post("/become-artisan/", {
+            "display_name": "Mia Makes",
+            "location": "Pune",
+            "story": "Makes things by hand for the tests.",
+        })
+
+        response = self.client.get("/products/")
+        self.assertTrue(response.context["is_seller"])
+        self.assertContains(response, "Seller Dashboard")
+
+        self.client.post("/artisan/deactivate/")
+        response = self.client.get("/profile/")
+        self.assertFalse(response.context["is_seller"])
+        self.assertTrue(response.context["is_artisan"])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pottery = Category.objects.create(name="Pottery")
+        self.artisan = create_artisan()
+        self.pot = create_product(self.artisan, "Pot", category=self.pottery, price=500)
+        self.pages = [f"/products/{self.pot.id}/", f"/artisans/{self.artisan.id}/"]
+
+    def revalidate(self, url, response):
+        return self.client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+
+    def test_unchanged_page_is_not_modified(self):
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_the_page(self):
+        changes = [
+            lambda: Product.objects.filter(id=self.pot.id).update(stock=0),
+            lambda: self.pottery.save(),
+            # Another product changes what "similar" and "more by" show
+            lambda: create_product(self.artisan, "Bowl", category=self.pottery, price=400),
+        ]
+        for change in changes:
+            response = self.client.get(self.pages[0])
+            change()
+            with self.subTest(change=change):
+                self.assertEqual(self.revalidate(self.pages[0], response).status_code, 200)
+
+    def test_viewer_state_is_part_of_the_etag(self):
+        response = self.client.get(self.pages[0])
+
+        session = self.client.session
+        session["cart"] = {str(self.pot.id): 1}
+        session.save()
+
+        self.assertEqual(self.revalidate(self.pages[0], response).status_code, 200)
+
+    def test_missing_pages_still_404(self):
+        self.assertEqual(self.client.get("/products/999999/").status_code, 404)
+        self.artisan.is_active = False
+        self.artisan.save()
+        self.assertEqual(self.client.get(self.pages[1]).status_code, 404)
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pottery = Category.objects.create(name="Pottery")
+        self.artisan = create_artisan(display_name="Seller & Sons")
+        self.products = [
+            create_product(
+                self.artisan, f"Pot {i}", description="A <small> pot, glazed",
+                category=self.pottery, price=500 + i,
+            )
+            for i in range(5)
+        ]
+
+    def lines(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_ndjson_lists_active_products(self):
+        self.products[0].is_active = False
+        self.products[0].save()
+
+        rows = [json.loads(line) for line in self.lines("/export/catalog.ndjson")]
+
+        self.assertEqual([row["id"] for row in rows], [p.id for p in self.products[1:]])
+        self.assertEqual(rows[0]["artisan"], "Seller & Sons")
+        self.assertEqual(rows[0]["category"], "Pottery")
+        self.assertTrue(rows[0]["url"].startswith("http://testserver/products/"))
+
+    def test_csv_has_a_header_and_a_row_per_product(self):
+        rows = list(csv.DictReader(self.lines("/export/catalog.csv")))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["description"], "A <small> pot, glazed")
+
+    def test_xml_feed_is_well_formed(self):
+        response = self.client.get("/export/catalog.xml")
+        feed = ElementTree.fromstring(b"".join(response.streaming_content))
+        items = feed.findall("channel/item")
+
+        self.assertEqual(len(items), 5)
+        self.assertEqual(items[0].findtext("description"), "A <small> pot, glazed")
+        self.assertEqual(items[0].findtext("{http://base.google.com/ns/1.0}price"), "500.00 INR")
+
+    def test_xml_feed_drops_characters_xml_cannot_carry(self):
+        Product.objects.filter(id=self.products[0].id).update(
+            name="Pot\x00\x08\x0b\x0c\x1f\ufffe", description="Two\tlines\r\nglazed \U0001f3fa",
+        )
+        response = self.client.get("/export/catalog.xml")
+        item = ElementTree.fromstring(b"".join(response.streaming_content)).find("channel/item")
+
+        self.assertEqual(item.findtext("title"), "Pot")
+        self.assertEqual(item.findtext("description"), "Two\tlines\nglazed \U0001f3fa")
+
+    def test_since_includes_changes_and_deactivations(self):
+        response = self.client.get("/export/catalog.ndjson")
+        since = response["X-Export-Started-At"]
+
+        Product.objects.filter(id=self.products[1].id).update(is_active=False)
+        Product.objects.filter(id=self.products[2].id).update(stock=0)
+
+        rows = [json.loads(line) for line in self.lines(f"/export/catalog.ndjson?since={quote(since)}")]
+        self.assertEqual(
+            [(row["id"], row["active"]) for row in rows],
+            [(self.products[1].id, False), (self.products[2].id, True)],
+        )
+
+    def test_batches_cover_every_row(self):
+        ids = [
+            json.loads(line)["id"]
+            for chunk in export.export("ndjson", chunk_size=2)
+            for line in chunk.splitlines()
+        ]
+        self.assertEqual(ids, [p.id for p in self.products])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get("/export/catalog.pdf").status_code, 404)
+        self.assertEqual(self.client.get("/export/catalog.csv?since=yesterday").status_code, 400)
+
+        with self.settings(CATALOG_EXPORT_TOKEN="secret"):
+            self.assertEqual(self.client.get("/export/catalog.csv").status_code, 403)
+            self.assertEqual(self.client.get("/export/catalog.csv?token=secret").status_code, 200)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+        Category.objects.create(name="Pottery")
+        Material.objects.create(name="Clay")
+        self.user = User.objects.create_user(username="seller@example.com", first_name="Sita")
+        self.artisan = create_artisan(self.user)
+        self.client.force_login(self.user)
+
+    def upload(self, rows, images=("pot.jpg",)):
+        lines = ["name,description,category,material,price,stock,image"] + rows
+        products = SimpleUploadedFile("products.csv", "\n".join(lines).encode())
+
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for name in images:
+                image = BytesIO()
+                Image.new("RGB", (40, 30), "brown").save(image, "JPEG")
+                zip_file.writestr(f"photos/{name}", image.getvalue())
+
+        return self.client.post("/seller/products/import/", {
+            "products": products,
+            "images": SimpleUploadedFile("images.zip", archive.getvalue()),
+        })
+
+    def run_jobs(self):
+        while job := jobs.claim("test"):
+            self.assertEqual(jobs.run(job).status, "done", job.last_error)
+
+    def test_imports_products_and_attaches_images_in_the_background(self):
+        with patch.object(imports, "BATCH_SIZE", 2):
+            response = self.upload([
+                f"Pot {i},A pot,pottery,Clay,{500 + i},{i},pot.jpg" for i in range(5)
+            ])
+        self.assertRedirects(response, "/profile/", fetch_redirect_response=False)
+
+        products = Product.objects.order_by("id")
+        self.assertEqual(products.count(), 5)
+        self.assertFalse(products.filter(is_active=True).exists())
+
+        self.run_jobs()
+
+        self.assertEqual(products.filter(is_active=True).count(), 5)
+        pot = products.first()
+        self.assertEqual(pot.category.name, "Pottery")
+        self.assertTrue(pot.is_out_of_stock)
+        self.assertTrue(pot.image.name.startswith("products/pot"))
+        self.assertIn("thumb", pot.image_derivatives)
+        self.assertFalse(default_storage.listdir(imports.UPLOAD_DIR)[1])
+
+    def test_invalid_rows_import_nothing_and_are_all_reported(self):
+        response = self.upload([
+            "Pot,A pot,Pottery,Clay,500,1,pot.jpg",
+            "Vase,A vase,Glass,Clay,-5,1,vase.jpg",
+            "Bowl,A bowl,Pottery,Clay,250,many,pot.jpg",
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual([line for line, _ in response.context["errors"]], [3, 4])
+        self.assertIn('Unknown category "Glass"', response.context["errors"][0][1])
+        self.assertIn('image "vase.jpg" is not in the ZIP', response.context["errors"][0][1])
+
+    def test_oversized_images_are_reported(self):
+        with patch.object(Image, "MAX_IMAGE_PIXELS", 40 * 30 // 3):
+            response = self.upload(["Pot,A pot,Pottery,Clay,500,1,pot.jpg"])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("too many pixels", str(response.context["errors"]))
+        self.assertFalse(Product.objects.exists())
+
+    def test_missing_columns_are_reported(self):
+        response = self.client.post("/seller/products/import/", {
+            "products": SimpleUploadedFile("products.csv", b"name,price\nPot,500\n"),
+            "images": SimpleUploadedFile("images.zip", b"not a zip"),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.context["errors"]), 1)
+
+
+class AsyncProductDetailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        pottery = Category.objects.create(name="Pottery")
+        artisan = create_artisan()
+        self.pot, self.bowl, self.vase = [
+            create_product(artisan, name, category=pottery, price=500)
+            for name in ("Pot", "Bowl", "Vase")
+        ]
+
+    def get(self, view, product_id, **headers):
+        request = RequestFactory().get(f"/products/{product_id}/", **headers)
+        request.session = self.client.session
+        request.user = AnonymousUser()
+        if iscoroutinefunction(view):
+            view = async_to_sync(view)
+        return view(request, product_id=product_id)
+
+    def test_matches_the_sync_view(self):
+        sync = self.get(views.product_detail_view, self.pot.id)
+        response = self.get(views.product_detail_async_view, self.pot.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], sync["ETag"])
+        self.assertEqual(response["Last-Modified"], sync["Last-Modified"])
+        for name in ("Pot", "Bowl", "Vase"):
+            self.assertContains(response, name)
+
+    def test_conditional_requests(self):
+        etag = self.get(views.product_detail_async_view, self.pot.id)["ETag"]
+
+        response = self.get(views.product_detail_async_view, self.pot.id, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.assertRaises(Http404):
+            self.get(views.product_detail_async_view, 999999)
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        artisan = create_artisan()
+        # Repeated prices and timestamps, so pages split inside ties
+        self.products = [
+            create_product(artisan, f"Product {i}", price=price)
+            for i, price in enumerate([200, 100, 100, 300, 100, 200, 50])
+        ]
+        created = timezone.now()
+        Product.objects.filter(id__in=[p.id for p in self.products[:4]]).update(created_at=created)
+        Product.objects.filter(id__in=[p.id for p in self.products[4:]]).update(
+            created_at=created - timedelta(days=1),
+        )
+
+    def expected(self, sort):
+        field, descending, _ = pagination.SORT_OPTIONS[sort]
+        products = Product.objects.order_by(*(f"{'-' if descending else ''}{key}" for key in (field, "id")))
+        return [p.id for p in products]
+
+    def walk(self, sort):
+        # Forwards through every page, then back again from the last one
+        pages = [pagination.paginate(Product.objects.all(), sort, page_size=3)]
+        while pages[-1].has_next:
+            pages.append(pagination.paginate(Product.objects.all(), sort, pages[-1].next_cursor, page_size=3))
+
+        back = [pages[-1]]
+        while back[-1].has_previous:
+            back.append(pagination.paginate(Product.objects.all(), sort, back[-1].prev_cursor, page_size=3))
+        return pages, back[::-1]
+
+    def test_cursors_walk_every_sort_both_ways(self):
+        for sort in ("newest", "price_asc", "price_desc"):
+            with self.subTest(sort=sort):
+                pages, back = self.walk(sort)
+
+                ids = [p.id for page in pages for p in page.items]
+                self.assertEqual(ids, self.expected(sort))
+                self.assertEqual([len(page.items) for page in pages], [3, 3, 1])
+                self.assertEqual(
+                    [[p.id for p in page.items] for page in back],
+                    [[p.id for p in page.items] for page in pages],
+                )
+                self.assertFalse(pages[0].has_previous)
+                self.assertFalse(pages[-1].has_next)
+
+    def test_deep_pages_are_one_query(self):
+        pages, _ = self.walk("price_asc")
+        with self.assertNumQueries(1):
+            pagination.paginate(Product.objects.all(), "price_asc", pages[1].next_cursor, page_size=3)
+
+    def test_bad_cursors_fall_back_to_the_first_page(self):
+        first = [p.id for p in pagination.paginate(Product.objects.all(), "newest", page_size=3).items]
+        price_cursor = pagination.paginate(Product.objects.all(), "price_asc", page_size=3).next_cursor
+
+        def token(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+        for cursor in [
+            "not a cursor",
+            "%%%",
+            token(["a", "list"]),
+            token({"s": "newest", "d": "next", "v": "yesterday", "id": 1}),
+            token({"s": "newest", "d": "sideways", "v": timezone.now().isoformat(), "id": 1}),
+            token({"s": "newest", "d": "next", "v": timezone.now().isoformat()}),
+            price_cursor,
+        ]:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(pagination.decode_cursor(cursor, "newest"))
+                page = pagination.paginate(Product.objects.all(), "newest", cursor, page_size=3)
+                self.assertEqual([p.id for p in page.items], first)
+
+        # Values that parse but that the database can't compare against
+        for sort, value in [
+            ("price_asc", "cheap"),
+            ("price_asc", "NaN"),
+            ("price_desc", "-Infinity"),
+            ("price_asc", "sNaN"),
+            ("newest", "2026-01-01T00:00:00"),
+            ("newest", "0001-01-01T00:00:00+14:00"),
+            ("relevance", "nan"),
+            ("relevance", "inf"),
+        ]:
+            cursor = token({"s": sort, "d": "next", "v": value, "id": 1})
+            with self.subTest(sort=sort, value=value):
+                self.assertIsNone(pagination.decode_cursor(cursor, sort))
+                if sort != "relevance":
+                    cache.clear()
+                    response = self.client.get("/products/", {"sort": sort, "cursor": cursor})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.context["products"]), len(self.products))
+
+    def test_page_url_keeps_filters_and_sort(self):
+        params = QueryDict("category=1&category=2&material=3&sort=price_desc&q=clay+pot", mutable=True)
+        url = pagination.page_url(params, "abc")
+
+        self.assertEqual(parse_qs(url.lstrip("?")), {
+            "category": ["1", "2"],
+            "material": ["3"],
+            "sort": ["price_desc"],
+            "q": ["clay pot"],
+            "cursor": ["abc"],
+        })
+        self.assertIsNone(pagination.page_url(params, None))
+        self.assertNotIn("cursor", params)
+
+    def test_listing_links_replace_the_cursor(self):
+        cache.clear()
+        artisan = self.products[0].artisan
+        Product.objects.bulk_create(
+            Product(artisan=artisan, name=f"Extra {i}", description="Handmade", price=i, image="products/item.jpg")
+            for i in range(pagination.PAGE_SIZE * 2)
+        )
+
+        response = self.client.get("/products/", {"sort": "price_asc"})
+        next_url = response.context["next_url"]
+
+        response = self.client.get("/products/" + next_url)
+        query = parse_qs(response.context["next_url"].lstrip("?"))
+        self.assertEqual(query["sort"], ["price_asc"])
+        self.assertEqual(len(query["cursor"]), 1)
+        self.assertNotEqual(query["cursor"], parse_qs(next_url.lstrip("?"))["cursor"])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.pottery = Category.objects.create(name="Pottery")
+        self.clay = Material.objects.create(name="Terracotta")
+        self.artisan = create_artisan(display_name="Meera Weaves")
+        self.lamp = self.create_product("Brass lamp", "A lamp for a clay shelf")
+        self.pot = self.create_product("Clay pot", "Hand thrown", category=self.pottery, material=self.clay)
+
+    def create_product(self, name, description, **fields):
+        return create_product(self.artisan, name, description=description, **fields)
+
+    def names(self, query):
+        results = search.search(Product.objects.all(), query).order_by("-search_rank", "id")
+        return [product.name for product in results]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.names("clay"), ["Clay pot", "Brass lamp"])
+        self.assertEqual(self.names("CLAY   pot"), ["Clay pot"])
+        self.assertEqual(self.names("pots"), ["Clay pot"])
+        self.assertEqual(self.names("cla"), ["Clay pot", "Brass lamp"])
+        self.assertFalse(search.search(Product.objects.all(), "!!!").exists())
+
+    def test_artisan_category_and_material_names_are_searchable(self):
+        self.assertCountEqual(self.names("meera"), ["Brass lamp", "Clay pot"])
+        self.assertEqual(self.names("pottery"), ["Clay pot"])
+        self.assertEqual(self.names("terracotta"), ["Clay pot"])
+
+    def test_saves_and_deactivation_keep_the_index_in_sync(self):
+        self.lamp.name = "Copper lantern"
+        self.lamp.save()
+        self.assertEqual(self.names("brass"), [])
+        self.assertEqual(self.names("lantern"), ["Copper lantern"])
+
+        self.pot.is_active = False
+        self.pot.save()
+        self.assertEqual(self.names("pot"), [])
+
+        self.pot.is_active = True
+        self.pot.save()
+        self.assertEqual(self.names("pot"), ["Clay pot"])
+
+        self.pot.delete()
+        self.assertEqual(search.search(Product.objects.none(), "pot").count(), 0)
+
+    def test_renamed_and_deleted_facets_are_reindexed(self):
+        self.pottery.name = "Ceramics"
+        self.pottery.save()
+        self.assertEqual(self.names("pottery"), [])
+        self.assertEqual(self.names("ceramics"), ["Clay pot"])
+
+        self.pottery.delete()
+        self.clay.delete()
+        self.assertEqual(self.names("ceramics"), [])
+        self.assertEqual(self.names("terracotta"), [])
+        self.assertEqual(self.names("clay pot"), ["Clay pot"])
+
+    def test_renamed_artisan_is_reindexed_by_a_job(self):
+        self.artisan.display_name = "Anil Forge"
+        self.artisan.save()
+        while job := jobs.claim("test"):
+            jobs.run(job)
+
+        self.assertEqual(self.names("meera"), [])
+        self.assertCountEqual(self.names("anil"), ["Brass lamp", "Clay pot"])
+
+    def test_catalog_lists_matches_by_relevance(self):
+        cache.clear()
+        response = self.client.get("/products/", {"q": "clay"})
+        self.assertEqual([p.name for p in response.context["products"]], ["Clay pot", "Brass lamp"])
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pottery = Category.objects.create(name="Pottery")
+        self.textiles = Category.objects.create(name="Textiles")
+        self.clay = Material.objects.create(name="Clay")
+        self.cotton = Material.objects.create(name="Cotton")
+        artisan = create_artisan()
+        for name, category, material, stock, active in [
+            ("Clay pot", self.pottery, self.clay, 5, True),
+            ("Clay cup", self.pottery, self.clay, 0, True),
+            ("Clay vase", self.pottery, self.clay, 5, False),
+            ("Cotton rug", self.textiles, self.cotton, 0, True),
+            ("Cotton shawl", self.textiles, self.cotton, 3, True),
+            ("Clay bead scarf", self.textiles, self.clay, 2, True),
+        ]:
+            create_product(
+                artisan, name, category=category, material=material,
+                stock=stock, is_active=active,
+            )
+
+    def counts(self, **params):
+        response = self.client.get("/products/", params)
+        return (
+            {c.name: c.product_count for c in response.context["categories"]},
+            {m.name: m.product_count for m in response.context["materials"]},
+        )
+
+    def listed(self, **params):
+        return len(self.client.get("/products/", params).context["products"])
+
+    def test_counts_cover_active_products(self):
+        self.assertEqual(self.counts(), (
+            {"Pottery": 2, "Textiles": 3},
+            {"Clay": 3, "Cotton": 2},
+        ))
+
+    def test_counts_honour_the_stock_toggle_and_search(self):
+        self.assertEqual(self.counts(in_stock=1), (
+            {"Pottery": 1, "Textiles": 2},
+            {"Clay": 2, "Cotton": 1},
+        ))
+        self.assertEqual(self.counts(q="clay", in_stock=1), (
+            {"Pottery": 1, "Textiles": 1},
+            {"Clay": 2, "Cotton": 0},
+        ))
+
+    def test_each_count_matches_the_listing_for_that_option(self):
+        # Category and material selections are OR-ed, so each count is
+        # what ticking that option alone returns under the other filters
+        for filters in [{}, {"in_stock": 1}, {"q": "clay"}, {"q": "clay", "in_stock": 1}]:
+            categories, materials = self.counts(**filters)
+            for category in (self.pottery, self.textiles):
+                with self.subTest(filters=filters, category=category.name):
+                    self.assertEqual(categories[category.name], self.listed(category=category.id, **filters))
+            for material in (self.clay, self.cotton):
+                with self.subTest(filters=filters, material=material.name):
+                    self.assertEqual(materials[material.name], self.listed(material=material.id, **filters))
+
+    def test_stock_toggle_filters_the_listing(self):
+        response = self.client.get("/products/", {"in_stock": 1})
+        self.assertEqual(
+            sorted(p.name for p in response.context["products"]),
+            ["Clay bead scarf", "Clay pot", "Cotton shawl"],
+        )
+        self.assertContains(response, "In stock only")
+
+    def test_chip_links_remove_only_their_own_value(self):
+        params = {
+            "q": "vase 10", "category": [self.pottery.id, self.textiles.id],
+            "material": self.clay.id, "in_stock": 1, "sort": "newest",
+        }
+        context = self.client.get("/products/", params).context
+        category_links = {value: parse_qs(url[1:]) for value, url in context["category_chips"]}
+        material_links = {value: parse_qs(url[1:]) for value, url in context["material_chips"]}
+        self.assertEqual(category_links[str(self.pottery.id)], {
+            "q": ["vase 10"], "category": [str(self.textiles.id)],
+            "material": [str(self.clay.id)], "in_stock": ["1"], "sort": ["newest"],
+        })
+        self.assertEqual(
+            material_links[str(self.clay.id)]["category"],
+            [str(self.pottery.id), str(self.textiles.id)],
+        )
+        self.assertNotIn("material", material_links[str(self.clay.id)])
+        self.assertNotIn("in_stock", parse_qs(context["clear_stock_url"][1:]))
+        self.assertEqual(parse_qs(context["sort_urls"]["price_asc"][1:])["sort"], ["price_asc"])
+        self.assertEqual(parse_qs(context["clear_sort_url"][1:])["q"], ["vase 10"])
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pottery = Category.objects.create(name="Pottery")
+        self.artisan = create_artisan()
+        self.seller = self.artisan.user
+        self.pot, self.bowl = [
+            create_product(self.artisan, name, category=self.pottery, stock=5)
+            for name in ("Clay pot", "Clay bowl")
+        ]
+
+    def listed(self, path="/products/", **params):
+        return sorted(p.name for p in self.client.get(path, params).context["products"])
+
+    def assertCached(self, path, **params):
+        # A warm listing costs no catalog queries (anonymous: no session or user)
+        self.client.get(path, params)
+        with self.assertNumQueries(0):
+            self.client.get(path, params)
+
+    def test_listings_are_cached(self):
+        self.assertCached("/products/")
+        self.assertCached("/")
+
+    def test_saves_invalidate_listings(self):
+        self.assertCached("/products/")
+        self.assertCached("/")
+
+        self.pot.name = "Clay jar"
+        self.pot.save()
+
+        self.assertEqual(self.listed(), ["Clay bowl", "Clay jar"])
+        self.assertEqual(self.listed("/"), ["Clay bowl", "Clay jar"])
+
+    def test_queryset_updates_invalidate_listings(self):
+        self.assertCached("/products/")
+        self.assertCached("/")
+
+        Product.objects.filter(id=self.bowl.id).update(is_active=False)
+
+        self.assertEqual(self.listed(), ["Clay pot"])
+        self.assertEqual(self.listed("/"), ["Clay pot"])
+
+    def test_category_rename_invalidates_facets(self):
+        self.client.get("/products/")
+        Category.objects.filter(id=self.pottery.id).update(name="Ceramics")
+
+        response = self.client.get("/products/")
+        self.assertEqual([c.name for c in response.context["categories"]], ["Ceramics"])
+
+    def test_deactivating_a_seller_hides_their_products(self):
+        self.assertCached("/products/")
+        self.assertCached("/")
+
+        self.client.force_login(self.seller)
+        self.client.post("/artisan/deactivate/")
+        self.client.logout()
+
+        self.assertEqual(self.listed(), [])
+        self.assertEqual(self.listed("/"), [])
+
+    def test_equivalent_queries_share_one_entry(self):
+        other = Category.objects.create(name="Textiles")
+        with patch("marketplace.views.catalog_listing", wraps=views.catalog_listing) as build:
+            self.client.get(f"/products/?category={other.id}&category={self.pottery.id}&q=Clay++POT")
+            self.client.get(f"/products/?q=clay%20pot&category={self.pottery.id}&category={other.id}&category={other.id}")
+            self.client.get(f"/products/?category={other.id}&category={self.pottery.id}&q=clay+pot&sort=bogus")
+            self.assertEqual(build.call_count, 1)
+
+            self.client.get(f"/products/?category={self.pottery.id}&q=clay+pot")
+            self.assertEqual(build.call_count, 2)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+        self.artisan = create_artisan()
+
+    def create_product(self, name, content):
+        path = default_storage.save(f"products/{name}", ContentFile(content))
+        return create_product(self.artisan, name, image=path)
+
+    def image(self, size, mode="RGB", fmt="PNG"):
+        buffer = BytesIO()
+        Image.new(mode, size, (120, 60, 30, 128) if mode == "RGBA" else "brown").save(buffer, fmt)
+        return buffer.getvalue()
+
+    def test_builds_every_size_in_both_formats(self):
+        product = self.create_product("pot.png", self.image((1600, 900), mode="RGBA"))
+        product.build_image_derivatives()
+        product.refresh_from_db()
+
+        self.assertEqual(set(product.image_derivatives), set(images.PRODUCT_DERIVATIVES))
+        for name, (width, height, crop) in images.PRODUCT_DERIVATIVES.items():
+            entry = product.image_derivatives[name]
+            for fmt in images.FORMATS:
+                with default_storage.open(entry[fmt]) as file, Image.open(file) as derived:
+                    expected = (width, height) if crop else (width, width * 9 // 16)
+                    self.assertEqual(derived.size, expected, (name, fmt))
+                    self.assertEqual(derived.format, images.FORMATS[fmt][1]["format"])
+                    if fmt == "jpeg":
+                        self.assertEqual(derived.mode, "RGB")
+            self.assertEqual(entry["width"], width)
+
+    def test_srcset_lists_built_widths_and_falls_back_to_the_original(self):
+        product = self.create_product("pot.png", self.image((900, 900)))
+        self.assertEqual(product.card_srcset, "")
+        self.assertEqual(product.card_image_url, product.image.url)
+
+        product.build_image_derivatives()
+        card, card_2x = (product.image_derivatives[name] for name in ("card", "card_2x"))
+        self.assertEqual(
+            product.card_srcset,
+            f"{default_storage.url(card['jpeg'])} 400w, {default_storage.url(card_2x['jpeg'])} 800w",
+        )
+        self.assertTrue(product.card_srcset_webp.endswith(".webp 800w"))
+        self.assertEqual(product.card_image_url, default_storage.url(card["jpeg"]))
+
+        response = self.client.get(f"/products/{product.id}/")
+        self.assertContains(response, product.detail_srcset_webp)
+
+    def test_unreadable_and_oversized_images_are_skipped(self):
+        broken = self.create_product("broken.jpg", b"not an image")
+        huge = self.create_product("huge.png", self.image((64, 64)))
+
+        with self.assertLogs("marketplace.images", "WARNING"):
+            broken.build_image_derivatives()
+        # Twice the pixel limit raises DecompressionBombError
+        with patch.object(Image, "MAX_IMAGE_PIXELS", 64 * 64 // 3), self.assertLogs("marketplace.images", "WARNING"):
+            huge.build_image_derivatives()
+
+        self.assertEqual(broken.image_derivatives, {})
+        self.assertEqual(huge.image_derivatives, {})
+        self.assertEqual(huge.card_image_url, huge.image.url)
+
+    def test_backfill_command(self):
+        pot = self.create_product("pot.png", self.image((500, 500)))
+        bowl = self.create_product("bowl.png", self.image((500, 500)))
+        bowl.build_image_derivatives()
+        built = bowl.image_derivatives
+
+        out = StringIO()
+        call_command("build_image_derivatives", stdout=out)
+        self.assertIn("Built derivatives for 1 image(s).", out.getvalue())
+        pot.refresh_from_db()
+        bowl.refresh_from_db()
+        self.assertEqual(set(pot.image_derivatives), set(images.PRODUCT_DERIVATIVES))
+        self.assertEqual(bowl.image_derivatives, built)
+
+        out = StringIO()
+        call_command("build_image_derivatives", force=True, stdout=out)
+        self.assertIn("Built derivatives for 2 image(s).", out.getvalue())
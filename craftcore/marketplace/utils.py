@@ -1,11 +1,11 @@
+import copy
 from django.shortcuts import redirect
 from django.contrib import messages
-from .models import ArtisanProfile
+from django.db.models import Count
 
 def require_active_artisan(request):
-    try:
-        artisan = request.user.artisanprofile
-    except ArtisanProfile.DoesNotExist:
+    artisan = request.artisan
+    if not artisan:
         messages.error(request, "You must become an artisan first.")
         return None
 
@@ -17,3 +17,22 @@ def require_active_artisan(request):
         return None
 
     return artisan
+
+def facet_counts(products, field):
+    rows = (
+        products
+        .order_by()
+        .values(field)
+        .annotate(count=Count("id"))
+    )
+    return {row[field]: row["count"] for row in rows}
+
+def with_facet_counts(options, products, field):
+    # Annotates copies: the options may be shared reference-data instances
+    counts = facet_counts(products, field)
+    options = [copy.copy(option) for option in options]
+
+    for option in options:
+        option.product_count = counts.get(option.id, 0)
+
+    return options
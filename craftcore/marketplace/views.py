@@ -1,22 +1,40 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import secrets
+from datetime import UTC
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
 from django.db import transaction
-from .models import ArtisanProfile, Product, Category, Material
-from .utils import require_active_artisan
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_safe
+from core.jobs import enqueue
+from core.async_db import gather
+from core.routers import replica_reads
+from .models import ArtisanProfile, Product
+from .reference import CATEGORIES, MATERIALS
+from .roles import forget_artisan
+from .pagination import DEFAULT_SORT, SORT_OPTIONS, page_url, paginate
+from . import cache as catalog_cache
+from . import conditional, export, imports
+from . import recommendations, search
+from .utils import require_active_artisan, with_facet_counts
 
 @login_required(login_url="/login/?next=/become-artisan/")
 def become_artisan_view(request):
     # Prevent duplicate artisan profiles
-    if ArtisanProfile.objects.filter(user=request.user).exists():
+    if request.artisan:
         return redirect("/profile/")
 
     if request.method == "POST":
         display_name = request.POST.get("display_name", "").strip()
         location = request.POST.get("location", "").strip()
         story = request.POST.get("story", "").strip()
-        profile_image = request.FILES.get("profile_image") 
+        profile_image = request.FILES.get("profile_pic")
 
         # Validation
         if not display_name or not location or not story:
@@ -28,7 +46,7 @@ def become_artisan_view(request):
             return redirect("/become-artisan/")
 
         # Create Artisan Profile
-        ArtisanProfile.objects.create(
+        artisan = ArtisanProfile.objects.create(
             user=request.user,
             display_name=display_name,
             location=location,
@@ -36,6 +54,10 @@ def become_artisan_view(request):
             profile_image=profile_image,
             is_active=True
         )
+        forget_artisan(request)
+
+        if profile_image:
+            enqueue("marketplace.tasks.build_artisan_image_derivatives", artisan_id=artisan.id)
 
         messages.success(request, "You are now an artisan on CraftCore!")
         return redirect("/profile/")
@@ -44,9 +66,8 @@ def become_artisan_view(request):
 
 @login_required
 def update_artisan_view(request):
-    try:
-        artisan = request.user.artisanprofile
-    except ArtisanProfile.DoesNotExist:
+    artisan = request.artisan
+    if not artisan:
         messages.error(request, "You are not an artisan.")
         return redirect("/become-artisan/")
 
@@ -67,9 +88,14 @@ def update_artisan_view(request):
 
         # Image update ONLY if uploaded
         if profile_pic:
-            artisan.profile_pic = profile_pic
+            artisan.discard_image_derivatives()
+            artisan.profile_image = profile_pic
 
         artisan.save()
+        forget_artisan(request)
+
+        if profile_pic:
+            enqueue("marketplace.tasks.build_artisan_image_derivatives", artisan_id=artisan.id)
 
         messages.success(request, "Artisan profile updated successfully.")
         return redirect("/profile/")
@@ -83,9 +109,8 @@ def update_artisan_view(request):
 
 @login_required
 def deactivate_artisan_view(request):
-    try:
-        artisan = request.user.artisanprofile
-    except ArtisanProfile.DoesNotExist:
+    artisan = request.artisan
+    if not artisan:
         messages.error(request, "You are not a seller.")
         return redirect("/profile/")
 
@@ -103,6 +128,11 @@ def deactivate_artisan_view(request):
             is_active=True
         ).update(is_active=False)
 
+        # Their search rows are refreshed by the job queued from the artisan's
+        # post_save; until then the active filter keeps them out of results
+
+    forget_artisan(request)
+
     messages.success(
         request,
         "You are no longer a seller. Your products are no longer visible, "
@@ -117,12 +147,9 @@ def add_product_view(request):
     if not artisan:
         return redirect("/profile/")
     
-    categories = Category.objects.all()
-    materials = Material.objects.all()
-
     context = {
-        "categories": categories,
-        "materials": materials,
+        "categories": CATEGORIES.all(),
+        "materials": MATERIALS.all(),
         "is_edit": False
     }
 
@@ -135,10 +162,9 @@ def add_product_view(request):
         stock = request.POST.get("stock")
         image = request.FILES.get("image")
 
-        try:
-            category = Category.objects.get(id=category_id)
-            material = Material.objects.get(id=material_id)
-        except (Category.DoesNotExist, Material.DoesNotExist):
+        category = CATEGORIES.get(category_id)
+        material = MATERIALS.get(material_id)
+        if category is None or material is None:
             messages.error(request, "Invalid category or material.")
             return redirect("/seller/products/add/")
 
@@ -151,7 +177,7 @@ def add_product_view(request):
             messages.error(request, "Price must be greater than zero.")
             return redirect("/seller/products/add/")
 
-        Product.objects.create(
+        product = Product.objects.create(
             artisan=artisan,
             name=name,
             description=description,
@@ -161,23 +187,58 @@ def add_product_view(request):
             stock=stock,
             image=image
         )
+        enqueue("marketplace.tasks.build_product_image_derivatives", product_id=product.id)
 
         messages.success(request, "Product added successfully.")
         return redirect("/profile/")
 
     return render(request, "marketplace/add_product.html", context)
 
+@login_required
+def import_products_view(request):
+    artisan = require_active_artisan(request)
+    if not artisan:
+        return redirect("/profile/")
+
+    context = {
+        "columns": imports.COLUMNS,
+        "max_rows": imports.MAX_ROWS,
+        "categories": CATEGORIES.all(),
+        "materials": MATERIALS.all(),
+    }
+
+    if request.method == "POST":
+        csv_file = request.FILES.get("products")
+        zip_file = request.FILES.get("images")
+        if not csv_file or not zip_file:
+            messages.error(request, "Upload both the products CSV and the images ZIP.")
+            return redirect("/seller/products/import/")
+
+        try:
+            count = imports.import_products(artisan, csv_file, zip_file)
+        except imports.ImportErrors as exc:
+            context["errors"] = exc.errors
+            return render(request, "marketplace/import_products.html", context, status=400)
+
+        messages.success(
+            request,
+            f"Imported {count} products. They will appear in your shop once their images are processed."
+        )
+        return redirect("/profile/")
+
+    return render(request, "marketplace/import_products.html", context)
+
 @login_required
 def edit_product_view(request, product_id):
     artisan = require_active_artisan(request)
     if not artisan:
         return redirect("/profile/")
-    
-    artisan = request.user.artisanprofile
-    product = get_object_or_404(Product, id=product_id, artisan=artisan)
 
-    categories = Category.objects.all()
-    materials = Material.objects.all()
+    product = get_object_or_404(
+        Product.objects.select_related("category", "material"),
+        id=product_id,
+        artisan=artisan
+    )
 
     if request.method == "POST":
         product.name = request.POST.get("name", "").strip()
@@ -189,17 +250,21 @@ def edit_product_view(request, product_id):
 
         image = request.FILES.get("image")
         if image:
+            product.discard_image_derivatives()
             product.image = image  # only replace if uploaded
 
         product.save()
 
+        if image:
+            enqueue("marketplace.tasks.build_product_image_derivatives", product_id=product.id)
+
         messages.success(request, "Product updated successfully.")
         return redirect("/profile/")
 
     context = {
         "product": product,
-        "categories": categories,
-        "materials": materials,
+        "categories": CATEGORIES.all(),
+        "materials": MATERIALS.all(),
         "is_edit": True,
     }
 
@@ -210,8 +275,7 @@ def delete_product_view(request, product_id):
     artisan = require_active_artisan(request)
     if not artisan:
         return redirect("/profile/")
-    
-    artisan = request.user.artisanprofile
+
     product = get_object_or_404(Product, id=product_id, artisan=artisan)
 
     if request.method == "POST":
@@ -224,56 +288,136 @@ def delete_product_view(request, product_id):
         "product": product
     })
 
-def products_list_view(request):
-    products = Product.objects.filter(is_active=True).select_related("artisan")
+def catalog_listing(categories, materials, sort, q, cursor, in_stock=False):
+    products = (
+        Product.objects
+        .filter(is_active=True)
+        .select_related("artisan", "category", "material")
+    )
 
-    selected_categories = request.GET.getlist("category")
-    selected_materials = request.GET.getlist("material")
-    sort = request.GET.get("sort")
-    query_params = request.GET.copy()
+    # STOCK: sold-out products are listed unless the buyer hides them
+    if in_stock:
+        products = products.filter(is_out_of_stock=False)
+
+    # SEARCH (ranked by relevance unless another sort is chosen)
+    if q:
+        products = search.search(products, q)
+
+    # FACETS: one grouped count per facet over the searched (and, if
+    # toggled, in-stock) catalog
+    category_options = with_facet_counts(CATEGORIES.all(), products, "category_id")
+    material_options = with_facet_counts(MATERIALS.all(), products, "material_id")
 
-    if selected_categories or selected_materials:
+    if categories or materials:
         query = Q()
 
-        if selected_categories:
-            query |= Q(category_id__in=selected_categories)
+        if categories:
+            query |= Q(category_id__in=categories)
 
-        if selected_materials:
-            query |= Q(material_id__in=selected_materials)
+        if materials:
+            query |= Q(material_id__in=materials)
 
         products = products.filter(query)
 
-    # SORTING
-    if sort == "price_asc":
-        products = products.order_by("price")
-    elif sort == "price_desc":
-        products = products.order_by("-price")
+    # SORTING + PAGINATION
+    page = paginate(products, sort or ("relevance" if q else DEFAULT_SORT), cursor)
+
+    return {
+        "products": page.items,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+        "categories": category_options,
+        "materials": material_options,
+    }
+
+def listing_url(query_params, key, value=None, replace=None):
+    # "?..." with `key` set to `replace`, or else with one `value` (or
+    # every value) of it removed
+    params = query_params.copy()
+    if replace is not None:
+        params[key] = replace
+    elif value is not None:
+        params.setlist(key, [v for v in params.getlist(key) if v != value])
+    else:
+        params.pop(key, None)
+    return "?" + params.urlencode()
+
+@replica_reads
+def products_list_view(request):
+    selected_categories = request.GET.getlist("category")
+    selected_materials = request.GET.getlist("material")
+    sort = request.GET.get("sort")
+    q = request.GET.get("q", "").strip()
+    cursor = request.GET.get("cursor")
+    in_stock = request.GET.get("in_stock") == "1"
+    query_params = request.GET.copy()
+    query_params.pop("cursor", None)
+
+    if sort not in SORT_OPTIONS or (sort == "relevance" and not q):
+        sort = None
+
+    # Normalized so equivalent URLs share one cache entry
+    params = {
+        "categories": sorted(set(selected_categories)),
+        "materials": sorted(set(selected_materials)),
+        "sort": sort,
+        "q": " ".join(q.lower().split()),
+        "in_stock": in_stock,
+        "cursor": cursor,
+    }
+    listing = catalog_cache.get_or_build(
+        "products",
+        params,
+        lambda: catalog_listing(
+            params["categories"], params["materials"], sort, params["q"], cursor, in_stock
+        ),
+    )
 
     context = {
-        "products": products,
-        "categories": Category.objects.all(),
-        "materials": Material.objects.all(),
+        "products": listing["products"],
+        "next_url": page_url(query_params, listing["next_cursor"]),
+        "prev_url": page_url(query_params, listing["prev_cursor"]),
+        "categories": listing["categories"],
+        "materials": listing["materials"],
+        "category_names": CATEGORIES.names(),
+        "material_names": MATERIALS.names(),
         "selected_categories": selected_categories,
         "selected_materials": selected_materials,
         "selected_sort": sort,
+        "in_stock": in_stock,
+        "query": q,
     }
 
+    # Filter chip and sort links, each changing one parameter of the
+    # current query
     context.update({
-        "base_query": query_params,
+        "clear_query_url": listing_url(query_params, "q"),
+        "category_chips": [
+            (category, listing_url(query_params, "category", category))
+            for category in selected_categories
+        ],
+        "material_chips": [
+            (material, listing_url(query_params, "material", material))
+            for material in selected_materials
+        ],
+        "clear_stock_url": listing_url(query_params, "in_stock"),
+        "clear_sort_url": listing_url(query_params, "sort"),
+        "sort_urls": {
+            option: listing_url(query_params, "sort", replace=option)
+            for option in ("price_asc", "price_desc")
+        },
     })
 
     return render(request, "marketplace/products.html", context)
 
-def product_detail_view(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
+def similar_to(product):
+    # Similar products from the precomputed index; products the index
+    # hasn't reached yet fall back to same category OR same material
+    similar_products = recommendations.similar_products(product)
+    if similar_products:
+        return similar_products
 
-    inactive = not product.is_active
-    out_of_stock = product.stock <= 0
-
-    artisan = product.artisan
-
-    # Similar products: same category OR same material
-    similar_products = (
+    return list(
         Product.objects
         .filter(is_active=True)
         .filter(
@@ -281,36 +425,73 @@ def product_detail_view(request, product_id):
             Q(material=product.material)
         )
         .exclude(id=product.id)
-        .distinct()
+        .select_related("artisan", "category", "material")
+        .order_by("-order_count", "-created_at")
         [:4]
     )
 
-    # More by artisan
-    artisan_products = (
+def more_by_artisan(product):
+    return list(
         Product.objects
-        .filter(artisan=artisan, is_active=True)
+        .filter(artisan=product.artisan, is_active=True)
         .exclude(id=product.id)
+        .select_related("artisan", "category", "material")
         [:4]
     )
 
-    inactive = not product.is_active
-
-    context = {
+def product_detail_context(product, similar_products, artisan_products):
+    return {
         "product": product,
-        "artisan": artisan,
+        "artisan": product.artisan,
         "similar_products": similar_products,
         "artisan_products": artisan_products,
-        "inactive": inactive,
-        "out_of_stock": out_of_stock,
+        "inactive": not product.is_active,
+        "out_of_stock": product.stock <= 0,
     }
 
+@replica_reads
+@condition(etag_func=conditional.product_etag, last_modified_func=conditional.product_last_modified)
+def product_detail_view(request, product_id):
+    product = get_object_or_404(
+        Product.objects.select_related("artisan", "category", "material"),
+        id=product_id
+    )
+
+    context = product_detail_context(product, similar_to(product), more_by_artisan(product))
     return render(request, "marketplace/product_detail.html", context)
 
+# Served instead of product_detail_view under ASGI (see ASYNC_VIEWS): the
+# similar and "more by" queries only need the product, so they run at
+# the same time
+@replica_reads
+@conditional.async_condition(etag_func=conditional.product_etag, last_modified_func=conditional.product_last_modified)
+async def product_detail_async_view(request, product_id):
+    product = await aget_object_or_404(
+        Product.objects.select_related("artisan", "category", "material"),
+        id=product_id
+    )
+
+    similar_products, artisan_products = await gather(
+        lambda: similar_to(product),
+        lambda: more_by_artisan(product),
+    )
+
+    context = product_detail_context(product, similar_products, artisan_products)
+    # Context processors read the session and user, which is sync-only
+    return await sync_to_async(render)(request, "marketplace/product_detail.html", context)
+
+@replica_reads
+@condition(etag_func=conditional.artisan_etag, last_modified_func=conditional.artisan_last_modified)
 def artisan_profile_view(request, artisan_id):
     artisan = get_object_or_404(ArtisanProfile, id=artisan_id, is_active=True)
 
     # Products by this artisan
-    products = Product.objects.filter(artisan=artisan, is_active=True).order_by("-created_at")
+    products = (
+        Product.objects
+        .filter(artisan=artisan, is_active=True)
+        .select_related("artisan", "category", "material")
+        .order_by("-created_at")
+    )
 
     # Other artisans (exclude current)
     other_artisans = (
@@ -325,4 +506,45 @@ def artisan_profile_view(request, artisan_id):
         "other_artisans": other_artisans,
     }
 
-    return render(request, "marketplace/artisan_profile.html", context)
\ No newline at end of file
+    return render(request, "marketplace/artisan_profile.html", context)
+
+def parse_since(value):
+    # ISO 8601; naive times are taken as UTC
+    since = parse_datetime(value)
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since, UTC)
+    return since
+
+@require_safe
+def catalog_export_view(request, fmt):
+    if fmt not in export.FORMATS:
+        raise Http404("Unknown export format")
+
+    token = settings.CATALOG_EXPORT_TOKEN
+    if token and not secrets.compare_digest(request.GET.get("token", ""), token):
+        return HttpResponseForbidden("Invalid export token.")
+
+    since = None
+    if request.GET.get("since"):
+        try:
+            since = parse_since(request.GET["since"])
+        except ValueError:
+            since = None
+        if since is None:
+            return HttpResponseBadRequest("since must be an ISO 8601 timestamp.")
+
+    # Taken before the first query: pass it as ?since= next time and
+    # nothing changed while this export streams is missed
+    started_at = timezone.now()
+    content_type, extension = export.FORMATS[fmt]
+    base_url = request.build_absolute_uri("/").rstrip("/")
+
+    # Queries run while the response streams, after the view (and any
+    # middleware timing it) has returned
+    response = StreamingHttpResponse(
+        export.export(fmt, since=since, base_url=base_url),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'inline; filename="catalog.{extension}"'
+    response["X-Export-Started-At"] = started_at.isoformat()
+    return response
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import ArtisanDailySales, Order, OrderItem, ProductDailySales
 
 admin.site.register(Order)
-admin.site.register(OrderItem)
\ No newline at end of file
+admin.site.register(OrderItem)
+admin.site.register(ArtisanDailySales)
+admin.site.register(ProductDailySales)
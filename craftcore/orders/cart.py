@@ -0,0 +1,64 @@
+from marketplace.models import Product
+
+CART_SESSION_KEY = "cart"
+MAX_QUANTITY = 20
+
+
+class Cart:
+    # Session-backed cart: {"<product id>": quantity}. Only ids live in
+    # the session; products and prices are read fresh at display and
+    # checkout time.
+
+    def __init__(self, request):
+        self.session = request.session
+        self.lines = dict(self.session.get(CART_SESSION_KEY, {}))
+
+    def __len__(self):
+        return sum(self.lines.values())
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def add(self, product_id, quantity=1):
+        key = str(product_id)
+        self.set(key, self.lines.get(key, 0) + quantity)
+
+    def set(self, product_id, quantity):
+        key = str(product_id)
+        quantity = min(int(quantity), MAX_QUANTITY)
+
+        if quantity > 0:
+            self.lines[key] = quantity
+        else:
+            self.lines.pop(key, None)
+
+        self.save()
+
+    def remove(self, product_id):
+        self.set(product_id, 0)
+
+    def clear(self):
+        self.lines = {}
+        self.save()
+
+    def save(self):
+        self.session[CART_SESSION_KEY] = self.lines
+        self.session.modified = True
+
+    def items(self):
+        # [(product, quantity)] for products that can still be bought,
+        # in one query; unavailable products are dropped from the cart
+        products = (
+            Product.objects
+            .filter(id__in=self.lines, is_active=True)
+            .select_related("artisan")
+            .order_by("id")
+        )
+        items = [(product, self.lines[str(product.id)]) for product in products]
+
+        available = {str(product.id) for product, _ in items}
+        if available != set(self.lines):
+            self.lines = {key: qty for key, qty in self.lines.items() if key in available}
+            self.save()
+
+        return items
@@ -0,0 +1,7 @@
+from .cart import CART_SESSION_KEY
+
+
+def cart(request):
+    # Reads the session only; no database access
+    lines = request.session.get(CART_SESSION_KEY, {})
+    return {"cart_count": sum(lines.values())}
@@ -0,0 +1,117 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from marketplace.models import ArtisanProfile, Product
+from orders.models import OrderItem
+from orders.utils import OutOfStockError, place_order
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammers checkout for one hot product from several threads against "
+        "the configured database, verifies nothing was oversold and reports "
+        "orders/second. Seeded rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--stock", type=int, default=200)
+        parser.add_argument(
+            "--attempts",
+            type=int,
+            default=None,
+            help="Total checkout attempts (defaults to twice the stock).",
+        )
+
+    def handle(self, *args, **options):
+        stock = options["stock"]
+        attempts = options["attempts"] or stock * 2
+
+        seller = User.objects.create_user(username="bench-seller@example.com")
+        buyer = User.objects.create_user(username="bench-buyer@example.com")
+
+        try:
+            artisan = ArtisanProfile.objects.create(
+                user=seller,
+                display_name="Bench Seller",
+                location="Nowhere",
+                story="Seeded for the checkout contention benchmark.",
+            )
+            product = Product.objects.create(
+                artisan=artisan,
+                name="Hot product",
+                description="Everyone wants one",
+                price=100,
+                image="products/bench.jpg",
+                stock=stock,
+            )
+            results = self.run_threads(buyer, product, attempts, options["threads"])
+            self.report(product, stock, attempts, results)
+        finally:
+            # Cascades to the artisan, product, orders and items
+            User.objects.filter(pk__in=[seller.pk, buyer.pk]).delete()
+
+    def run_threads(self, buyer, product, attempts, threads):
+        lock = threading.Lock()
+        results = {"remaining": attempts, "sold": 0, "rejected": 0, "errors": 0}
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not results["remaining"]:
+                            return
+                        results["remaining"] -= 1
+
+                    try:
+                        place_order(buyer, [(product, 1)])
+                        outcome = "sold"
+                    except OutOfStockError:
+                        outcome = "rejected"
+                    except OperationalError:
+                        # e.g. SQLite busy timeout under heavy contention
+                        outcome = "errors"
+
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        results["elapsed"] = time.perf_counter() - start
+
+        return results
+
+    def report(self, product, stock, attempts, results):
+        product.refresh_from_db()
+        items = OrderItem.objects.filter(product=product).count()
+        elapsed = results["elapsed"]
+
+        self.stdout.write(f"database:    {connection.vendor}")
+        self.stdout.write(f"attempts:    {attempts}")
+        self.stdout.write(f"sold:        {results['sold']}")
+        self.stdout.write(f"rejected:    {results['rejected']}")
+        self.stdout.write(f"errors:      {results['errors']}")
+        self.stdout.write(f"final stock: {product.stock} (out of stock: {product.is_out_of_stock})")
+        self.stdout.write(f"elapsed:     {elapsed:.2f}s")
+        self.stdout.write(f"orders/sec:  {results['sold'] / elapsed:.1f}")
+
+        if product.stock + items != stock or items != results["sold"]:
+            raise CommandError(
+                f"Oversold or lost update: stock {stock} -> {product.stock} "
+                f"with {items} order items."
+            )
+        if product.is_out_of_stock != (product.stock == 0):
+            raise CommandError("is_out_of_stock does not match the remaining stock.")
+
+        self.stdout.write(self.style.SUCCESS("No oversell."))
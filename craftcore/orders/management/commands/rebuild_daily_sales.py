@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import TruncDate
+
+from orders.models import ArtisanDailySales, OrderItem, ProductDailySales
+from orders.utils import check_daily_sales, rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily product and artisan sales rollups from OrderItem "
+        "history, optionally from --since onwards. With --check, only "
+        "reports drifted days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="First day to rebuild (YYYY-MM-DD); earlier days are left alone.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Compare rollups with OrderItem history without writing.",
+        )
+
+    def handle(self, *args, **options):
+        order_items = OrderItem.objects.all()
+        product_days = ProductDailySales.objects.all()
+        artisan_days = ArtisanDailySales.objects.all()
+
+        if options["since"]:
+            order_items = (
+                order_items
+                .alias(day=TruncDate("order__created_at"))
+                .filter(day__gte=options["since"])
+            )
+            product_days = product_days.filter(date__gte=options["since"])
+            artisan_days = artisan_days.filter(date__gte=options["since"])
+
+        if options["check"]:
+            mismatches = check_daily_sales(order_items, product_days, artisan_days)
+            for model, key, stored, expected in mismatches:
+                self.stdout.write(f"{model} {key}: stored {stored}, expected {expected}")
+
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} daily sales row(s) out of sync.")
+
+            self.stdout.write(self.style.SUCCESS("Daily sales rollups are consistent."))
+            return
+
+        with transaction.atomic():
+            rebuild_daily_sales(order_items, product_days, artisan_days)
+
+        self.stdout.write(self.style.SUCCESS("Daily sales rollups rebuilt."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from marketplace.models import ArtisanProfile, Product
+from orders.models import OrderItem
+from orders.utils import check_sales_counters, rebuild_sales_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the denormalized product and artisan sales counters from "
+        "OrderItem history. With --check, only reports drifted rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Compare counters with OrderItem history without writing.",
+        )
+
+    def handle(self, *args, **options):
+        querysets = (
+            OrderItem.objects.all(),
+            Product.objects.all(),
+            ArtisanProfile.objects.all(),
+        )
+
+        if options["check"]:
+            mismatches = check_sales_counters(*querysets)
+            for model, pk, stored, expected in mismatches:
+                self.stdout.write(f"{model} #{pk}: stored {stored}, expected {expected}")
+
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} sales counter(s) out of sync.")
+
+            self.stdout.write(self.style.SUCCESS("Sales counters are consistent."))
+            return
+
+        with transaction.atomic():
+            rebuild_sales_counters(*querysets)
+
+        self.stdout.write(self.style.SUCCESS("Sales counters rebuilt."))
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0013_catalog_indexes'),
+        ('orders', '0002_orderitem_price_at_purchase'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['buyer', '-created_at', '-id'], name='orders_orde_buyer_i_7e646c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['product', 'order'], name='orders_orde_product_d9c1ab_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 6.0 on 2026-10-18 17:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+# A frozen copy of orders.utils.rebuild_daily_sales as of this migration,
+# so later changes there can't alter it. The tables start out empty.
+def backfill_daily_sales(apps, schema_editor):
+    OrderItem = apps.get_model("orders", "OrderItem")
+    ProductDailySales = apps.get_model("orders", "ProductDailySales")
+    ArtisanDailySales = apps.get_model("orders", "ArtisanDailySales")
+
+    def daily_totals(*keys):
+        return (
+            OrderItem.objects
+            .order_by()
+            .annotate(day=TruncDate("order__created_at"))
+            .values(*keys, "day")
+            .annotate(
+                orders=Count("id"),
+                units=Sum("quantity"),
+                revenue=Sum(
+                    F("price_at_purchase") * F("quantity"),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                ),
+            )
+            .iterator(chunk_size=2000)
+        )
+
+    ProductDailySales.objects.bulk_create(
+        (
+            ProductDailySales(
+                product_id=row["product_id"], artisan_id=row["product__artisan_id"], date=row["day"],
+                orders=row["orders"], units=row["units"], revenue=row["revenue"],
+            )
+            for row in daily_totals("product_id", "product__artisan_id")
+        ),
+        batch_size=1000,
+    )
+    ArtisanDailySales.objects.bulk_create(
+        (
+            ArtisanDailySales(
+                artisan_id=row["product__artisan_id"], date=row["day"],
+                orders=row["orders"], units=row["units"], revenue=row["revenue"],
+            )
+            for row in daily_totals("product__artisan_id")
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0014_updated_at'),
+        ('orders', '0003_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtisanDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('artisan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='marketplace.artisanprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('artisan', 'date'), name='unique_artisan_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('artisan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.artisanprofile')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='marketplace.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['artisan', 'date'], name='orders_prod_artisan_6b410a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'date'), name='unique_product_day')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from marketplace.models import Product
+from marketplace.models import ArtisanProfile, Product
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -22,6 +22,12 @@ class Order(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # A buyer's order history, newest first
+            models.Index(fields=["buyer", "-created_at", "-id"]),
+        ]
+
     def __str__(self):
         return f"Order #{self.id}"
 
@@ -41,5 +47,67 @@ class OrderItem(models.Model):
         decimal_places=2
     )
 
+    class Meta:
+        indexes = [
+            # Orders containing a product (co-purchases, sales rollups),
+            # answered from the index alone
+            models.Index(fields=["product", "order"]),
+        ]
+
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+
+# Daily sales rollups for seller analytics, kept up to date at checkout
+# (see orders.utils.record_sales) so reports read a row per day instead of
+# the order history. Days are in TIME_ZONE; `orders` counts order lines,
+# like the counters on Product and ArtisanProfile.
+
+class ArtisanDailySales(models.Model):
+    artisan = models.ForeignKey(
+        ArtisanProfile,
+        on_delete=models.CASCADE,
+        related_name="daily_sales"
+    )
+    date = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index for an artisan's date range
+            models.UniqueConstraint(fields=["artisan", "date"], name="unique_artisan_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.artisan} on {self.date}"
+
+class ProductDailySales(models.Model):
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="daily_sales"
+    )
+    # Copied from the product so a seller's top products over a date range
+    # come from this table alone
+    artisan = models.ForeignKey(
+        ArtisanProfile,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    date = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "date"], name="unique_product_day"),
+        ]
+        indexes = [
+            models.Index(fields=["artisan", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product} on {self.date}"
@@ -1,3 +1,530 @@
-from django.test import TestCase
+import random
+import re
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.shortcuts import get_object_or_404
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.testing import create_artisan, create_product
+from marketplace.cache import catalog_version
+from marketplace.models import ArtisanProfile, Product
+
+from .cart import CART_SESSION_KEY, MAX_QUANTITY
+from .models import ArtisanDailySales, Order, OrderItem, ProductDailySales
+from .utils import (
+    OutOfStockError,
+    check_daily_sales,
+    check_sales_counters,
+    place_order,
+    reserve_stock,
+)
+from .views import analytics_range
+
+
+def rollups():
+    return OrderItem.objects.all(), ProductDailySales.objects.all(), ArtisanDailySales.objects.all()
+
+
+class DailySalesTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username="buyer@example.com", first_name="Bea")
+        self.artisans = [
+            create_artisan(
+                User.objects.create_user(username=f"seller{i}@example.com", first_name="Sam"),
+                display_name=f"Seller {i}",
+            )
+            for i in range(2)
+        ]
+        self.pot, self.bowl, self.rug = [
+            create_product(artisan, name, price=price, stock=50)
+            for artisan, name, price in [
+                (self.artisans[0], "Clay pot", 100),
+                (self.artisans[0], "Clay bowl", 40),
+                (self.artisans[1], "Rug", 900),
+            ]
+        ]
+
+    def test_checkout_adds_to_the_day(self):
+        place_order(self.buyer, [(self.pot, 2), (self.bowl, 1)])
+        place_order(self.buyer, [(self.pot, 1), (self.rug, 1)])
+
+        today = timezone.localdate()
+        pot = ProductDailySales.objects.get(product=self.pot)
+        self.assertEqual((pot.date, pot.orders, pot.units, pot.revenue), (today, 2, 3, Decimal("300")))
+
+        seller = ArtisanDailySales.objects.get(artisan=self.artisans[0])
+        self.assertEqual((seller.orders, seller.units, seller.revenue), (3, 4, Decimal("340")))
+        self.assertEqual(ArtisanDailySales.objects.count(), 2)
+        self.assertEqual(check_daily_sales(*rollups()), [])
+
+    def test_rebuild_matches_checkout_and_fixes_drift(self):
+        place_order(self.buyer, [(self.pot, 2)])
+        order = place_order(self.buyer, [(self.bowl, 1)])
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=3))
+
+        self.assertEqual(len(check_daily_sales(*rollups())), 4)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_daily_sales", check=True, stdout=StringIO())
+
+        call_command("rebuild_daily_sales", stdout=StringIO())
+        self.assertEqual(check_daily_sales(*rollups()), [])
+        self.assertEqual(
+            sorted(ArtisanDailySales.objects.values_list("date", "units")),
+            [(timezone.localdate() - timedelta(days=3), 1), (timezone.localdate(), 2)],
+        )
+
+    def test_rebuild_since_leaves_earlier_days_alone(self):
+        place_order(self.buyer, [(self.pot, 1)])
+        old = timezone.localdate() - timedelta(days=10)
+        ArtisanDailySales.objects.create(artisan=self.artisans[1], date=old, orders=9, units=9, revenue=9)
+
+        call_command("rebuild_daily_sales", since=timezone.localdate() - timedelta(days=1), stdout=StringIO())
+
+        self.assertTrue(ArtisanDailySales.objects.filter(date=old).exists())
+        self.assertTrue(ArtisanDailySales.objects.filter(date=timezone.localdate()).exists())
+
+
+    def test_migration_backfill_matches_the_rebuild(self):
+        place_order(self.buyer, [(self.pot, 2), (self.rug, 1)])
+        order = place_order(self.buyer, [(self.pot, 1), (self.bowl, 3)])
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=2))
+        ProductDailySales.objects.all().delete()
+        ArtisanDailySales.objects.all().delete()
+
+        migration = import_module("orders.migrations.0004_daily_sales")
+        migration.backfill_daily_sales(apps, None)
+
+        self.assertEqual(check_daily_sales(*rollups()), [])
+        self.assertEqual(ArtisanDailySales.objects.count(), 3)
+
+
+class SellerAnalyticsTests(TestCase):
+    def setUp(self):
+        self.artisan = create_artisan()
+        self.seller = self.artisan.user
+        other = create_artisan(
+            User.objects.create_user(username="other@example.com", first_name="Oli"),
+            display_name="Other",
+            location="Goa",
+        )
+        products = [
+            create_product(artisan, name, price=10, stock=5)
+            for artisan, name in [(self.artisan, "Clay pot"), (self.artisan, "Clay bowl"), (other, "Rug")]
+        ]
+
+        self.today = timezone.localdate()
+        for product, days_ago, revenue in [
+            (products[0], 0, 30), (products[1], 0, 50), (products[0], 2, 10), (products[2], 1, 99),
+        ]:
+            day = self.today - timedelta(days=days_ago)
+            ProductDailySales.objects.create(
+                product=product, artisan=product.artisan, date=day, orders=1, units=1, revenue=revenue,
+            )
+            totals, _ = ArtisanDailySales.objects.get_or_create(artisan=product.artisan, date=day)
+            ArtisanDailySales.objects.filter(id=totals.id).update(
+                orders=totals.orders + 1, units=totals.units + 1, revenue=totals.revenue + revenue,
+            )
+
+    def test_days_without_sales_are_zero(self):
+        self.client.force_login(self.seller)
+        response = self.client.get("/seller/analytics/", {"days": 3})
+
+        self.assertEqual(response.status_code, 200)
+        chart = response.context["chart"]
+        self.assertEqual(len(chart["labels"]), 3)
+        self.assertEqual(chart["orders"], [1, 0, 2])
+        self.assertEqual(chart["revenue"], [10.0, 0.0, 80.0])
+        self.assertEqual(response.context["totals"], {"orders": 3, "units": 3, "revenue": Decimal("90")})
+        self.assertEqual(
+            [row["product__name"] for row in response.context["top_products"]],
+            ["Clay bowl", "Clay pot"],
+        )
+
+    def test_range_is_parsed_and_capped(self):
+        today = self.today
+        self.assertEqual(analytics_range({}, today), (today - timedelta(days=29), today))
+        self.assertEqual(
+            analytics_range({"start": "2026-03-10", "end": "2026-03-01"}, today),
+            (today.replace(2026, 3, 1), today.replace(2026, 3, 10)),
+        )
+        start, end = analytics_range({"start": "2000-01-01", "end": "2026-01-01"}, today)
+        self.assertEqual((end - start).days, 365)
+
+    def test_earliest_dates_do_not_overflow(self):
+        self.assertEqual(analytics_range({"end": "0001-01-05"}, self.today), (date.min, date(1, 1, 5)))
+        self.assertEqual(
+            analytics_range({"start": "0001-01-01", "end": "0001-01-01"}, self.today),
+            (date.min, date.min),
+        )
+
+        self.client.force_login(self.seller)
+        response = self.client.get("/seller/analytics/", {"end": "0001-01-05", "days": 365})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["chart"]["labels"]), 5)
+
+    def test_buyers_are_sent_to_their_profile(self):
+        self.client.force_login(User.objects.create_user(username="buyer@example.com", first_name="Bea"))
+        self.assertRedirects(self.client.get("/seller/analytics/"), "/profile/", fetch_redirect_response=False)
+
+
+class SalesCounterTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username="buyer@example.com", first_name="Bea")
+        self.artisan = create_artisan()
+        self.pot, self.bowl = [
+            create_product(self.artisan, name, price=price, stock=50)
+            for name, price in [("Clay pot", 100), ("Clay bowl", 40)]
+        ]
+
+    def counters(self):
+        self.pot.refresh_from_db()
+        self.bowl.refresh_from_db()
+        self.artisan.refresh_from_db()
+        return (
+            (self.pot.order_count, self.pot.units_sold, self.pot.revenue),
+            (self.bowl.order_count, self.bowl.units_sold, self.bowl.revenue),
+            (self.artisan.total_orders, self.artisan.total_units, self.artisan.total_revenue),
+        )
+
+    def querysets(self):
+        return OrderItem.objects.all(), Product.objects.all(), ArtisanProfile.objects.all()
+
+    def test_checkout_records_sales(self):
+        place_order(self.buyer, [(self.pot, 2), (self.bowl, 1)])
+        place_order(self.buyer, [(self.pot, 1)])
+
+        self.assertEqual(self.counters(), (
+            (2, 3, Decimal("300")),
+            (1, 1, Decimal("40")),
+            (3, 4, Decimal("340")),
+        ))
+
+    def test_prices_are_taken_at_purchase(self):
+        place_order(self.buyer, [(self.pot, 1)])
+        Product.objects.filter(id=self.pot.id).update(price=999)
+        self.pot.refresh_from_db()
+        place_order(self.buyer, [(self.pot, 1)])
+
+        self.assertEqual(self.counters()[0], (2, 2, Decimal("1099")))
+        self.assertEqual(check_sales_counters(*self.querysets()), [])
+
+    def test_check_reports_drift_and_rebuild_fixes_it(self):
+        place_order(self.buyer, [(self.pot, 2)])
+        # Order lines written around checkout, e.g. by an import
+        order = Order.objects.create(buyer=self.buyer)
+        OrderItem.objects.create(order=order, product=self.bowl, quantity=3, price_at_purchase=40)
+        Product.objects.filter(id=self.pot.id).update(units_sold=99)
+
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "3 sales counter(s) out of sync."):
+            call_command("rebuild_sales_counters", check=True, stdout=out)
+        self.assertIn(f"Product #{self.pot.id}: stored (1, 99, Decimal('200.00'))", out.getvalue())
+
+        call_command("rebuild_sales_counters", stdout=StringIO())
+        self.assertEqual(self.counters(), (
+            (1, 2, Decimal("200")),
+            (1, 3, Decimal("120")),
+            (2, 5, Decimal("320")),
+        ))
+        call_command("rebuild_sales_counters", check=True, stdout=StringIO())
+
+    def test_rebuild_leaves_updated_at_alone(self):
+        place_order(self.buyer, [(self.pot, 2)])
+        Product.objects.filter(id=self.bowl.id).update(units_sold=7, invalidate=False)
+        stamps = dict(Product.objects.values_list("id", "updated_at"))
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command("rebuild_sales_counters", stdout=StringIO())
+            call_command("rebuild_sales_counters", stdout=StringIO())
+
+        # Only the drifted bowl is written, and only by the first run
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.counters()[1], (0, 0, Decimal("0")))
+        self.assertEqual(dict(Product.objects.values_list("id", "updated_at")), stamps)
+
+    def test_check_compares_revenue_in_cents(self):
+        # A basket whose float SUM on SQLite comes back as ...79.5599999, not ...79.56
+        rng = random.Random(6)
+        order = Order.objects.create(buyer=self.buyer)
+        items = [
+            OrderItem(
+                order=order, product=self.pot, quantity=rng.randint(1, 3),
+                price_at_purchase=Decimal(str(round(rng.uniform(100, 5000), 2))),
+            )
+            for _ in range(3000)
+        ]
+        OrderItem.objects.bulk_create(items)
+        revenue = sum(item.price_at_purchase * item.quantity for item in items)
+
+        call_command("rebuild_sales_counters", stdout=StringIO())
+        self.assertEqual(self.counters()[0][2], revenue)
+        self.assertEqual(check_sales_counters(*self.querysets()), [])
+
+    def test_migration_backfill_matches_the_rebuild(self):
+        order = Order.objects.create(buyer=self.buyer)
+        OrderItem.objects.create(order=order, product=self.pot, quantity=2, price_at_purchase=100)
+        OrderItem.objects.create(order=order, product=self.bowl, quantity=1, price_at_purchase=35)
+
+        migration = import_module("marketplace.migrations.0009_sales_counters")
+        migration.backfill_sales_counters(apps, None)
+
+        self.assertEqual(check_sales_counters(*self.querysets()), [])
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    BUYERS = 8
+    STOCK = 12
+
+    def setUp(self):
+        self.product = create_product(create_artisan(), "Hot pot", stock=self.STOCK)
+        self.buyers = [
+            User.objects.create_user(username=f"buyer{i}@example.com", first_name="Bea")
+            for i in range(self.BUYERS)
+        ]
+
+    def test_racing_buyers_never_oversell(self):
+        start = threading.Barrier(self.BUYERS)
+        sold = Counter()
+
+        def buy(buyer):
+            # Each buyer keeps checking out one unit until told it sold out
+            try:
+                start.wait()
+                while True:
+                    try:
+                        place_order(buyer, [(self.product, 1)])
+                    except OutOfStockError:
+                        return
+                    except OperationalError:
+                        # SQLite reports lock contention instead of waiting
+                        continue
+                    sold[buyer.pk] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(buyer,)) for buyer in self.buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.product.refresh_from_db()
+        units = OrderItem.objects.aggregate(units=Sum("quantity"))["units"]
+        self.assertEqual(self.product.stock + sum(sold.values()), self.STOCK)
+        self.assertEqual(units, self.STOCK)
+        self.assertEqual(self.product.stock, 0)
+        self.assertTrue(self.product.is_out_of_stock)
+        self.assertEqual(self.product.units_sold, self.STOCK)
+
+
+class StockTests(TestCase):
+    ADDRESS = {"full_name": "Bea", "address": "1 Lane", "city": "Pune", "pincode": "411001"}
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(username="buyer@example.com", first_name="Bea")
+        self.pot = create_product(create_artisan(), stock=3)
+
+    def stock(self):
+        self.pot.refresh_from_db()
+        return self.pot.stock, self.pot.is_out_of_stock
+
+    def test_reserve_stock_decrements_and_flags_the_last_unit(self):
+        self.assertTrue(reserve_stock(self.pot.id, 2))
+        self.assertEqual(self.stock(), (1, False))
+
+        self.assertFalse(reserve_stock(self.pot.id, 2))
+        self.assertEqual(self.stock(), (1, False))
+
+        self.assertTrue(reserve_stock(self.pot.id, 1))
+        self.assertEqual(self.stock(), (0, True))
+        self.assertFalse(reserve_stock(self.pot.id, 1))
+
+    def test_only_selling_out_invalidates_the_catalog(self):
+        version = catalog_version()
+        updated_at = self.pot.updated_at
+
+        place_order(self.buyer, [(self.pot, 2)])
+        self.assertEqual(catalog_version(), version)
+        self.pot.refresh_from_db()
+        self.assertEqual((self.pot.order_count, self.pot.stock), (1, 1))
+        self.assertGreater(self.pot.updated_at, updated_at)
+
+        place_order(self.buyer, [(self.pot, 1)])
+        self.assertGreater(catalog_version(), version)
+        self.assertEqual(self.stock(), (0, True))
+
+    def test_inactive_products_cannot_be_reserved(self):
+        Product.objects.filter(id=self.pot.id).update(is_active=False)
+        self.assertFalse(reserve_stock(self.pot.id, 1))
+        self.assertEqual(self.stock(), (3, False))
+
+    def test_place_order_raises_and_writes_nothing_when_short(self):
+        with self.assertRaises(OutOfStockError) as raised:
+            place_order(self.buyer, [(self.pot, 4)])
+
+        self.assertEqual(raised.exception.product, self.pot)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(), (3, False))
+
+    def test_checkout_reports_a_product_that_just_sold_out(self):
+        self.client.force_login(self.buyer)
+
+        def sold_out_meanwhile(*args, **kwargs):
+            # Another buyer takes the last units after the page loaded
+            product = get_object_or_404(*args, **kwargs)
+            Product.objects.filter(id=product.id).update(stock=0, is_out_of_stock=True)
+            return product
+
+        with patch("orders.views.get_object_or_404", side_effect=sold_out_meanwhile):
+            response = self.client.post(f"/checkout/?product={self.pot.id}", self.ADDRESS, follow=True)
+
+        self.assertRedirects(response, f"/products/{self.pot.id}/")
+        self.assertContains(response, "Sorry, this product just sold out.")
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_refuses_a_sold_out_product(self):
+        Product.objects.filter(id=self.pot.id).update(stock=0, is_out_of_stock=True)
+        self.client.force_login(self.buyer)
+
+        response = self.client.post(f"/checkout/?product={self.pot.id}", self.ADDRESS, follow=True)
+        self.assertContains(response, "This product is out of stock.")
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_places_an_order(self):
+        self.client.force_login(self.buyer)
+        response = self.client.post(f"/checkout/?product={self.pot.id}", self.ADDRESS)
+
+        order = Order.objects.get(buyer=self.buyer)
+        self.assertRedirects(response, f"/order-confirmation/{order.id}/", fetch_redirect_response=False)
+        self.assertEqual(self.stock(), (2, False))
+
+
+class CartTests(TestCase):
+    ADDRESS = StockTests.ADDRESS
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(username="buyer@example.com", first_name="Bea")
+        artisan = create_artisan()
+        self.pot, self.bowl, self.vase = [
+            create_product(artisan, name, price=price, stock=stock)
+            for name, price, stock in [("Clay pot", 100, 5), ("Clay bowl", 40, 2), ("Clay vase", 300, 1)]
+        ]
+        self.client.force_login(self.buyer)
+
+    def cart(self):
+        return self.client.session.get(CART_SESSION_KEY, {})
+
+    def add(self, product, times=1):
+        for _ in range(times):
+            response = self.client.post(f"/cart/add/{product.id}/")
+        return response
+
+    def test_add_update_and_remove(self):
+        self.add(self.pot, times=2)
+        self.add(self.bowl)
+        self.assertEqual(self.cart(), {str(self.pot.id): 2, str(self.bowl.id): 1})
+
+        self.client.post("/cart/update/", {
+            f"quantity_{self.pot.id}": "50",
+            f"quantity_{self.bowl.id}": "not a number",
+        })
+        self.assertEqual(self.cart(), {str(self.pot.id): MAX_QUANTITY, str(self.bowl.id): 1})
+
+        self.client.post("/cart/update/", {f"quantity_{self.pot.id}": "0"})
+        self.assertEqual(self.cart(), {str(self.bowl.id): 1})
+
+        self.client.post("/cart/update/", {"remove": self.bowl.id})
+        self.assertEqual(self.cart(), {})
+
+    def test_enter_in_a_quantity_updates_the_cart(self):
+        # Implicit submission uses the form's first submit button
+        self.add(self.pot)
+        self.add(self.bowl)
+        html = self.client.get("/cart/").content.decode()
+
+        cart_form = re.search(r'<form method="post" action="/cart/update/">(.*?)</form>', html, re.S).group(1)
+        own_buttons = [b for b in re.findall(r"<button[^>]*>", cart_form) if "form=" not in b]
+        self.assertNotIn('name="remove"', own_buttons[0])
+        self.assertIn(f'form="remove-from-cart" name="remove" value="{self.pot.id}"', html)
+
+    def test_checkout_saves_edited_quantities_first(self):
+        self.add(self.pot)
+        response = self.client.post("/cart/update/", {f"quantity_{self.pot.id}": "3", "checkout": "1"})
+
+        self.assertRedirects(response, "/cart/checkout/", fetch_redirect_response=False)
+        self.assertEqual(self.cart(), {str(self.pot.id): 3})
+
+    def test_unavailable_products_are_not_added_and_drop_out(self):
+        Product.objects.filter(id=self.vase.id).update(stock=0, is_out_of_stock=True)
+        response = self.client.post(f"/cart/add/{self.vase.id}/", follow=True)
+        self.assertContains(response, "This product is out of stock.")
+        self.assertEqual(self.cart(), {})
+
+        self.add(self.pot)
+        self.add(self.bowl)
+        Product.objects.filter(id=self.bowl.id).update(is_active=False)
+
+        response = self.client.get("/cart/")
+        self.assertEqual([line["product"] for line in response.context["lines"]], [self.pot])
+        self.assertEqual(self.cart(), {str(self.pot.id): 1})
+
+    def test_checkout_writes_one_order_with_every_line(self):
+        self.add(self.pot, times=2)
+        self.add(self.bowl)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/cart/checkout/", self.ADDRESS)
+
+        order = Order.objects.get(buyer=self.buyer)
+        self.assertRedirects(response, f"/order-confirmation/{order.id}/", fetch_redirect_response=False)
+        self.assertEqual(
+            sorted(order.items.values_list("product__name", "quantity", "price_at_purchase")),
+            [("Clay bowl", 1, Decimal("40")), ("Clay pot", 2, Decimal("100"))],
+        )
+        item_inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "orders_orderitem"')]
+        self.assertEqual(len(item_inserts), 1)
+
+        self.assertEqual(
+            list(Product.objects.order_by("id").values_list("stock", flat=True)),
+            [3, 1, 1],
+        )
+        self.assertEqual(self.cart(), {})
+
+    def test_one_short_line_rolls_back_the_whole_order(self):
+        self.add(self.pot)
+        self.add(self.vase)
+        Product.objects.filter(id=self.vase.id).update(stock=0, is_out_of_stock=True)
+        # The vase is still active, so it stays in the cart until checkout
+        self.assertEqual(len(self.client.get("/cart/").context["lines"]), 2)
+
+        response = self.client.post("/cart/checkout/", self.ADDRESS, follow=True)
+
+        self.assertRedirects(response, "/cart/")
+        self.assertContains(response, "there isn&#x27;t enough stock left for Clay vase")
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(Product.objects.get(id=self.pot.id).stock, 5)
+        self.assertEqual(len(self.cart()), 2)
+
+    def test_empty_cart_and_missing_address(self):
+        response = self.client.post("/cart/checkout/", self.ADDRESS, follow=True)
+        self.assertContains(response, "Your cart is empty.")
+
+        self.add(self.pot)
+        response = self.client.post("/cart/checkout/", {"full_name": "Bea"}, follow=True)
+        self.assertContains(response, "Please fill all address fields.")
+        self.assertFalse(Order.objects.exists())
@@ -1,7 +1,20 @@
 from django.urls import path
-from .views import checkout_view, order_confirmation_view
+from .views import (
+    checkout_view,
+    order_confirmation_view,
+    cart_view,
+    add_to_cart_view,
+    update_cart_view,
+    cart_checkout_view,
+    seller_analytics_view,
+)
 
 urlpatterns = [
     path("checkout/", checkout_view, name="checkout"),
     path("order-confirmation/<int:order_id>/", order_confirmation_view, name="order_confirmation"),
+    path("cart/", cart_view, name="cart"),
+    path("cart/add/<int:product_id>/", add_to_cart_view, name="add_to_cart"),
+    path("cart/update/", update_cart_view, name="update_cart"),
+    path("cart/checkout/", cart_checkout_view, name="cart_checkout"),
+    path("seller/analytics/", seller_analytics_view, name="seller_analytics"),
 ]
@@ -0,0 +1,277 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from marketplace.models import ArtisanProfile, Product
+from .models import ArtisanDailySales, Order, OrderItem, ProductDailySales
+
+LINE_TOTAL = F("price_at_purchase") * F("quantity")
+CENT = Decimal("0.01")
+
+# counter fields on each model, in (orders, units, revenue) order
+PRODUCT_COUNTERS = ("order_count", "units_sold", "revenue")
+ARTISAN_COUNTERS = ("total_orders", "total_units", "total_revenue")
+DAILY_COUNTERS = ("orders", "units", "revenue")
+
+
+class OutOfStockError(Exception):
+    def __init__(self, product):
+        super().__init__(f"{product} is out of stock")
+        self.product = product
+
+
+def reserve_stock(product_id, quantity):
+    # Conditional UPDATEs: there is no read-modify-write window to
+    # oversell in, and only the stock columns are written. Pages show
+    # in/out of stock rather than the level, so the cached catalog is
+    # only invalidated when this sale takes the last units.
+    products = Product.objects.filter(pk=product_id, is_active=True)
+
+    if products.filter(stock__gt=quantity).update(
+        stock=F("stock") - quantity,
+        invalidate=False,
+    ):
+        return True
+
+    return products.filter(stock=quantity).update(stock=0, is_out_of_stock=True) == 1
+
+
+def place_order(buyer, lines):
+    # lines: [(product, quantity)]. Every line is reserved, the order and
+    # its items are written and the counters updated in one transaction,
+    # so a single sold-out line rolls the whole order back.
+    lines = sorted(lines, key=lambda line: line[0].pk)
+
+    with transaction.atomic():
+        # Decrement first, in pk order, so competing buyers queue on the
+        # row locks in the same order before any order rows are written
+        for product, quantity in lines:
+            if not reserve_stock(product.pk, quantity):
+                raise OutOfStockError(product)
+
+        order = Order.objects.create(buyer=buyer, status="ordered")
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=product,
+                quantity=quantity,
+                price_at_purchase=product.price,
+            )
+            for product, quantity in lines
+        ])
+
+        # Seller dashboard counters
+        record_sales(items)
+
+    return order
+
+
+def record_sales(items):
+    # Must run inside the checkout transaction so counters, daily rollups
+    # and orders commit (or roll back) together
+    products = defaultdict(lambda: [0, 0, Decimal("0")])
+    artisans = defaultdict(lambda: [0, 0, Decimal("0")])
+    product_days = defaultdict(lambda: [0, 0, Decimal("0")])
+    artisan_days = defaultdict(lambda: [0, 0, Decimal("0")])
+
+    for item in items:
+        artisan_id = item.product.artisan_id
+        day = timezone.localdate(item.order.created_at)
+        line_total = item.price_at_purchase * item.quantity
+        for totals in (
+            products[item.product_id],
+            artisans[artisan_id],
+            product_days[(item.product_id, artisan_id, day)],
+            artisan_days[(artisan_id, day)],
+        ):
+            totals[0] += 1
+            totals[1] += item.quantity
+            totals[2] += line_total
+
+    _increment(Product, PRODUCT_COUNTERS, products)
+    _increment(ArtisanProfile, ARTISAN_COUNTERS, artisans)
+
+    for (product_id, artisan_id, day), deltas in sorted(product_days.items()):
+        _add_daily(ProductDailySales, {"product_id": product_id, "artisan_id": artisan_id, "date": day}, deltas)
+    for (artisan_id, day), deltas in sorted(artisan_days.items()):
+        _add_daily(ArtisanDailySales, {"artisan_id": artisan_id, "date": day}, deltas)
+
+
+def _increment(model, fields, deltas):
+    # Ordered by pk so concurrent checkouts lock rows in the same order.
+    # Counters only show on the seller dashboard, so they leave updated_at
+    # and the catalog cache alone.
+    for pk in sorted(deltas):
+        model.objects.filter(pk=pk).update(
+            updated_at=F("updated_at"),
+            invalidate=False,
+            **{field: F(field) + delta for field, delta in zip(fields, deltas[pk])},
+        )
+
+
+def _add_daily(model, row, deltas):
+    # Adds to the day's row, creating it with the first sale of the day
+    changes = {field: F(field) + delta for field, delta in zip(DAILY_COUNTERS, deltas)}
+    if model.objects.filter(**row).update(**changes):
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**row, **dict(zip(DAILY_COUNTERS, deltas)))
+        return
+    except IntegrityError:
+        # A concurrent checkout created it first
+        pass
+
+    model.objects.filter(**row).update(**changes)
+
+
+def sales_totals(order_items, key):
+    # {key value: (orders, units, revenue)} from the OrderItem history
+    rows = (
+        order_items
+        .order_by()
+        .values(key)
+        .annotate(
+            orders=Count("id"),
+            units=Coalesce(Sum("quantity"), 0),
+            revenue=Coalesce(
+                Sum(LINE_TOTAL, output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Decimal("0"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+    )
+    return {row[key]: (row["orders"], row["units"], _cents(row["revenue"])) for row in rows}
+
+
+def _cents(amount):
+    # SQLite sums decimals as floats; round back to the stored precision
+    return Decimal(amount).quantize(CENT)
+
+
+def rebuild_sales_counters(order_items, products, artisans):
+    # Accepts querysets so callers can narrow what is rebuilt
+    _rebuild(products, PRODUCT_COUNTERS, sales_totals(order_items, "product_id"))
+    _rebuild(artisans, ARTISAN_COUNTERS, sales_totals(order_items, "product__artisan_id"))
+
+
+def _drifted(queryset, fields, totals):
+    # (pk, updated_at, stored, expected) for every row whose counters
+    # differ from the OrderItem totals
+    rows = queryset.values_list("pk", "updated_at", *fields).iterator(chunk_size=2000)
+    for pk, updated_at, *stored in rows:
+        expected = totals.get(pk, (0, 0, Decimal("0")))
+        if tuple(stored) != expected:
+            yield pk, updated_at, tuple(stored), expected
+
+
+def _rebuild(queryset, fields, totals):
+    # Writes only the drifted rows and keeps their updated_at: counters
+    # aren't on any page behind a Last-Modified (see _increment)
+    model = queryset.model
+    changed = [
+        model(pk=pk, updated_at=updated_at, **dict(zip(fields, expected)))
+        for pk, updated_at, _, expected in _drifted(queryset, fields, totals)
+    ]
+    model.objects.bulk_update(changed, [*fields, "updated_at"], batch_size=500)
+
+
+def check_sales_counters(order_items, products, artisans):
+    # Returns (model name, pk, stored, expected) for every drifted row
+    checks = [
+        (products, PRODUCT_COUNTERS, sales_totals(order_items, "product_id")),
+        (artisans, ARTISAN_COUNTERS, sales_totals(order_items, "product__artisan_id")),
+    ]
+
+    return [
+        (queryset.model.__name__, pk, stored, expected)
+        for queryset, fields, totals in checks
+        for pk, _, stored, expected in _drifted(queryset, fields, totals)
+    ]
+
+
+def daily_sales_totals(order_items):
+    # {(product id, artisan id, day): (orders, units, revenue)} from the
+    # OrderItem history, with days in TIME_ZONE as at checkout
+    rows = (
+        order_items
+        .order_by()
+        .annotate(day=TruncDate("order__created_at"))
+        .values("product_id", "product__artisan_id", "day")
+        .annotate(
+            orders=Count("id"),
+            units=Coalesce(Sum("quantity"), 0),
+            revenue=Coalesce(
+                Sum(LINE_TOTAL, output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Decimal("0"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+    )
+    return {
+        (row["product_id"], row["product__artisan_id"], row["day"]): (row["orders"], row["units"], _cents(row["revenue"]))
+        for row in rows.iterator(chunk_size=2000)
+    }
+
+
+def _artisan_days(product_days):
+    artisan_days = defaultdict(lambda: [0, 0, Decimal("0")])
+    for (_, artisan_id, day), values in product_days.items():
+        totals = artisan_days[(artisan_id, day)]
+        for index, value in enumerate(values):
+            totals[index] += value
+    return {key: tuple(totals) for key, totals in artisan_days.items()}
+
+
+def rebuild_daily_sales(order_items, product_days, artisan_days):
+    # Replaces the rollup rows in `product_days`/`artisan_days` with totals
+    # from `order_items`; filter all three to the same dates to rebuild a
+    # range. Accepts querysets so a data migration can pass historical models.
+    products = daily_sales_totals(order_items)
+    artisans = _artisan_days(products)
+
+    product_days.delete()
+    artisan_days.delete()
+
+    ProductDays, ArtisanDays = product_days.model, artisan_days.model
+    ProductDays.objects.bulk_create(
+        [
+            ProductDays(product_id=product_id, artisan_id=artisan_id, date=day, **dict(zip(DAILY_COUNTERS, values)))
+            for (product_id, artisan_id, day), values in products.items()
+        ],
+        batch_size=1000,
+    )
+    ArtisanDays.objects.bulk_create(
+        [
+            ArtisanDays(artisan_id=artisan_id, date=day, **dict(zip(DAILY_COUNTERS, values)))
+            for (artisan_id, day), values in artisans.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def check_daily_sales(order_items, product_days, artisan_days):
+    # Returns (model name, key, stored, expected) for every drifted day
+    products = daily_sales_totals(order_items)
+    checks = [
+        (product_days, ("product_id", "artisan_id", "date"), products),
+        (artisan_days, ("artisan_id", "date"), _artisan_days(products)),
+    ]
+
+    no_sales = (0, 0, Decimal("0"))
+    mismatches = []
+    for queryset, keys, expected in checks:
+        stored = {
+            row[:len(keys)]: row[len(keys):]
+            for row in queryset.values_list(*keys, *DAILY_COUNTERS).iterator(chunk_size=2000)
+        }
+        for key in sorted(stored.keys() | expected.keys()):
+            have, want = stored.get(key, no_sales), expected.get(key, no_sales)
+            if have != want:
+                mismatches.append((queryset.model.__name__, key, have, want))
+
+    return mismatches
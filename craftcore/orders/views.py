@@ -1,8 +1,35 @@
+from datetime import date, timedelta
+from decimal import Decimal
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db.models import Sum
+from django.utils import timezone
 from marketplace.models import Product
-from .models import Order, OrderItem
+from marketplace.utils import require_active_artisan
+from .cart import Cart
+from .models import ArtisanDailySales, Order, ProductDailySales
+from .utils import DAILY_COUNTERS, OutOfStockError, place_order
+
+# Date range presets (days) on the seller analytics page
+ANALYTICS_PRESETS = (7, 30, 90, 365)
+ANALYTICS_MAX_DAYS = 366
+
+def address_fields_complete(post):
+    # Address fields (simple validation)
+    fields = ["full_name", "address", "city", "pincode"]
+    return all(post.get(field, "").strip() for field in fields)
+
+def checkout_context(items, cancel_url):
+    lines = [
+        {"product": product, "quantity": quantity, "total": product.price * quantity}
+        for product, quantity in items
+    ]
+    return {
+        "lines": lines,
+        "total": sum(line["total"] for line in lines),
+        "cancel_url": cancel_url,
+    }
 
 @login_required(login_url="/login/")
 def checkout_view(request):
@@ -24,42 +51,159 @@ def checkout_view(request):
 
 
     if request.method == "POST":
-        # Address fields (simple validation)
-        full_name = request.POST.get("full_name", "").strip()
-        address = request.POST.get("address", "").strip()
-        city = request.POST.get("city", "").strip()
-        pincode = request.POST.get("pincode", "").strip()
-
-        if not all([full_name, address, city, pincode]):
+        if not address_fields_complete(request.POST):
             messages.error(request, "Please fill all address fields.")
             return redirect(f"/checkout/?product={product.id}")
 
-        # Create Order
-        order = Order.objects.create(
-            buyer=request.user,
-            status="ordered"
-        )
+        try:
+            order = place_order(request.user, [(product, 1)])
+        except OutOfStockError:
+            messages.error(request, "Sorry, this product just sold out.")
+            return redirect(f"/products/{product.id}/")
+
+        return redirect(f"/order-confirmation/{order.id}/")
+
+    context = checkout_context([(product, 1)], f"/products/{product.id}/")
+    return render(request, "orders/checkout.html", context)
+
+def cart_view(request):
+    items = Cart(request).items()
+    return render(request, "orders/cart.html", checkout_context(items, "/products/"))
+
+def add_to_cart_view(request, product_id):
+    if request.method != "POST":
+        return redirect(f"/products/{product_id}/")
+
+    product = get_object_or_404(Product, id=product_id, is_active=True)
+
+    if product.stock <= 0:
+        messages.error(request, "This product is out of stock.")
+        return redirect(f"/products/{product.id}/")
+
+    Cart(request).add(product.id)
+    messages.success(request, f"{product.name} added to your cart.")
+    return redirect("/cart/")
+
+def update_cart_view(request):
+    if request.method != "POST":
+        return redirect("/cart/")
+
+    cart = Cart(request)
+
+    for product_id in list(cart.lines):
+        quantity = request.POST.get(f"quantity_{product_id}")
+        if quantity is not None and quantity.isdigit():
+            cart.set(product_id, quantity)
+
+    remove_id = request.POST.get("remove")
+    if remove_id:
+        cart.remove(remove_id)
+
+    if request.POST.get("checkout"):
+        return redirect("/cart/checkout/")
 
-        # Create Order Item
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=1,
-            price_at_purchase=product.price
-        )
+    return redirect("/cart/")
 
-        product.stock -= 1
-        product.save()
+@login_required(login_url="/login/?next=/cart/checkout/")
+def cart_checkout_view(request):
+    cart = Cart(request)
+    items = cart.items()
 
+    if not items:
+        messages.error(request, "Your cart is empty.")
+        return redirect("/cart/")
 
+    if request.method == "POST":
+        if not address_fields_complete(request.POST):
+            messages.error(request, "Please fill all address fields.")
+            return redirect("/cart/checkout/")
+
+        try:
+            order = place_order(request.user, items)
+        except OutOfStockError as error:
+            messages.error(
+                request,
+                f"Sorry, there isn't enough stock left for {error.product.name}. "
+                "Please adjust your cart."
+            )
+            return redirect("/cart/")
+
+        cart.clear()
         return redirect(f"/order-confirmation/{order.id}/")
 
-    context = {
-        "product": product
-    }
-    return render(request, "orders/checkout.html", context)
+    return render(request, "orders/checkout.html", checkout_context(items, "/cart/"))
 
 @login_required
 def order_confirmation_view(request, order_id):
     order = get_object_or_404(Order, id=order_id, buyer=request.user)
     return render(request, "orders/order_confirmation.html", {"order": order})
+
+def analytics_range(params, today):
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD, or ?days=N ending today;
+    # defaults to the last 30 days and never spans more than a year
+    try:
+        end = date.fromisoformat(params.get("end", ""))
+    except ValueError:
+        end = today
+
+    try:
+        start = date.fromisoformat(params.get("start", ""))
+    except ValueError:
+        days = params.get("days", "")
+        days = int(days) if days.isdigit() and int(days) > 0 else 30
+        start = days_before(end, min(days, ANALYTICS_MAX_DAYS) - 1)
+
+    if start > end:
+        start, end = end, start
+
+    return max(start, days_before(end, ANALYTICS_MAX_DAYS - 1)), end
+
+def days_before(day, days):
+    # Clamped at date.min: ?end=0001-01-05 must not overflow
+    return day - timedelta(days=min(days, (day - date.min).days))
+
+@login_required
+def seller_analytics_view(request):
+    artisan = require_active_artisan(request)
+    if not artisan:
+        return redirect("/profile/")
+
+    # Reads only the daily rollups, so the cost follows the number of days
+    # shown rather than the seller's order history
+    start, end = analytics_range(request.GET, timezone.localdate())
+
+    stored = {
+        row[0]: row[1:]
+        for row in ArtisanDailySales.objects
+        .filter(artisan=artisan, date__range=(start, end))
+        .values_list("date", *DAILY_COUNTERS)
+    }
+    no_sales = (0, 0, Decimal("0"))
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    series = [(day, *stored.get(day, no_sales)) for day in days]
+
+    top_products = (
+        ProductDailySales.objects
+        .filter(artisan=artisan, date__range=(start, end))
+        .values("product_id", "product__name")
+        .annotate(orders=Sum("orders"), units=Sum("units"), revenue=Sum("revenue"))
+        .order_by("-revenue", "product_id")[:10]
+    )
+
+    context = {
+        "start": start,
+        "end": end,
+        "presets": ANALYTICS_PRESETS,
+        "totals": {
+            field: sum(row[index] for row in series)
+            for index, field in enumerate(DAILY_COUNTERS, start=1)
+        },
+        "top_products": top_products,
+        "chart": {
+            "labels": [day.isoformat() for day, *_ in series],
+            "orders": [orders for _, orders, _, _ in series],
+            "units": [units for _, _, units, _ in series],
+            "revenue": [float(revenue) for *_, revenue in series],
+        },
+    }
+    return render(request, "orders/analytics.html", context)